@@ -0,0 +1,51 @@
+"""Run the benchmarks: python -m bench [NAME ...]
+
+Each benchmark prints what it measured, and the whole report is also
+written to bench_output.txt. Benchmarks that need GTK are reported as
+skipped when it is not installed or there is no display.
+"""
+
+import argparse
+import importlib
+import os
+import platform
+import sys
+from pathlib import Path
+
+from .common import Skip
+
+BENCHMARKS = (
+    "content_format", "serialize", "incremental", "document", "tag_table",
+    "css_providers", "window_build", "search",
+)
+OUTPUT = Path(__file__).resolve().parent.parent / "bench_output.txt"
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Run the benchmarks.")
+    parser.add_argument("names", nargs="*", metavar="NAME", help=f"any of {', '.join(BENCHMARKS)}")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark {', '.join(unknown)}")
+
+    lines = []
+
+    def report(line: str = ""):
+        print(line, flush=True)
+        lines.append(line)
+
+    report(f"Python {platform.python_version()}, {platform.machine()}, {os.cpu_count()} CPUs")
+    for name in args.names or BENCHMARKS:
+        module = importlib.import_module(f".{name}", __package__)
+        report(f"\n== {name}: {module.__doc__.splitlines()[0]}")
+        try:
+            module.run(report)
+        except Skip as exc:
+            report(f"skipped: {exc}")
+    OUTPUT.write_text("\n".join(lines) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+"""Helpers shared by the benchmarks."""
+
+import random
+import time
+
+WORDS = (
+    "note", "sticky", "remember", "milk", "meeting", "tomorrow", "idea", "call",
+    "draft", "review", "the", "a", "and", "of", "to", "fix", "ship", "later",
+)
+SIZES = (8, 10, 12, 14, 16, 18, 24, 32)
+FAMILIES = ("Sans", "Serif", "Monospace", "Cantarell")
+COLORS = ("#cc0000", "#3465a4", "#4e9a06", "#f57900", "#75507b", "#000000")
+
+
+class Skip(Exception):
+    """The benchmark cannot run here, e.g. without GTK or a display."""
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    """Fastest of repeat calls to fn, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def formatted_runs(count: int, seed: int = 0) -> list[dict]:
+    """count runs of a few words each, nearly every one formatted differently."""
+    rng = random.Random(seed)
+    runs = []
+    for _ in range(count):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8)))
+        run = {"text": words + rng.choice("  \n")}
+        for name in ("bold", "italic", "underline", "strikethrough"):
+            if rng.random() < 0.3:
+                run[name] = True
+        if rng.random() < 0.6:
+            run["size"] = rng.choice(SIZES)
+        if rng.random() < 0.4:
+            run["family"] = rng.choice(FAMILIES)
+        if rng.random() < 0.5:
+            run["color"] = rng.choice(COLORS)
+        runs.append(run)
+    return runs
+
+
+def plain_runs(chars: int) -> list[dict]:
+    """Unformatted lines of text adding up to about chars characters."""
+    line = "The quick brown fox jumps over the lazy dog, again and again.\n"
+    return [{"text": line * max(1, chars // len(line))}]
+
+
+def require_gtk():
+    """Import and initialize GTK 4 and libadwaita, or raise Skip."""
+    try:
+        import gi
+        gi.require_version("Gtk", "4.0")
+        gi.require_version("Adw", "1")
+        from gi.repository import Adw, Gtk
+    except (ImportError, ValueError) as exc:
+        raise Skip(f"GTK 4 is not available ({exc})") from None
+    if not Gtk.init_check():
+        raise Skip("GTK could not be initialized (no display?)")
+    Adw.init()
+    return Gtk
+
+
+def rss_kib() -> int:
+    """Resident memory of this process in KiB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
@@ -0,0 +1,31 @@
+"""Size and speed of the compact note format against JSON."""
+
+import json
+
+from stickies.storage import decode_content, encode_content
+
+from .common import best_of, formatted_runs
+
+RUNS = 20_000
+
+
+def run(report):
+    runs = formatted_runs(RUNS)
+    formats = {
+        "json indent=2": (
+            lambda: json.dumps(runs, indent=2).encode(), json.loads,
+        ),
+        "json compact": (
+            lambda: json.dumps(runs, separators=(",", ":")).encode(), json.loads,
+        ),
+        "compact v1": (lambda: encode_content(runs), decode_content),
+    }
+    report(f"{RUNS} formatted runs, best of 5")
+    for name, (encode, decode) in formats.items():
+        data = encode()
+        assert decode(data) == runs
+        report(
+            f"  {name:<14} {len(data):>8} bytes"
+            f"  enc {best_of(encode) * 1000:6.1f} ms"
+            f"  dec {best_of(lambda: decode(data)) * 1000:6.1f} ms"
+        )
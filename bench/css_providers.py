@@ -0,0 +1,66 @@
+"""Style recalculation cost as windows open, with per-window or shared CSS."""
+
+import time
+
+from .common import require_gtk
+
+WINDOWS = (0, 10, 50, 200)
+WIDGETS = 200
+TOGGLES = 50
+
+
+def run(report):
+    Gtk = require_gtk()
+    from gi.repository import Gdk
+    from stickies.colors import PALETTE, TEXT_COLORS
+    from stickies.css import generate_css
+
+    display = Gdk.Display.get_default()
+    app_css = Gtk.CssProvider()
+    app_css.load_from_string(generate_css())
+    Gtk.StyleContext.add_provider_for_display(
+        display, app_css, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION,
+    )
+
+    # A swatch grid like the note popovers; toggling a class on the parent
+    # restyles every child
+    box = Gtk.Box()
+    for i in range(WIDGETS):
+        swatch = Gtk.Button()
+        swatch.add_css_class("color-swatch")
+        swatch.add_css_class(f"swatch-{list(PALETTE)[i % len(PALETTE)]}")
+        box.append(swatch)
+    window = Gtk.Window(child=box)
+    window.present()
+
+    def restyle_ms() -> float:
+        start = time.perf_counter()
+        for _ in range(TOGGLES):
+            box.add_css_class("selected")
+            box.measure(Gtk.Orientation.HORIZONTAL, -1)
+            box.remove_css_class("selected")
+            box.measure(Gtk.Orientation.HORIZONTAL, -1)
+        return (time.perf_counter() - start) / (2 * TOGGLES) * 1000
+
+    report(f"mean restyle of {WIDGETS} swatches after N note windows were opened")
+    report(f"  {'N':>4}  {'providers':>9}  {'per-window CSS':>14}  {'shared CSS':>10}")
+    shared = restyle_ms()
+    providers = []
+    for windows in WINDOWS:
+        # What each window used to add: one provider per swatch
+        while len(providers) < windows * (len(PALETTE) + len(TEXT_COLORS)):
+            for name, colors in PALETTE.items():
+                providers.append(f".swatch-{name} {{ background: {colors['bg']}; }}")
+            for hex_color, name in TEXT_COLORS:
+                providers.append(f".text-color-{name.lower()} {{ background: {hex_color}; }}")
+            for css in providers[-(len(PALETTE) + len(TEXT_COLORS)):]:
+                provider = Gtk.CssProvider()
+                provider.load_from_string(css)
+                Gtk.StyleContext.add_provider_for_display(
+                    display, provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION + 1,
+                )
+        report(
+            f"  {windows:>4}  {len(providers):>9}  {restyle_ms():11.3f} ms"
+            f"  {shared:7.3f} ms"
+        )
+    window.destroy()
@@ -0,0 +1,34 @@
+"""Document edit cost as notes grow, with no GTK involved."""
+
+import random
+import time
+
+from stickies.document import BLOCK_SIZE, Document
+
+BLOCKS = (313, 1250, 5000, 20000)
+EDITS = 2000
+
+
+def run(report):
+    report(f"mean per edit over {EDITS} random edits; pieces alternate bold and plain")
+    report(f"  {'blocks':>6}  {'chars':>9}  {'insert':>9}  {'delete':>9}  {'bold':>9}")
+    for blocks in BLOCKS:
+        runs = [
+            {"text": "word " * 4, **({"bold": True} if i % 2 else {})}
+            for i in range(blocks * BLOCK_SIZE)
+        ]
+        doc = Document.from_runs(runs)
+        rng = random.Random(blocks)
+        length = len(doc)
+        offsets = [rng.randrange(length - 100) for _ in range(EDITS)]
+        timings = []
+        for edit in (
+            lambda at: doc.insert(at, "x"),
+            lambda at: doc.delete(at, at + 1),
+            lambda at: doc.apply_style(at, at + 10, bold=True),
+        ):
+            start = time.perf_counter()
+            for at in offsets:
+                edit(at)
+            timings.append((time.perf_counter() - start) / EDITS * 1e6)
+        report(f"  {blocks:>6}  {length:>9}" + "".join(f"  {t:6.1f} us" for t in timings))
@@ -0,0 +1,43 @@
+"""Serialization cost of one keystroke at growing note lengths."""
+
+import time
+
+from .common import formatted_runs, plain_runs, require_gtk
+
+LENGTHS = (10_000, 50_000, 200_000, 1_000_000)
+KEYSTROKES = 50
+
+
+def run(report):
+    Gtk = require_gtk()
+    from stickies.formatting import create_tag_table
+    from stickies.serializer import (
+        IncrementalSerializer, deserialize_to_buffer, serialize_buffer,
+    )
+
+    tag_table = create_tag_table()
+    report(f"mean per keystroke over {KEYSTROKES} edits in the middle of the note")
+    report(f"  {'chars':>9}  {'full':>9}  {'incremental':>11}")
+    for length in LENGTHS:
+        # Formatted text up front, so edits land among styled runs
+        runs = formatted_runs(200) + plain_runs(length)
+        buffer = Gtk.TextBuffer(tag_table=tag_table)
+        deserialize_to_buffer(buffer, runs)
+        serializer = IncrementalSerializer(buffer)
+        serializer.runs()
+        middle = buffer.get_char_count() // 2
+
+        full = incremental = 0.0
+        for i in range(KEYSTROKES):
+            buffer.insert(buffer.get_iter_at_offset(middle + i), "x")
+            start = time.perf_counter()
+            result = serializer.runs()
+            incremental += time.perf_counter() - start
+            start = time.perf_counter()
+            expected = serialize_buffer(buffer)
+            full += time.perf_counter() - start
+            assert result == expected
+        report(
+            f"  {buffer.get_char_count():>9}  {full / KEYSTROKES * 1000:7.2f} ms"
+            f"  {incremental / KEYSTROKES * 1000:8.3f} ms"
+        )
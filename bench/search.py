@@ -0,0 +1,102 @@
+"""Search index load time and query latency over a large synthetic archive."""
+
+import itertools
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from stickies.search import SearchIndex
+
+NOTES = 10_000
+NOTE_CHARS = 5_000  # About 50 MB of text in all
+VOCABULARY = 50_000
+ZIPF_S = 1.07  # Word frequency falls off as rank ** -ZIPF_S, as in English
+REINDEXED = 500  # Notes edited after the last compaction
+REPEAT = 20
+
+
+def _vocabulary(rng: random.Random) -> list[str]:
+    """Distinct made-up words, most frequent first."""
+    words = {}
+    while len(words) < VOCABULARY:
+        length = min(3 + int(rng.expovariate(0.35)), 14)
+        words["".join(rng.choices("abcdefghijklmnoprstuvwy", k=length))] = None
+    return list(words)
+
+
+def _notes(rng: random.Random, words: list[str]):
+    weights = list(itertools.accumulate(
+        (rank + 1) ** -ZIPF_S for rank in range(len(words))
+    ))
+    # Average word plus space is about 7 characters
+    count = NOTE_CHARS // 7
+    for _ in range(NOTES):
+        yield " ".join(rng.choices(words, cum_weights=weights, k=count))
+
+
+def _latency(index: SearchIndex, query: str) -> tuple[float, int]:
+    """Median time of a query in ms, and its number of hits."""
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        index.search(query)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3, len(index.search(query, limit=None))
+
+
+def _report_queries(report, index: SearchIndex, words: list[str]):
+    queries = [
+        ("common word", words[0]),
+        ("rank 100 word", words[100]),
+        ("rank 10k word", words[10_000]),
+        ("two words (AND)", f"{words[5]} {words[500]}"),
+        ("1-letter prefix", words[0][:1]),
+        ("2-letter prefix", words[50][:2]),
+        ("3-letter prefix", words[500][:3]),
+    ]
+    for label, query in queries:
+        ms, hits = _latency(index, query)
+        report(f"  {label:<16} {query!r:<22} {ms:8.2f} ms  {hits:>6} notes")
+
+
+def run(report):
+    rng = random.Random(0)
+    words = _vocabulary(rng)
+    index = SearchIndex()
+    chars = 0
+    start = time.perf_counter()
+    for number, text in enumerate(_notes(rng, words)):
+        index.update(f"note-{number}", text, 1.0)
+        chars += len(text)
+    built = time.perf_counter() - start
+    report(
+        f"{NOTES} notes, {chars / 1e6:.1f} MB of text, {VOCABULARY} Zipf-distributed words; "
+        f"median of {REPEAT} queries (limit 20)"
+    )
+    report(f"  indexing from scratch {built:.1f} s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "search-index.bin"
+        start = time.perf_counter()
+        index.save(path)
+        report(
+            f"  compact and save {time.perf_counter() - start:.2f} s, "
+            f"{path.stat().st_size / 1e6:.1f} MB on disk"
+        )
+        del index
+        loads = []
+        for _ in range(5):
+            start = time.perf_counter()
+            index = SearchIndex.load(path)
+            loads.append(time.perf_counter() - start)
+        report(f"  cold load {min(loads) * 1e3:.0f} ms (best of 5)")
+
+    report("compacted:")
+    _report_queries(report, index, words)
+
+    for number, text in zip(range(REINDEXED), _notes(rng, words)):
+        index.update(f"note-{number}", text, 2.0)
+    report(f"after re-indexing {REINDEXED} notes, not compacted:")
+    _report_queries(report, index, words)
@@ -0,0 +1,82 @@
+"""serialize_buffer on a 1 MB formatted note, against the old per-toggle walk."""
+
+from .common import best_of, formatted_runs, require_gtk
+
+TARGET_CHARS = 1_000_000
+HIGHLIGHT_EVERY = 40  # Characters between anonymous tag ranges
+
+
+def run(report):
+    Gtk = require_gtk()
+    from stickies.formatting import create_tag_table
+    from stickies.serializer import deserialize_to_buffer, serialize_buffer
+
+    runs = []
+    seed = 0
+    while sum(len(r["text"]) for r in runs) < TARGET_CHARS:
+        runs += formatted_runs(5_000, seed)
+        seed += 1
+    buffer = Gtk.TextBuffer(tag_table=create_tag_table())
+    deserialize_to_buffer(buffer, runs)
+    expected = serialize_buffer(buffer)
+    assert _legacy_serialize(buffer) == expected
+    chars = buffer.get_char_count()
+    report(f"{chars} characters, {len(expected)} runs, best of 3")
+    report(f"  old walk          {best_of(lambda: _legacy_serialize(buffer), 3) * 1000:8.1f} ms")
+    report(f"  serialize_buffer  {best_of(lambda: serialize_buffer(buffer), 3) * 1000:8.1f} ms")
+
+    # Anonymous tags (like a search highlight) add toggles but no formatting
+    highlight = buffer.create_tag(None, background="yellow")
+    for offset in range(0, chars, HIGHLIGHT_EVERY):
+        buffer.apply_tag(
+            highlight,
+            buffer.get_iter_at_offset(offset),
+            buffer.get_iter_at_offset(offset + HIGHLIGHT_EVERY // 2),
+        )
+    assert serialize_buffer(buffer) == expected
+    report(f"with an anonymous tag every {HIGHLIGHT_EVERY} characters:")
+    report(f"  old walk          {best_of(lambda: _legacy_serialize(buffer), 3) * 1000:8.1f} ms")
+    report(f"  serialize_buffer  {best_of(lambda: serialize_buffer(buffer), 3) * 1000:8.1f} ms")
+
+
+def _legacy_serialize(buffer) -> list[dict]:
+    """serialize_buffer as it was before runs were merged in one pass."""
+    runs = []
+    start = buffer.get_start_iter()
+    end = buffer.get_end_iter()
+    it = start.copy()
+    while it.compare(end) < 0:
+        next_it = it.copy()
+        next_it.forward_to_tag_toggle(None)
+        if next_it.compare(end) > 0:
+            next_it = end.copy()
+        if it.equal(next_it) and not next_it.forward_char():
+            next_it = end.copy()
+        text = buffer.get_text(it, next_it, True)
+        if text:
+            run = {"text": text}
+            for tag in it.get_tags():
+                name = tag.get_property("name")
+                if name is None:
+                    continue
+                if name in ("bold", "italic", "underline", "strikethrough"):
+                    run[name] = True
+                elif name.startswith("size-"):
+                    run["size"] = int(name[5:])
+                elif name.startswith("family-"):
+                    run["family"] = name[7:]
+                elif name.startswith("color-"):
+                    run["color"] = name[6:]
+            runs.append(run)
+        it = next_it
+
+    merged = runs[:1]
+    for run in runs[1:]:
+        prev = merged[-1]
+        prev_fmt = {k: v for k, v in prev.items() if k != "text"}
+        curr_fmt = {k: v for k, v in run.items() if k != "text"}
+        if prev_fmt == curr_fmt:
+            prev["text"] += run["text"]
+        else:
+            merged.append(run)
+    return merged
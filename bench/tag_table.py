@@ -0,0 +1,55 @@
+"""Memory of 200 note buffers with per-buffer or shared formatting tags.
+
+Each variant runs in a fresh process so resident memory is comparable.
+"""
+
+import json
+import subprocess
+import sys
+
+from .common import formatted_runs, require_gtk, rss_kib
+
+NOTES = 200
+
+
+def run(report):
+    require_gtk()
+    report(f"{NOTES} buffers, each with a 2,000-run formatted note")
+    for variant in ("per-buffer", "shared"):
+        result = subprocess.run(
+            [sys.executable, "-m", "bench.tag_table", variant],
+            capture_output=True, text=True, check=True,
+        )
+        stats = json.loads(result.stdout)
+        report(
+            f"  {variant:<10}  {stats['tags']:>6} tags"
+            f"  +{stats['rss_kib'] / 1024:6.1f} MiB resident"
+        )
+
+
+def _measure(variant: str) -> dict:
+    Gtk = require_gtk()
+    from stickies.formatting import create_tag_table, get_style_registry
+    from stickies.serializer import deserialize_to_buffer
+
+    runs = formatted_runs(2_000)
+    before = rss_kib()
+    shared = create_tag_table() if variant == "shared" else None
+    tables = set()
+    buffers = []
+    for _ in range(NOTES):
+        # Before the shared table, setup_tags filled every buffer's own table
+        table = shared or create_tag_table()
+        buffer = Gtk.TextBuffer(tag_table=table)
+        get_style_registry(table).track_buffer(buffer)
+        deserialize_to_buffer(buffer, runs)
+        tables.add(table)
+        buffers.append(buffer)
+    return {
+        "tags": sum(table.get_size() for table in tables),
+        "rss_kib": rss_kib() - before,
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(_measure(sys.argv[1])))
@@ -0,0 +1,55 @@
+"""Widgets and construction time per note window, lazy or eagerly built."""
+
+import time
+
+from .common import formatted_runs, require_gtk
+
+NOTES = 50
+
+
+def run(report):
+    Gtk = require_gtk()
+    from gi.repository import Adw, Gio
+    from stickies.formatting import create_tag_table
+    from stickies.models import Note
+    from stickies.note_window import NoteWindow
+
+    app = Adw.Application(
+        application_id="com.claude.stickies.Bench", flags=Gio.ApplicationFlags.NON_UNIQUE,
+    )
+    app.register(None)
+    app.tag_table = create_tag_table()
+    content = formatted_runs(50)
+
+    def build_eagerly(win):
+        """What NoteWindow.__init__ built before popovers and toolbar were lazy."""
+        win._ensure_toolbar()
+        for widget in _walk(win):
+            if isinstance(widget, Gtk.MenuButton) and widget.get_popover() is None:
+                if widget is win.color_btn:
+                    win._create_text_color_popup(widget)
+                else:
+                    win._create_menu_popup(widget)
+
+    report(f"mean over {NOTES} untouched notes, widgets including GTK's internal children")
+    for name, finish in (("eager", build_eagerly), ("lazy", lambda win: None)):
+        windows = []
+        start = time.perf_counter()
+        for _ in range(NOTES):
+            win = NoteWindow(app, Note(content=list(content)))
+            finish(win)
+            windows.append(win)
+        elapsed = (time.perf_counter() - start) / NOTES
+        widgets = sum(len(list(_walk(win))) for win in windows) / NOTES
+        report(f"  {name:<6} {widgets:6.0f} widgets  {elapsed * 1000:6.2f} ms per window")
+        for win in windows:
+            win._is_deleting = True
+            win.destroy()
+
+
+def _walk(widget):
+    yield widget
+    child = widget.get_first_child()
+    while child is not None:
+        yield from _walk(child)
+        child = child.get_next_sibling()
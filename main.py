@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Claude Stickies - A macOS Stickies clone for GNOME."""
 
+import logging
 import os
 import sys
 
@@ -8,10 +9,20 @@ import sys
 # Wayland has no client API for this. XWayland works fine for small windows.
 os.environ.setdefault("GDK_BACKEND", "x11")
 
-from stickies.app import StickiesApp
+from stickies import cli
 
 
 def main():
+    logging.basicConfig(
+        level=os.environ.get("STICKIES_LOG_LEVEL", "WARNING").upper(),
+        format="%(name)s: %(message)s",
+    )
+    if len(sys.argv) > 1 and sys.argv[1] in cli.COMMANDS:
+        return cli.main(sys.argv[1:])
+
+    # Importing GTK initializes it, which needs a display; scripting
+    # commands above run without one
+    from stickies.app import StickiesApp
     app = StickiesApp()
     return app.run(sys.argv)
 
@@ -1,30 +1,89 @@
 """Main application class."""
 
+import dataclasses
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+
 import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 from gi.repository import Gtk, Adw, Gio, Gdk, GLib
 
-from .models import Note
-from .storage import load_notes, save_notes
+from .dbus_api import APP_ID, NotesService
+from .manager import NoteManagerWindow
+from .models import Note, append_text, note_title
+from .storage import get_storage, load_headers, load_note_content
 from .note_window import NoteWindow
 from .css import generate_css
+from .formatting import create_tag_table
+from .indexer import IndexWorker
+from .save_scheduler import SaveScheduler
+from .search import COMPACT_PENDING, SearchIndex
 from .shortcuts import setup_app_shortcuts
+from .startup import StartupScheduler
+from .writer import SaveWriter
+from . import x11
+
+logger = logging.getLogger(__name__)
+
+
+def _hibernate_idle_seconds() -> float:
+    """STICKIES_HIBERNATE_IDLE: hibernate windows unused this long (0 = never)."""
+    value = os.environ.get("STICKIES_HIBERNATE_IDLE", "0")
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        logger.warning("Ignoring invalid STICKIES_HIBERNATE_IDLE %r", value)
+        return 0.0
 
 
 class StickiesApp(Adw.Application):
     def __init__(self):
         super().__init__(
-            application_id="com.claude.stickies",
+            application_id=APP_ID,
             flags=Gio.ApplicationFlags.FLAGS_NONE,
         )
         self.notes: dict[str, Note] = {}  # id -> Note
         self.windows: dict[str, NoteWindow] = {}  # id -> NoteWindow
-        self._save_timeout_id = None
+        self.save_scheduler = SaveScheduler(self._do_save)
+        self._dirty_ids: set[str] = set()  # notes changed since last save
+        self.last_save_serialized = 0  # notes re-serialized by the last save
+        self._writer: SaveWriter | None = None
+        # Callbacks of save_now(), with the writer submission they wait for
+        self._save_waiters: list[tuple[int, Callable]] = []
+        self.tag_table = None  # Formatting tags shared by all note buffers
+        self._startup: StartupScheduler | None = None
+        self._titles: dict[str, str] = {}  # id -> title, known without content
+        self.manager: NoteManagerWindow | None = None
+        self.search_index: SearchIndex | None = None  # None until loaded
+        self._indexer: IndexWorker | None = None
+        # Notes being tokenized: id -> (latest request, version to record)
+        self._index_pending: dict[str, tuple[int, float]] = {}
+        self._index_requests = 0
+        self._service = NotesService(self)
+
+    def do_dbus_register(self, connection, object_path):
+        if not Adw.Application.do_dbus_register(self, connection, object_path):
+            return False
+        try:
+            self._service.register(connection, object_path)
+        except GLib.Error as exc:
+            logger.warning("Scripting interface unavailable: %s", exc.message)
+        return True
+
+    def do_dbus_unregister(self, connection, object_path):
+        self._service.unregister(connection)
+        Adw.Application.do_dbus_unregister(self, connection, object_path)
 
     def do_startup(self):
         Adw.Application.do_startup(self)
 
+        self.tag_table = create_tag_table()
+
         # Load CSS
         css_provider = Gtk.CssProvider()
         css_provider.load_from_string(generate_css())
@@ -39,62 +98,346 @@ class StickiesApp(Adw.Application):
         new_action.connect("activate", self._on_new_note)
         self.add_action(new_action)
 
+        manager_action = Gio.SimpleAction.new("show-manager", None)
+        manager_action.connect("activate", lambda *_: self.show_manager())
+        self.add_action(manager_action)
+
         quit_action = Gio.SimpleAction.new("quit", None)
         quit_action.connect("activate", lambda *_: self.quit())
         self.add_action(quit_action)
 
         setup_app_shortcuts(self)
 
+        self._writer = SaveWriter(
+            get_storage(), on_done=self._on_save_done, on_error=self._on_save_error,
+        )
+        self._indexer = IndexWorker(get_storage(), on_done=self._on_note_analyzed)
+
+        idle = _hibernate_idle_seconds()
+        if idle:
+            GLib.timeout_add_seconds(
+                max(1, int(min(idle, 60))), self._hibernate_idle_windows, idle,
+            )
+
+    def do_shutdown(self):
+        if self._startup is not None:
+            self._startup.cancel()
+        # Save pending changes now instead of waiting for the timer
+        self.save_scheduler.flush()
+        stats = self.save_scheduler.stats
+        logger.debug(
+            "Save stats: %d saves, %d of %d requests coalesced, worst staleness %.2f s",
+            stats.saves, stats.coalesced, stats.requests, stats.max_staleness,
+        )
+        # Notes still being tokenized are re-indexed on the next launch
+        self._indexer.close()
+        # Write out everything already queued before the process exits
+        self._writer.close()
+        if self.search_index is not None and self.search_index.dirty:
+            try:
+                self.search_index.save()
+            except OSError:
+                logger.exception("Saving the search index failed")
+        x11.get_connection().close()
+        Adw.Application.do_shutdown(self)
+
     def do_activate(self):
-        # Load saved notes
-        saved = load_notes()
+        if self._startup is not None:
+            # Already running; just bring a note forward
+            win = next(iter(self.windows.values()), self.manager)
+            if win is not None:
+                win.present()
+            return
+
+        started = time.monotonic()
+        # Load note metadata only; content is read when a window needs it
+        headers = load_headers()
+        saved = [header.to_note() for header in headers]
+        self._titles = {header.id: header.title for header in headers}
         if not saved:
             # Create a default note
             saved = [Note()]
 
         for note in saved:
             self.notes[note.id] = note
-            self._open_note_window(note)
+        # Hibernated notes stay as data; show the most recent open note
+        # first and build the others when idle
+        awake = [note for note in saved if not note.hibernated]
+        self._startup = StartupScheduler(self, awake, started)
+        self._startup.start()
+        if not awake:
+            self.show_manager()
 
-    def _open_note_window(self, note: Note):
-        """Create and show a window for a note."""
+        # Reading the saved search index can take a moment for big archives
+        threading.Thread(
+            target=self._load_search_index, name="stickies-index", daemon=True,
+        ).start()
+
+    def _load_search_index(self):
+        index = SearchIndex.load()
+        GLib.idle_add(self._on_search_index_loaded, index)
+
+    def _on_search_index_loaded(self, index: SearchIndex):
+        """Install the loaded index and re-index notes changed since it was saved."""
+        outdated = index.outdated(self.notes.values())
+        self.search_index = index
+        if outdated:
+            logger.info("Indexing %d notes for search", len(outdated))
+        for note_id in outdated:
+            note = self.notes[note_id]
+            self._queue_index(note_id, note.content, note.updated_at)
+        return False
+
+    def _queue_index(self, note_id: str, runs: list[dict] | None, version: float):
+        """Have the indexer tokenize a note; runs=None reads its saved content."""
+        self._index_requests += 1
+        self._index_pending[note_id] = (self._index_requests, version)
+        self._indexer.submit(note_id, runs, self._index_requests)
+
+    def _on_note_analyzed(self, note_id: str, request: int, counts: Counter | None):
+        """Called on the main loop with the term counts of a queued note."""
+        pending = self._index_pending.get(note_id)
+        if pending is None or pending[0] != request:
+            return False  # Deleted, or queued again since
+        del self._index_pending[note_id]
+        index = self.search_index
+        if counts is not None and note_id in self.notes:
+            index.update_counts(note_id, counts, pending[1])
+        if not self._index_pending and index.pending >= COMPACT_PENDING:
+            index.compact()
+        return False
+
+    def search_notes(self, query: str) -> list[str]:
+        """Ids of notes matching query, best first.
+
+        Until the index is loaded, notes are matched by title only.
+        """
+        if self.search_index is None:
+            needle = query.casefold()
+            return [i for i in self.notes if needle in self._titles.get(i, "").casefold()]
+        return [
+            hit.note_id for hit in self.search_index.search(query, limit=None)
+            if hit.note_id in self.notes
+        ]
+
+    def open_note_window(self, note: Note, present: bool = True) -> NoteWindow:
+        """Create and show a window for a note.
+
+        With present=False the window is shown without being raised.
+        """
+        if note.content is None:
+            # Dropped only after being written, so storage has it
+            note.content = load_note_content(note.id)
         win = NoteWindow(app=self, note=note)
         self.windows[note.id] = win
-        win.present()
+        if present:
+            win.present()
+        else:
+            win.set_visible(True)
+        if self.manager is not None:
+            self.manager.model.note_changed(note.id)
+        return win
+
+    def open_note(self, note_id: str):
+        """Raise a note's window, waking the note from hibernation if needed."""
+        win = self.windows.get(note_id)
+        if win is not None:
+            win.present()
+            return
+        note = self.notes[note_id]
+        if note.hibernated:
+            note.hibernated = False
+            self._dirty_ids.add(note_id)
+            self.schedule_save()
+        self.open_note_window(note)
+
+    def hibernate_note(self, note_id: str):
+        """Close a note's window, keeping the note only as data."""
+        win = self.windows.get(note_id)
+        if win is not None:
+            win.close()
+
+    def note_title(self, note_id: str) -> str:
+        """Title of a note as of its last save; works for hibernated notes."""
+        return self._titles.get(note_id, "")
+
+    def show_manager(self):
+        """Show the note manager window."""
+        if self.manager is None:
+            self.manager = NoteManagerWindow(self)
+            self.manager.connect("close-request", self._on_manager_closed)
+        self.manager.present()
+
+    def _on_manager_closed(self, window):
+        self.manager = None
+        if not self.windows and not self._startup.running:
+            self.quit()
+        return False
+
+    def _hibernate_idle_windows(self, idle: float) -> bool:
+        """Hibernate windows that have not been focused or edited for idle seconds."""
+        cutoff = time.monotonic() - idle
+        for note_id, win in list(self.windows.items()):
+            if len(self.windows) <= 1 and self.manager is None:
+                break  # Keep one window so the app stays reachable
+            if not win.is_active() and win.last_used < cutoff:
+                logger.debug("Hibernating idle note %s", note_id)
+                self.hibernate_note(note_id)
+        return True
 
     def _on_new_note(self, action, param):
         """Create a new note."""
         note = Note()
         self.notes[note.id] = note
-        self._open_note_window(note)
+        self._dirty_ids.add(note.id)
+        if self.manager is not None:
+            self.manager.model.refresh()
+        self.open_note_window(note)
         self.schedule_save()
 
     def delete_note(self, note_id: str):
-        """Delete a note and close its window."""
-        if note_id in self.notes:
-            del self.notes[note_id]
-        if note_id in self.windows:
-            win = self.windows.pop(note_id)
-            win._is_deleting = True
-            win.close()
-        self.schedule_save()
+        """Delete a note and close its window, from the note's own menu.
 
-        # If no notes left, create a new one
+        Deleting the last note replaces it with an empty one, so there is
+        still a window to work with.
+        """
+        self.delete_notes([note_id])
         if not self.notes:
             self._on_new_note(None, None)
 
+    def delete_notes(self, note_ids: list[str]):
+        """Delete notes and close their windows, with a single save."""
+        for note_id in note_ids:
+            if note_id in self.notes:
+                del self.notes[note_id]
+            self._titles.pop(note_id, None)
+            if self.search_index is not None:
+                self.search_index.remove(note_id)
+            self._index_pending.pop(note_id, None)
+            if note_id in self.windows:
+                win = self.windows.pop(note_id)
+                win._is_deleting = True
+                win.close()
+        if self.manager is not None:
+            self.manager.model.refresh()
+        self.schedule_save()
+
+    # --- Batch commands (see dbus_api) ---
+
+    def list_notes(self) -> list[Note]:
+        """All notes, with changes in open windows synced."""
+        self.save_scheduler.flush()
+        return list(self.notes.values())
+
+    def create_notes(self, texts: list[str], color: str | None = None) -> list[str]:
+        """Add notes, one per text, without opening windows."""
+        notes = []
+        for text in texts:
+            note = Note(content=[{"text": text}] if text else [])
+            if color is not None:
+                note.color = color
+            notes.append(note)
+        return self.add_notes(notes)
+
+    def add_notes(self, notes: list[Note]) -> list[str]:
+        """Add notes as hibernated, replacing (and closing) any with the same id."""
+        for note in notes:
+            note.hibernated = True
+            win = self.windows.pop(note.id, None)
+            if win is not None:
+                win._is_deleting = True
+                win.close()
+            self.notes[note.id] = note
+            self._titles[note.id] = note_title(note.content)
+            self._dirty_ids.add(note.id)
+        if self.manager is not None:
+            self.manager.model.refresh()
+        self.schedule_save()
+        return [n.id for n in notes]
+
+    def append_to_notes(self, note_ids: list[str], text: str):
+        """Append a line of text to each note; open windows show it as an edit."""
+        for note_id in note_ids:
+            win = self.windows.get(note_id)
+            if win is not None:
+                win.append_text(text)
+                continue
+            note = self.notes[note_id]
+            if note.content is None:
+                note.content = load_note_content(note_id)
+            note.content = append_text(note.content, text)
+            note.updated_at = time.time()
+            self._dirty_ids.add(note_id)
+            title = note_title(note.content)
+            if self._titles.get(note_id) != title:
+                self._titles[note_id] = title
+                if self.manager is not None:
+                    self.manager.model.note_changed(note_id)
+        self.schedule_save()
+
+    def recolor_notes(self, note_ids: list[str], color: str):
+        """Change the color of notes."""
+        for note_id in note_ids:
+            win = self.windows.get(note_id)
+            if win is not None:
+                win.set_color(color)
+                continue
+            note = self.notes[note_id]
+            note.color = color
+            note.updated_at = time.time()
+            self._dirty_ids.add(note_id)
+            if self.manager is not None:
+                self.manager.model.note_changed(note_id)
+        self.schedule_save()
+
+    def export_notes(self, note_ids: list[str] | None = None) -> list[Note]:
+        """Copies of notes (all if note_ids is None) with their content."""
+        self.save_scheduler.flush()
+        exported = []
+        for note_id in self.notes if note_ids is None else note_ids:
+            note = dataclasses.replace(self.notes[note_id])
+            if note.content is None:
+                note.content = load_note_content(note_id)
+            exported.append(note)
+        return exported
+
+    def save_now(self, on_saved: Callable):
+        """Save all changes right away without waiting for them to be written.
+
+        on_saved(error) is called on the main loop once they are, with
+        error None on success.
+        """
+        self.save_scheduler.request()
+        self.save_scheduler.flush()
+        self._save_waiters.append((self._writer.submitted, on_saved))
+
     def on_window_closed(self, note_id: str):
-        """Called when a note window is closed (not deleted)."""
+        """Called when a note window is closed (not deleted).
+
+        The note is hibernated unless this was the last window, in which
+        case the app quits and the note reopens on the next start.
+        """
         if note_id in self.windows:
             # Save current state before removing
             win = self.windows[note_id]
-            self._sync_note_from_window(win)
+            if win.is_dirty:
+                self._sync_note_from_window(win)
             del self.windows[note_id]
-        self.schedule_save()
 
-        # If no windows left, quit
-        if not self.windows:
+        # If no windows left (and none still to be built at startup), quit
+        if not self.windows and self.manager is None and not self._startup.running:
+            self.schedule_save()
             self.quit()
+            return
+
+        note = self.notes.get(note_id)
+        if note is not None:
+            # Content is dropped once the save has written it
+            note.hibernated = True
+            self._dirty_ids.add(note_id)
+            if self.manager is not None:
+                self.manager.model.note_changed(note_id)
+        self.schedule_save()
 
     def _sync_note_from_window(self, win: NoteWindow):
         """Update note data from window state."""
@@ -104,18 +447,89 @@ class StickiesApp(Adw.Application):
         note.color = win.current_color
         note.always_on_top = win.always_on_top
         note.translucent = win.translucent
+        note.updated_at = time.time()
+        win._synced_gen = win._dirty_gen
+        self._dirty_ids.add(note.id)
+        title = note_title(note.content)
+        if self._titles.get(note.id) != title:
+            self._titles[note.id] = title
+            if self.manager is not None:
+                self.manager.model.note_changed(note.id)
 
     def schedule_save(self):
-        """Debounced save - saves 500ms after last change."""
-        if self._save_timeout_id:
-            GLib.source_remove(self._save_timeout_id)
-        self._save_timeout_id = GLib.timeout_add(500, self._do_save)
+        """Request a save once changes settle (see SaveScheduler)."""
+        self.save_scheduler.request()
 
     def _do_save(self):
         """Actually persist notes."""
-        # Sync all open windows
+        # Only re-serialize windows that changed since the last save
+        serialized = 0
         for note_id, win in self.windows.items():
-            self._sync_note_from_window(win)
-        save_notes(list(self.notes.values()))
-        self._save_timeout_id = None
-        return False  # Don't repeat
+            if win.is_dirty:
+                self._sync_note_from_window(win)
+                serialized += 1
+        self.last_save_serialized = serialized
+        logger.debug(
+            "Saving: re-serialized %d of %d open notes", serialized, len(self.windows)
+        )
+        # Hand immutable snapshots to the writer thread; encoding and disk
+        # I/O happen there
+        changed = [
+            dataclasses.replace(self.notes[note_id])
+            for note_id in self._dirty_ids
+            if note_id in self.notes
+        ]
+        self._writer.submit(list(self.notes), changed)
+        self._dirty_ids.clear()
+        # Keep search results in step with what was saved; tokenizing
+        # happens on the indexer thread
+        if self.search_index is not None:
+            for note in changed:
+                pending = self._index_pending.get(note.id)
+                if note.content is not None:
+                    self._queue_index(note.id, note.content, note.updated_at)
+                elif pending is not None:
+                    # Text unchanged since the queued request
+                    self._index_pending[note.id] = (pending[0], note.updated_at)
+                else:
+                    self.search_index.set_version(note.id, note.updated_at)
+
+    def _on_save_done(self, written: list[Note], batch: int):
+        """Called on the main loop after the writer finished a batch."""
+        # Hibernated notes only keep their metadata in memory, but their
+        # content is dropped only once it is on disk and unchanged since
+        for snapshot in written:
+            note = self.notes.get(snapshot.id)
+            if (note is not None and note.id not in self.windows
+                    and note.id not in self._dirty_ids
+                    and note.content is snapshot.content):
+                note.content = None
+        logger.debug("Saved %d changed notes", len(written))
+        self._answer_save_waiters(batch, None)
+        return False
+
+    def _on_save_error(self, failed: list[Note], error: Exception, batch: int):
+        """Called on the main loop when the writer failed to save."""
+        # Keep the notes dirty and retry; a note whose content was dropped
+        # after an earlier save gets it back from the failed snapshot
+        for snapshot in failed:
+            note = self.notes.get(snapshot.id)
+            if note is None:
+                continue
+            if note.content is None:
+                note.content = snapshot.content
+            self._dirty_ids.add(note.id)
+        if failed:
+            self.schedule_save()
+        self._answer_save_waiters(batch, error)
+        return False
+
+    def _answer_save_waiters(self, batch: int, error: Exception | None):
+        """Call the save_now() callbacks whose changes the batch included."""
+        waiting = []
+        for submission, on_saved in self._save_waiters:
+            if submission <= batch:
+                on_saved(error)
+            else:
+                waiting.append((submission, on_saved))
+        self._save_waiters = waiting
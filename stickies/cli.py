@@ -0,0 +1,319 @@
+"""Command-line note operations for scripts; never opens a window.
+
+    main.py list | create | append | search | recolor | export | import | delete ...
+
+When an instance is running, commands are forwarded to it over D-Bus (see
+dbus_api) so they show up in its notes and are saved with them. Otherwise
+they run against storage directly. Either way each command is one batch
+with a single save, however many notes it touches; only export and import
+stream notes through in batches of BATCH_NOTES, to keep memory flat.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from gi.repository import Gio, GLib
+
+from .colors import COLOR_ORDER
+from .dbus_api import (
+    APP_ID, INTERFACE, OBJECT_PATH, CommandError, check_args, check_new_ids,
+)
+from .convert import FORMATS, batched, default_jobs, export_notes, import_files
+from .models import Note, NoteHeader, append_text
+from .search import open_index
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+COMMANDS = ("list", "create", "append", "search", "recolor", "export", "import", "delete")
+CALL_TIMEOUT_MS = 5 * 60 * 1000  # Large batches can take a while to save
+BATCH_NOTES = 500  # Notes per save (or D-Bus call) when exporting or importing
+
+
+class LocalNotes:
+    """Runs commands directly against storage, writing once per command."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._headers = {h.id: h for h in storage.load_headers()}
+
+    def list_notes(self) -> list[tuple[str, str, str, float]]:
+        return [(h.id, h.color, h.title, h.updated_at) for h in self._headers.values()]
+
+    def create_notes(self, texts: list[str], color: str | None) -> list[str]:
+        check_args((), color=color)
+        notes = []
+        for text in texts:
+            note = Note(content=[{"text": text}] if text else [])
+            if color is not None:
+                note.color = color
+            notes.append(note)
+        self._add(notes)
+        return [n.id for n in notes]
+
+    def append_to_notes(self, note_ids: list[str], text: str):
+        check_args(self._headers, note_ids)
+        changed = []
+        for note_id in dict.fromkeys(note_ids):
+            note = self._headers[note_id].to_note()
+            note.content = append_text(self.storage.load_content(note_id), text)
+            note.updated_at = time.time()
+            changed.append(note)
+        self.storage.write(list(self._headers), changed)
+
+    def search_notes(self, query: str, limit: int) -> list[tuple[str, str]]:
+        index = open_index(self.storage)
+        hits = [
+            (hit.note_id, self._headers[hit.note_id].title)
+            for hit in index.search(query, limit=limit or None)
+            if hit.note_id in self._headers
+        ]
+        if index.dirty:
+            # Keep the notes just indexed for the next search
+            try:
+                index.save()
+            except OSError as exc:
+                logger.warning("Could not save the search index: %s", exc)
+        return hits
+
+    def recolor_notes(self, note_ids: list[str], color: str):
+        check_args(self._headers, note_ids, color)
+        changed = []
+        for note_id in dict.fromkeys(note_ids):
+            # Content stays None, so only metadata is written
+            note = self._headers[note_id].to_note()
+            note.color = color
+            note.updated_at = time.time()
+            changed.append(note)
+        self.storage.write(list(self._headers), changed)
+
+    def export_notes(self, note_ids: list[str]) -> Iterator[dict]:
+        check_args(self._headers, note_ids)
+        return self._read_notes(note_ids or list(self._headers))
+
+    def import_notes(self, notes: Iterable[dict]) -> Iterator[str]:
+        """Add or replace notes, saving every BATCH_NOTES; yields their ids."""
+        for batch in batched(notes, BATCH_NOTES):
+            batch = [Note.from_dict(data) for data in batch]
+            check_new_ids(n.id for n in batch)
+            self._add(batch)
+            yield from (n.id for n in batch)
+
+    def delete_notes(self, note_ids: list[str]):
+        check_args(self._headers, note_ids)
+        for note_id in note_ids:
+            self._headers.pop(note_id, None)
+        self.storage.write(list(self._headers), [])
+
+    def close(self):
+        self.storage.close()
+
+    def _add(self, notes: list[Note]):
+        """Write new notes, replacing any with the same id."""
+        for note in notes:
+            # Hibernated, so the app does not open a window for each
+            note.hibernated = True
+            self._headers[note.id] = NoteHeader.from_note(note, 0)
+        self.storage.write(list(self._headers), notes)
+
+    def _read_notes(self, note_ids: list[str]) -> Iterator[dict]:
+        # One note's content in memory at a time
+        for note_id in note_ids:
+            note = self._headers[note_id].to_note()
+            note.content = self.storage.load_content(note_id)
+            yield note.to_dict()
+
+
+class RemoteNotes:
+    """Forwards commands to the running instance over D-Bus."""
+
+    def __init__(self, connection: Gio.DBusConnection):
+        self.connection = connection
+
+    def list_notes(self) -> list[tuple[str, str, str, float]]:
+        return self._call("List", None, "(a(sssd))")[0]
+
+    def create_notes(self, texts: list[str], color: str | None) -> list[str]:
+        return self._call("Create", GLib.Variant("(ass)", (texts, color or "")), "(as)")[0]
+
+    def append_to_notes(self, note_ids: list[str], text: str):
+        self._call("Append", GLib.Variant("(ass)", (note_ids, text)))
+
+    def search_notes(self, query: str, limit: int) -> list[tuple[str, str]]:
+        return self._call("Search", GLib.Variant("(su)", (query, limit)), "(a(ss))")[0]
+
+    def recolor_notes(self, note_ids: list[str], color: str):
+        self._call("Recolor", GLib.Variant("(ass)", (note_ids, color)))
+
+    def export_notes(self, note_ids: list[str]) -> Iterator[dict]:
+        known = [row[0] for row in self.list_notes()]
+        check_args(set(known), note_ids)
+        return self._read_notes(note_ids or known)
+
+    def import_notes(self, notes: Iterable[dict]) -> Iterator[str]:
+        for batch in batched(notes, BATCH_NOTES):
+            args = GLib.Variant("(s)", (json.dumps(batch),))
+            yield from self._call("Import", args, "(as)")[0]
+
+    def delete_notes(self, note_ids: list[str]):
+        self._call("Delete", GLib.Variant("(as)", (note_ids,)))
+
+    def close(self):
+        pass
+
+    def _read_notes(self, note_ids: list[str]) -> Iterator[dict]:
+        for batch in batched(note_ids, BATCH_NOTES):
+            reply = self._call("Export", GLib.Variant("(as)", (batch,)), "(s)")
+            yield from json.loads(reply[0])
+
+    def _call(self, method: str, args: GLib.Variant | None, reply_type: str = "()") -> tuple:
+        try:
+            reply = self.connection.call_sync(
+                APP_ID, OBJECT_PATH, INTERFACE, method, args,
+                GLib.VariantType(reply_type), Gio.DBusCallFlags.NO_AUTO_START,
+                CALL_TIMEOUT_MS, None,
+            )
+        except GLib.Error as exc:
+            # Invalid arguments come back as D-Bus errors
+            Gio.DBusError.strip_remote_error(exc)
+            raise CommandError(exc.message) from None
+        return reply.unpack()
+
+
+def running_instance() -> Gio.DBusConnection | None:
+    """The session bus, if an instance currently owns the app's name."""
+    try:
+        bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        reply = bus.call_sync(
+            "org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+            "NameHasOwner", GLib.Variant("(s)", (APP_ID,)), GLib.VariantType("(b)"),
+            Gio.DBusCallFlags.NONE, -1, None,
+        )
+    except GLib.Error:
+        return None
+    return bus if reply.unpack()[0] else None
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="stickies", description="Script notes without opening any window.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="print id, color and title of every note")
+
+    create = commands.add_parser(
+        "create", help="create notes and print their ids",
+        description="Create one note per TEXT, or per line of standard input.",
+    )
+    create.add_argument("texts", nargs="*", metavar="TEXT")
+    create.add_argument("--color", choices=COLOR_ORDER)
+
+    append = commands.add_parser(
+        "append", help="add a line of text to notes",
+        description="Append TEXT (or standard input) as a new line to each note.",
+    )
+    append.add_argument("ids", nargs="+", metavar="ID")
+    append.add_argument("-t", "--text")
+
+    search = commands.add_parser("search", help="print id and title of matching notes")
+    search.add_argument("query", nargs="+", metavar="WORD")
+    search.add_argument("-n", "--limit", type=int, default=0, help="at most this many (0: all)")
+
+    recolor = commands.add_parser("recolor", help="change the color of notes")
+    recolor.add_argument("color", choices=COLOR_ORDER)
+    recolor.add_argument("ids", nargs="+", metavar="ID")
+
+    export = commands.add_parser(
+        "export", help="print notes as JSON, or write Markdown or HTML files",
+        description="Export notes (all if no ID is given). JSON uses the "
+        "notes.json format; Markdown and HTML write one file per note.",
+    )
+    export.add_argument("ids", nargs="*", metavar="ID")
+    export.add_argument("-f", "--format", choices=("json", *FORMATS), default="json")
+    export.add_argument(
+        "-o", "--output", metavar="PATH",
+        help="directory for markdown/html (required); file for json (default: stdout)",
+    )
+    export.add_argument("-j", "--jobs", type=int, default=default_jobs(), help="worker processes")
+
+    import_ = commands.add_parser(
+        "import", help="add notes from Markdown or HTML files and print their ids",
+        description="Import .md and .html files, and those in given directories. "
+        "Notes keep the id in the file, replacing a note with the same id.",
+    )
+    import_.add_argument("paths", nargs="+", metavar="PATH")
+    import_.add_argument("-j", "--jobs", type=int, default=default_jobs(), help="worker processes")
+
+    delete = commands.add_parser("delete", help="delete notes")
+    delete.add_argument("ids", nargs="+", metavar="ID")
+    return parser
+
+
+def _run(notes, args) -> None:
+    out = sys.stdout
+    if args.command == "list":
+        for note_id, color, title, _ in notes.list_notes():
+            out.write(f"{note_id}\t{color}\t{title}\n")
+    elif args.command == "create":
+        texts = args.texts or sys.stdin.read().splitlines()
+        for note_id in notes.create_notes(texts, args.color):
+            out.write(f"{note_id}\n")
+    elif args.command == "append":
+        text = args.text if args.text is not None else sys.stdin.read().rstrip("\n")
+        notes.append_to_notes(args.ids, text)
+    elif args.command == "search":
+        for note_id, title in notes.search_notes(" ".join(args.query), max(0, args.limit)):
+            out.write(f"{note_id}\t{title}\n")
+    elif args.command == "recolor":
+        notes.recolor_notes(args.ids, args.color)
+    elif args.command == "export":
+        exported = notes.export_notes(args.ids)
+        if args.format != "json":
+            export_notes(exported, Path(args.output), args.format, args.jobs)
+        elif args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                _write_json(exported, f)
+        else:
+            _write_json(exported, out)
+    elif args.command == "import":
+        for note_id in notes.import_notes(import_files(args.paths, args.jobs)):
+            out.write(f"{note_id}\n")
+    elif args.command == "delete":
+        notes.delete_notes(args.ids)
+
+
+def _write_json(notes: Iterable[dict], out):
+    """Write a JSON array one note at a time."""
+    out.write("[")
+    for i, note in enumerate(notes):
+        out.write(",\n" if i else "\n")
+        out.write(json.dumps(note, indent=2))
+    out.write("\n]\n")
+
+
+def main(argv: list[str]) -> int:
+    """Run one command given its arguments (without the program name)."""
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command == "export" and args.format != "json" and not args.output:
+        parser.error(f"export --format {args.format} needs --output DIRECTORY")
+    connection = running_instance()
+    notes = RemoteNotes(connection) if connection is not None else LocalNotes(get_storage())
+    try:
+        _run(notes, args)
+    except CommandError as exc:
+        print(f"stickies: {exc}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # Output was piped into a reader that exited early, e.g. head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        notes.close()
+    return 0
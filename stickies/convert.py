@@ -0,0 +1,448 @@
+"""Convert notes to and from directories of Markdown or HTML files.
+
+Each note becomes one file named after its id. Note metadata (color, size,
+timestamps...) goes in a front matter block (Markdown) or <meta> tags
+(HTML), and run attributes map both ways:
+
+    attribute       Markdown                        HTML
+    bold            **text**                        <b>
+    italic          *text*                          <i>
+    underline       <u>text</u>                     <u>
+    strikethrough   ~~text~~                        <s>
+    size            <span style="font-size: 14pt">  <span style=...>
+    family          <span style="font-family: ..."> <span style=...>
+    color           <span style="color: #cc0000">   <span style=...>
+
+Conversion is CPU-bound, so it runs in worker processes. Notes and files
+are streamed through the pool a chunk at a time, with only a few chunks in
+flight, so memory use does not grow with the number of notes.
+"""
+
+import html
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import re
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from html.parser import HTMLParser
+from pathlib import Path
+
+from .colors import PALETTE
+from .models import note_title
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"markdown": ".md", "html": ".html"}
+IMPORT_SUFFIXES = {".md": "markdown", ".markdown": "markdown", ".html": "html", ".htm": "html"}
+CHUNK_NOTES = 32  # Notes per task sent to a worker process
+
+# Note fields kept in front matter / <meta> tags; content is the body
+_META_FIELDS = (
+    "id", "color", "width", "height", "always_on_top", "translucent",
+    "created_at", "updated_at",
+)
+_ID_RE = re.compile(r"[A-Za-z0-9_-]+")
+
+
+# --- Writing ---
+
+def _markers(run: dict, html_tags: bool) -> list[tuple[str, str]]:
+    """(opening, closing) markup for a run's attributes, outermost first.
+
+    The emphasis markers come last so they are always innermost; the
+    Markdown reader relies on that to split runs of asterisks.
+    """
+    markers = []
+    style = []
+    if "size" in run:
+        style.append(f"font-size: {run['size']}pt")
+    if "family" in run:
+        style.append(f"font-family: '{run['family']}'")
+    if "color" in run:
+        style.append(f"color: {run['color']}")
+    if style:
+        markers.append((f'<span style="{html.escape("; ".join(style))}">', "</span>"))
+    if run.get("underline"):
+        markers.append(("<u>", "</u>"))
+    if run.get("strikethrough"):
+        markers.append(("<s>", "</s>") if html_tags else ("~~", "~~"))
+    if run.get("bold"):
+        markers.append(("<b>", "</b>") if html_tags else ("**", "**"))
+    if run.get("italic"):
+        markers.append(("<i>", "</i>") if html_tags else ("*", "*"))
+    return markers
+
+
+def _markup(runs: list[dict], escape, html_tags: bool) -> str:
+    """Runs as text with nested markup, reopening only what changes."""
+    out = []
+    open_markers: list[tuple[str, str]] = []
+    for run in runs:
+        text = run.get("text", "")
+        if not text:
+            continue
+        markers = _markers(run, html_tags)
+        keep = 0
+        while (
+            keep < len(open_markers) and keep < len(markers)
+            and open_markers[keep] == markers[keep]
+        ):
+            keep += 1
+        out.extend(closing for _, closing in reversed(open_markers[keep:]))
+        out.extend(opening for opening, _ in markers[keep:])
+        open_markers = markers
+        out.append(escape(text))
+    out.extend(closing for _, closing in reversed(open_markers))
+    return "".join(out)
+
+
+_MD_SPECIAL = re.compile(r"([\\`*_~\[\]<>&#|])")
+_MD_BULLET = re.compile(r"^( {0,3})([-+=])", re.MULTILINE)
+_MD_NUMBER = re.compile(r"^( {0,3}\d+)([.)])", re.MULTILINE)
+
+
+def _escape_markdown(text: str) -> str:
+    text = _MD_SPECIAL.sub(r"\\\1", text)
+    # Keep lines from turning into list items or headings in other renderers
+    text = _MD_BULLET.sub(r"\1\\\2", text)
+    return _MD_NUMBER.sub(r"\1\\\2", text)
+
+
+def note_to_markdown(note: dict) -> str:
+    """A note as Markdown with JSON-valued front matter."""
+    lines = ["---"]
+    lines.extend(f"{name}: {json.dumps(note[name])}" for name in _META_FIELDS if name in note)
+    lines.append("---")
+    body = _markup(note.get("content") or [], _escape_markdown, html_tags=False)
+    return "\n".join(lines) + "\n" + body + "\n"
+
+
+def note_to_html(note: dict) -> str:
+    """A note as a standalone HTML page."""
+    content = note.get("content") or []
+    meta = "".join(
+        f'<meta name="stickies:{name}" content="{html.escape(json.dumps(note[name]))}">\n'
+        for name in _META_FIELDS if name in note
+    )
+    palette = PALETTE.get(note.get("color"), PALETTE["yellow"])
+    body = _markup(content, lambda text: html.escape(text, quote=False), html_tags=True)
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"{meta}<title>{html.escape(note_title(content))}</title>\n</head>\n<body>\n"
+        f'<div class="stickies-note" style="white-space: pre-wrap; '
+        f'background: {palette["bg"]}; color: {palette["text"]}">'
+        f"{body}</div>\n</body>\n</html>\n"
+    )
+
+
+# --- Reading ---
+
+class _RunBuilder:
+    """Collects text into runs, merging neighbours with the same attributes."""
+
+    def __init__(self):
+        self.runs: list[dict] = []
+        self._last_key = None
+
+    def add(self, text: str, attrs: dict):
+        if not text:
+            return
+        key = tuple(sorted(attrs.items()))
+        if key == self._last_key:
+            self.runs[-1]["text"] += text
+        else:
+            self.runs.append({"text": text, **attrs})
+            self._last_key = key
+
+    @property
+    def ends_line(self) -> bool:
+        return not self.runs or self.runs[-1]["text"].endswith("\n")
+
+
+def _parse_style(style: str) -> dict:
+    """Run attributes from a CSS style attribute."""
+    attrs = {}
+    for declaration in style.split(";"):
+        name, _, value = declaration.partition(":")
+        name, value = name.strip().lower(), value.strip()
+        if not value:
+            continue
+        if name == "font-size":
+            match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*(pt|px)?", value, re.IGNORECASE)
+            if match:
+                size = float(match[1]) * (0.75 if (match[2] or "").lower() == "px" else 1)
+                attrs["size"] = max(1, round(size))
+        elif name == "font-family":
+            family = value.split(",")[0].strip().strip("'\"")
+            if family:
+                attrs["family"] = family
+        elif name == "color":
+            attrs["color"] = value.lower() if value.startswith("#") else value
+    return attrs
+
+
+def _note_meta(name: str, value: str, note: dict):
+    """Store a front matter / <meta> field in note, ignoring unknown ones."""
+    if name not in _META_FIELDS:
+        return
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass  # Hand-written values may be bare strings
+    if name == "id" and not (isinstance(value, str) and _ID_RE.fullmatch(value)):
+        return
+    note[name] = value
+
+
+_MD_TOKEN = re.compile(
+    r"\\([!-/:-@\[-`{-~])|(\*+)|~~|<(/?)(u|s|span)\b([^>]*)>|&(?:#\d+|#x[0-9a-f]+|\w+);",
+    re.IGNORECASE,
+)
+_STYLE_ATTR = re.compile(r"""style\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE)
+
+
+def note_from_markdown(text: str) -> dict:
+    """Parse a note written by note_to_markdown (or plain Markdown text)."""
+    note = {}
+    if text.startswith("---\n"):
+        end = text.find("\n---\n", 3)
+        if end >= 0:
+            for line in text[4:end].splitlines():
+                name, sep, value = line.partition(":")
+                if sep:
+                    _note_meta(name.strip(), value.strip(), note)
+            text = text[end + 5:]
+    if text.endswith("\n"):
+        text = text[:-1]
+
+    builder = _RunBuilder()
+    emphasis: list[int] = []  # Open asterisk markers (1 italic, 2 bold), innermost last
+    flags = {"underline": 0, "strikethrough": 0}
+    spans: list[dict] = []
+
+    def attrs() -> dict:
+        result = {}
+        for span in spans:
+            result.update(span)
+        if 2 in emphasis:
+            result["bold"] = True
+        if 1 in emphasis:
+            result["italic"] = True
+        result.update((name, True) for name, depth in flags.items() if depth > 0)
+        return result
+
+    pos = 0
+    for match in _MD_TOKEN.finditer(text):
+        builder.add(text[pos:match.start()], attrs())
+        pos = match.end()
+        token = match[0]
+        if match[1] is not None:
+            builder.add(match[1], attrs())
+        elif match[2] is not None:
+            stars = len(match[2])
+            while emphasis and stars >= emphasis[-1]:
+                stars -= emphasis.pop()
+            if stars >= 2:
+                emphasis.append(2)
+                stars -= 2
+            if stars:
+                emphasis.append(1)
+        elif token == "~~":
+            flags["strikethrough"] ^= 1
+        elif match[4] is not None:
+            tag, closing = match[4].lower(), bool(match[3])
+            if tag == "span":
+                if closing:
+                    if spans:
+                        spans.pop()
+                else:
+                    style = _STYLE_ATTR.search(match[5])
+                    spans.append(_parse_style(html.unescape(style[1] or style[2])) if style else {})
+            else:
+                name = "underline" if tag == "u" else "strikethrough"
+                flags[name] = max(0, flags[name] + (-1 if closing else 1))
+        else:
+            builder.add(html.unescape(token), attrs())
+    builder.add(text[pos:], attrs())
+    note["content"] = builder.runs
+    return note
+
+
+class _NoteHTMLParser(HTMLParser):
+    _FLAGS = {
+        "b": "bold", "strong": "bold", "i": "italic", "em": "italic",
+        "u": "underline", "ins": "underline",
+        "s": "strikethrough", "strike": "strikethrough", "del": "strikethrough",
+    }
+    _BLOCKS = {"p", "div", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "pre"}
+    _HIDDEN = {"head", "title", "style", "script"}
+
+    def __init__(self):
+        super().__init__()
+        self.note: dict = {}
+        self.builder = _RunBuilder()
+        self._depth = dict.fromkeys(("bold", "italic", "underline", "strikethrough"), 0)
+        self._spans: list[tuple[str, dict]] = []  # ("span", attributes) of open spans
+        self._hidden = 0
+        self._pre: list[str] = []  # Open elements that preserve whitespace
+        self._break = False  # A block ended; start a new line before more text
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta" and (attrs.get("name") or "").startswith("stickies:"):
+            _note_meta(attrs["name"][9:], attrs.get("content") or "", self.note)
+        elif tag == "br":
+            self.builder.add("\n", self._attrs())
+        elif tag in self._HIDDEN:
+            self._hidden += 1
+        elif tag in self._FLAGS:
+            self._depth[self._FLAGS[tag]] += 1
+        style = attrs.get("style") or ""
+        if tag == "span":
+            self._spans.append((tag, _parse_style(style)))
+        if tag == "pre" or "white-space: pre" in style.lower():
+            self._pre.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._HIDDEN:
+            self._hidden = max(0, self._hidden - 1)
+        elif tag in self._FLAGS:
+            name = self._FLAGS[tag]
+            self._depth[name] = max(0, self._depth[name] - 1)
+        if self._spans and self._spans[-1][0] == tag:
+            self._spans.pop()
+        if self._pre and self._pre[-1] == tag:
+            self._pre.pop()
+        if tag in self._BLOCKS:
+            self._break = True
+
+    def handle_data(self, data):
+        if self._hidden:
+            return
+        if not self._pre:
+            # Outside <pre>, whitespace is layout only
+            data = re.sub(r"\s+", " ", data)
+            if self.builder.ends_line or self._break:
+                data = data.lstrip()
+        if not data:
+            return
+        if self._break and not self.builder.ends_line:
+            self.builder.add("\n", {})
+        self._break = False
+        self.builder.add(data, self._attrs())
+
+    def _attrs(self) -> dict:
+        result = {}
+        for _, span in self._spans:
+            result.update(span)
+        result.update((name, True) for name, depth in self._depth.items() if depth)
+        return result
+
+
+def note_from_html(text: str) -> dict:
+    """Parse a note written by note_to_html (or other simple HTML)."""
+    parser = _NoteHTMLParser()
+    parser.feed(text)
+    parser.close()
+    parser.note["content"] = parser.builder.runs
+    return parser.note
+
+
+# --- Files ---
+
+def _export_chunk(notes: list[dict], directory: Path, fmt: str) -> int:
+    convert = note_to_markdown if fmt == "markdown" else note_to_html
+    written = 0
+    for note in notes:
+        if not _ID_RE.fullmatch(note["id"]):
+            logger.warning("Not exporting note with unusable id %r", note["id"])
+            continue
+        path = directory / f"{note['id']}{FORMATS[fmt]}"
+        path.write_text(convert(note), encoding="utf-8")
+        written += 1
+    return written
+
+
+def _import_chunk(paths: list[Path]) -> list[dict | None]:
+    notes = []
+    for path in paths:
+        try:
+            text = path.read_text(encoding="utf-8")
+            if IMPORT_SUFFIXES.get(path.suffix.lower(), "markdown") == "markdown":
+                notes.append(note_from_markdown(text))
+            else:
+                notes.append(note_from_html(text))
+        except (OSError, UnicodeDecodeError, ValueError) as exc:
+            logger.warning("Skipping %s: %s", path, exc)
+            notes.append(None)
+    return notes
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    """Consecutive lists of up to size items."""
+    items = iter(items)
+    while batch := list(itertools.islice(items, size)):
+        yield batch
+
+
+def default_jobs() -> int:
+    """Worker processes to use: one per CPU this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _map_chunks(fn, chunks: Iterable[list], jobs: int) -> Iterator:
+    """fn over chunks in worker processes, in order, a few chunks in flight."""
+    if jobs <= 1:
+        yield from map(fn, chunks)
+        return
+    # Workers start from a fresh interpreter rather than forking a process
+    # that may hold GLib threads
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    with ProcessPoolExecutor(jobs, mp_context=context) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(fn, chunk))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def export_notes(notes: Iterable[dict], directory: Path, fmt: str, jobs: int = 1) -> int:
+    """Write note dicts (as from Note.to_dict) to directory; returns the count."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    fn = partial(_export_chunk, directory=directory, fmt=fmt)
+    return sum(_map_chunks(fn, batched(notes, CHUNK_NOTES), jobs))
+
+
+def note_files(paths: Iterable[Path]) -> Iterator[Path]:
+    """The given files, and the Markdown and HTML files in given directories."""
+    for path in map(Path, paths):
+        if path.is_dir():
+            names = sorted(
+                entry.name for entry in os.scandir(path)
+                if Path(entry.name).suffix.lower() in IMPORT_SUFFIXES and entry.is_file()
+            )
+            yield from (path / name for name in names)
+        else:
+            yield path
+
+
+def import_files(paths: Iterable[Path], jobs: int = 1) -> Iterator[dict]:
+    """Note dicts parsed from Markdown/HTML files, in order; bad files are skipped.
+
+    Files with an unknown suffix are read as Markdown.
+    """
+    chunks = batched(note_files(paths), CHUNK_NOTES)
+    for notes in _map_chunks(_import_chunk, chunks, jobs):
+        yield from (note for note in notes if note is not None)
@@ -1,10 +1,17 @@
 """CSS styling for sticky notes."""
 
-from .colors import PALETTE
+from functools import cache
 
+from .colors import PALETTE, TEXT_COLORS
 
+
+@cache
 def generate_css() -> str:
-    """Generate all CSS for the application."""
+    """Generate all CSS for the application.
+
+    Includes the note color and text color swatches, so a single provider
+    installed once per display styles every window.
+    """
     css = """
 /* Base note window styling */
 .note-window {
@@ -92,6 +99,14 @@ def generate_css() -> str:
 .text-color-swatch:hover {
     border-color: rgba(0,0,0,0.5);
 }
+
+/* Note color dot in the note manager */
+.manager-swatch {
+    min-height: 12px;
+    min-width: 12px;
+    border-radius: 50%;
+    border: 1px solid rgba(0,0,0,0.2);
+}
 """
 
     # Generate per-color classes for both solid and translucent modes
@@ -124,4 +139,11 @@ def generate_css() -> str:
 }}
 """
 
+    # Swatch backgrounds for the note color and text color popovers
+    for name, colors in PALETTE.items():
+        css += f".color-swatch.swatch-{name} {{ background: {colors['bg']}; }}\n"
+        css += f".manager-swatch.swatch-{name} {{ background: {colors['bg']}; }}\n"
+    for hex_color, name in TEXT_COLORS:
+        css += f".text-color-swatch.text-color-{name.lower()} {{ background: {hex_color}; }}\n"
+
     return css
@@ -0,0 +1,181 @@
+"""D-Bus interface for scripting a running instance.
+
+The primary instance exports com.claude.stickies.Notes next to the
+org.gtk.Application interface on its object path. Each method runs one
+batch operation on the app's notes and replies once it has been saved,
+without opening any window or blocking the main loop on the write. The
+command-line client (see cli.py) uses it whenever an instance is running,
+so scripts never race with its saves.
+"""
+
+import json
+import logging
+
+from gi.repository import Gio, GLib
+
+from .colors import COLOR_ORDER
+from .models import Note, check_note_id
+
+logger = logging.getLogger(__name__)
+
+APP_ID = "com.claude.stickies"
+OBJECT_PATH = "/com/claude/stickies"
+INTERFACE = "com.claude.stickies.Notes"
+ERROR_NAME = "com.claude.stickies.Error.InvalidArgs"
+FAILED_ERROR_NAME = "org.freedesktop.DBus.Error.Failed"
+
+# Methods that change notes; they reply once the change is written
+_SAVING_METHODS = frozenset({"Create", "Append", "Recolor", "Import", "Delete"})
+
+INTERFACE_XML = f"""
+<node>
+  <interface name="{INTERFACE}">
+    <method name="List">
+      <arg direction="out" type="a(sssd)" name="notes"/>
+    </method>
+    <method name="Create">
+      <arg direction="in" type="as" name="texts"/>
+      <arg direction="in" type="s" name="color"/>
+      <arg direction="out" type="as" name="ids"/>
+    </method>
+    <method name="Append">
+      <arg direction="in" type="as" name="ids"/>
+      <arg direction="in" type="s" name="text"/>
+    </method>
+    <method name="Search">
+      <arg direction="in" type="s" name="query"/>
+      <arg direction="in" type="u" name="limit"/>
+      <arg direction="out" type="a(ss)" name="hits"/>
+    </method>
+    <method name="Recolor">
+      <arg direction="in" type="as" name="ids"/>
+      <arg direction="in" type="s" name="color"/>
+    </method>
+    <method name="Export">
+      <arg direction="in" type="as" name="ids"/>
+      <arg direction="out" type="s" name="notes_json"/>
+    </method>
+    <method name="Import">
+      <arg direction="in" type="s" name="notes_json"/>
+      <arg direction="out" type="as" name="ids"/>
+    </method>
+    <method name="Delete">
+      <arg direction="in" type="as" name="ids"/>
+    </method>
+  </interface>
+</node>
+"""
+
+
+class CommandError(Exception):
+    """A note command was given unknown note ids or an invalid argument."""
+
+
+def check_args(known, note_ids=(), color: str | None = None):
+    """Raise CommandError unless every id is known and color is valid."""
+    missing = [i for i in note_ids if i not in known]
+    if missing:
+        raise CommandError(f"No such note: {', '.join(missing)}")
+    if color is not None and color not in COLOR_ORDER:
+        raise CommandError(f"Unknown color {color!r}, expected one of {', '.join(COLOR_ORDER)}")
+
+
+def check_new_ids(note_ids):
+    """Raise CommandError unless every id of an imported note is valid."""
+    for note_id in note_ids:
+        try:
+            check_note_id(note_id)
+        except ValueError as exc:
+            raise CommandError(str(exc)) from None
+
+
+class NotesService:
+    """Exports the note commands of a StickiesApp on a D-Bus connection."""
+
+    def __init__(self, app):
+        self.app = app
+        self._registrations: dict[Gio.DBusConnection, int] = {}
+
+    def register(self, connection: Gio.DBusConnection, object_path: str):
+        info = Gio.DBusNodeInfo.new_for_xml(INTERFACE_XML).interfaces[0]
+        self._registrations[connection] = connection.register_object(
+            object_path, info, self._on_method_call, None, None,
+        )
+
+    def unregister(self, connection: Gio.DBusConnection):
+        registration = self._registrations.pop(connection, None)
+        if registration is not None:
+            connection.unregister_object(registration)
+
+    def _on_method_call(
+        self, connection, sender, object_path, interface_name, method_name,
+        parameters, invocation,
+    ):
+        handler = getattr(self, f"_{method_name.lower()}")
+        try:
+            result = handler(*parameters.unpack())
+        except CommandError as exc:
+            invocation.return_dbus_error(ERROR_NAME, str(exc))
+            return
+        except Exception as exc:
+            logger.exception("D-Bus %s failed", method_name)
+            invocation.return_dbus_error(FAILED_ERROR_NAME, str(exc))
+            return
+        if method_name not in _SAVING_METHODS:
+            invocation.return_value(result)
+            return
+
+        def on_saved(error):
+            if error is None:
+                invocation.return_value(result)
+            else:
+                invocation.return_dbus_error(FAILED_ERROR_NAME, f"Saving failed: {error}")
+
+        self.app.save_now(on_saved)
+
+    # --- Methods; each returns the reply variant (or None) ---
+    # Commands that change notes save once, after the whole batch (see
+    # _SAVING_METHODS)
+
+    def _list(self):
+        rows = [
+            (note.id, note.color, self.app.note_title(note.id), note.updated_at)
+            for note in self.app.list_notes()
+        ]
+        return GLib.Variant("(a(sssd))", (rows,))
+
+    def _create(self, texts: list[str], color: str):
+        check_args((), color=color or None)
+        ids = self.app.create_notes(texts, color or None)
+        return GLib.Variant("(as)", (ids,))
+
+    def _append(self, note_ids: list[str], text: str):
+        check_args(self.app.notes, note_ids)
+        self.app.append_to_notes(note_ids, text)
+
+    def _search(self, query: str, limit: int):
+        note_ids = self.app.search_notes(query)[:limit or None]
+        hits = [(note_id, self.app.note_title(note_id)) for note_id in note_ids]
+        return GLib.Variant("(a(ss))", (hits,))
+
+    def _recolor(self, note_ids: list[str], color: str):
+        check_args(self.app.notes, note_ids, color)
+        self.app.recolor_notes(note_ids, color)
+
+    def _export(self, note_ids: list[str]):
+        check_args(self.app.notes, note_ids)
+        notes = self.app.export_notes(note_ids or None)
+        return GLib.Variant("(s)", (json.dumps([n.to_dict() for n in notes]),))
+
+    def _import(self, notes_json: str):
+        try:
+            notes = [Note.from_dict(data) for data in json.loads(notes_json)]
+        except (ValueError, TypeError, AttributeError) as exc:
+            raise CommandError(f"Invalid notes: {exc}") from None
+        check_new_ids(n.id for n in notes)
+        ids = self.app.add_notes(notes)
+        return GLib.Variant("(as)", (ids,))
+
+    def _delete(self, note_ids: list[str]):
+        check_args(self.app.notes, note_ids)
+        self.app.delete_notes(note_ids)
@@ -0,0 +1,355 @@
+"""GTK-independent rich text document model.
+
+A Document holds styled text as a list of blocks, each a short list of
+pieces. A piece is a stretch of at most MAX_PIECE characters in a single
+interned Style. Block lengths are indexed by a Fenwick tree, so locating an
+offset takes O(log n) steps plus a scan of one block, and edits only touch
+the pieces they cover. Insert, delete and restyle of a short range
+therefore cost O(log n) instead of O(n) in the size of the note. Splitting
+or dropping a block rebuilds the index in time linear in the number of
+blocks, at most once per BLOCK_SIZE new pieces.
+
+Documents convert to and from the JSON run format used by storage; see
+serializer.document_from_buffer / document_to_buffer for Gtk.TextBuffer.
+"""
+
+MAX_PIECE = 1024  # Characters per piece
+BLOCK_SIZE = 64  # Target pieces per block; blocks split at twice this
+
+_BOOL_ATTRS = ("bold", "italic", "underline", "strikethrough")
+_VALUE_ATTRS = ("size", "family", "color")
+STYLE_ATTRS = _BOOL_ATTRS + _VALUE_ATTRS
+
+
+class Style:
+    """Immutable, interned set of run attributes.
+
+    Use Style.get() or Style.from_attrs(); equal styles are the same object,
+    so pieces compare styles with `is`.
+    """
+
+    __slots__ = STYLE_ATTRS
+    _interned: dict[tuple, "Style"] = {}
+
+    @classmethod
+    def get(
+        cls,
+        bold: bool = False,
+        italic: bool = False,
+        underline: bool = False,
+        strikethrough: bool = False,
+        size: int | None = None,
+        family: str | None = None,
+        color: str | None = None,
+    ) -> "Style":
+        key = (bool(bold), bool(italic), bool(underline), bool(strikethrough),
+               size, family, color)
+        style = cls._interned.get(key)
+        if style is None:
+            style = object.__new__(cls)
+            for name, value in zip(STYLE_ATTRS, key):
+                object.__setattr__(style, name, value)
+            cls._interned[key] = style
+        return style
+
+    @classmethod
+    def from_attrs(cls, attrs: dict) -> "Style":
+        """Style for a JSON run's attributes; unknown keys are ignored."""
+        return cls.get(**{k: attrs[k] for k in STYLE_ATTRS if k in attrs})
+
+    def attrs(self) -> dict:
+        """Non-default attributes, as stored in a JSON run."""
+        result = {name: True for name in _BOOL_ATTRS if getattr(self, name)}
+        for name in _VALUE_ATTRS:
+            value = getattr(self, name)
+            if value is not None:
+                result[name] = value
+        return result
+
+    def replace(self, **changes) -> "Style":
+        """Style with some attributes changed (None/False to clear)."""
+        values = {name: getattr(self, name) for name in STYLE_ATTRS}
+        values.update(changes)
+        return Style.get(**values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Style is immutable")
+
+    def __repr__(self) -> str:
+        return f"Style({self.attrs()!r})"
+
+
+PLAIN = Style.get()
+
+
+class Piece:
+    __slots__ = ("text", "style")
+
+    def __init__(self, text: str, style: Style):
+        self.text = text
+        self.style = style
+
+
+class Document:
+    """Styled text supporting range edits without touching the whole note."""
+
+    def __init__(self):
+        self._blocks: list[list[Piece]] = [[]]
+        self._block_lens: list[int] = [0]
+        self._length = 0
+        # Fenwick tree of _block_lens (1-based); rebuilt lazily when stale
+        self._tree: list[int] = [0, 0]
+        self._stale = False
+
+    # --- Conversion ---
+
+    @classmethod
+    def from_runs(cls, runs: list[dict]) -> "Document":
+        """Build a document from JSON runs."""
+        doc = cls()
+        pieces = []
+        for run in runs:
+            text = run.get("text", "")
+            if text:
+                style = Style.from_attrs(run)
+                pieces.extend(Piece(chunk, style) for chunk in _chunks(text))
+        if pieces:
+            doc._blocks = [
+                pieces[i:i + BLOCK_SIZE] for i in range(0, len(pieces), BLOCK_SIZE)
+            ]
+            doc._block_lens = [
+                sum(len(p.text) for p in block) for block in doc._blocks
+            ]
+            doc._length = sum(doc._block_lens)
+            doc._stale = True
+        return doc
+
+    def to_runs(self) -> list[dict]:
+        """Serialize to JSON runs, merging neighbours with equal style."""
+        runs = []
+        texts: list[str] = []
+        style = None
+        for piece in self._pieces():
+            if piece.style is not style:
+                if texts:
+                    runs.append({"text": "".join(texts), **style.attrs()})
+                texts = []
+                style = piece.style
+            texts.append(piece.text)
+        if texts:
+            runs.append({"text": "".join(texts), **style.attrs()})
+        return runs
+
+    @property
+    def text(self) -> str:
+        return "".join(piece.text for piece in self._pieces())
+
+    def __len__(self) -> int:
+        return self._length
+
+    def style_at(self, offset: int) -> Style:
+        """Style of the character at offset."""
+        if not 0 <= offset < len(self):
+            raise IndexError(offset)
+        bi, pi, inner = self._find(offset + 1)
+        return self._blocks[bi][pi].style
+
+    # --- Editing ---
+
+    def insert(self, offset: int, text: str, style: Style | None = None):
+        """Insert text at offset.
+
+        Without a style the text takes the style of the preceding character,
+        as typed text does.
+        """
+        if not text:
+            return
+        if not 0 <= offset <= len(self):
+            raise IndexError(offset)
+        if style is None:
+            style = self.style_at(offset - 1) if offset > 0 else PLAIN
+
+        bi, pi, inner = self._find(offset)
+        block = self._blocks[bi]
+        piece = block[pi] if pi < len(block) else None
+        if (piece is not None and piece.style is style
+                and len(piece.text) + len(text) <= MAX_PIECE):
+            piece.text = piece.text[:inner] + text + piece.text[inner:]
+        else:
+            index = pi
+            if piece is not None and inner > 0:
+                index = pi + 1
+                if inner < len(piece.text):
+                    block.insert(index, Piece(piece.text[inner:], piece.style))
+                    piece.text = piece.text[:inner]
+            block[index:index] = [Piece(chunk, style) for chunk in _chunks(text)]
+        self._resize(bi, len(text))
+        self._rebalance(bi)
+
+    def delete(self, start: int, end: int):
+        """Delete the characters in [start, end)."""
+        start, end = self._clamp(start, end)
+        remaining = end - start
+        if not remaining:
+            return
+        bi, pi = self._split(start)
+        first = bi
+        while remaining:
+            block = self._blocks[bi]
+            if pi >= len(block):
+                bi += 1
+                pi = 0
+                continue
+            piece = block[pi]
+            take = min(len(piece.text), remaining)
+            remaining -= take
+            self._resize(bi, -take)
+            if take == len(piece.text):
+                del block[pi]
+            else:
+                piece.text = piece.text[take:]
+        self._rebalance_range(first, bi)
+
+    def apply_style(self, start: int, end: int, **attrs):
+        """Set attributes (e.g. bold=True, size=18) on [start, end)."""
+        self._restyle(start, end, lambda style: style.replace(**attrs))
+
+    def remove_style(self, start: int, end: int, *names: str):
+        """Clear the named attributes on [start, end)."""
+        cleared = {name: None for name in names}
+        self._restyle(start, end, lambda style: style.replace(**cleared))
+
+    # --- Internals ---
+
+    def _pieces(self):
+        for block in self._blocks:
+            yield from block
+
+    def _clamp(self, start: int, end: int) -> tuple[int, int]:
+        length = len(self)
+        start = max(0, min(start, length))
+        return start, max(start, min(end, length))
+
+    def _find(self, offset: int) -> tuple[int, int, int]:
+        """Locate offset as (block, piece, offset in piece).
+
+        An offset on a boundary belongs to the end of the earlier piece.
+        """
+        if self._stale:
+            self._build_index()
+        # Descend the tree to the last block ending before offset
+        tree = self._tree
+        count = len(tree) - 1
+        bi = 0
+        step = 1 << count.bit_length()
+        while step:
+            if bi + step <= count and tree[bi + step] < offset:
+                bi += step
+                offset -= tree[bi]
+            step >>= 1
+        if bi == count:
+            # Past the end: stay in the last block
+            bi -= 1
+            offset += self._block_lens[bi]
+        block = self._blocks[bi]
+        for pi, piece in enumerate(block):
+            if offset <= len(piece.text):
+                return bi, pi, offset
+            offset -= len(piece.text)
+        return bi, len(block), 0
+
+    def _split(self, offset: int) -> tuple[int, int]:
+        """Ensure a piece boundary at offset; return the piece starting there.
+
+        The piece index may equal the block length, meaning the boundary is
+        at the end of that block.
+        """
+        bi, pi, inner = self._find(offset)
+        block = self._blocks[bi]
+        if pi == len(block) or inner == 0:
+            return bi, pi
+        piece = block[pi]
+        if inner < len(piece.text):
+            block.insert(pi + 1, Piece(piece.text[inner:], piece.style))
+            piece.text = piece.text[:inner]
+        return bi, pi + 1
+
+    def _restyle(self, start: int, end: int, change):
+        start, end = self._clamp(start, end)
+        if start == end:
+            return
+        bi, pi = self._split(start)
+        first = bi
+        pos = start
+        while pos < end:
+            block = self._blocks[bi]
+            if pi >= len(block):
+                bi += 1
+                pi = 0
+                continue
+            piece = block[pi]
+            if pos + len(piece.text) > end:
+                cut = end - pos
+                block.insert(pi + 1, Piece(piece.text[cut:], piece.style))
+                piece.text = piece.text[:cut]
+            piece.style = change(piece.style)
+            pos += len(piece.text)
+            pi += 1
+        self._rebalance_range(first, bi)
+
+    def _resize(self, bi: int, delta: int):
+        """Change the length of block bi, keeping the index current."""
+        self._block_lens[bi] += delta
+        self._length += delta
+        if not self._stale:
+            tree = self._tree
+            i = bi + 1
+            while i < len(tree):
+                tree[i] += delta
+                i += i & -i
+
+    def _build_index(self):
+        tree = [0] + self._block_lens
+        count = len(self._block_lens)
+        for i in range(1, count + 1):
+            parent = i + (i & -i)
+            if parent <= count:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._stale = False
+
+    def _rebalance_range(self, first: int, last: int):
+        # Rebalance from the end so earlier block indices stay valid
+        for bi in range(min(last, len(self._blocks) - 1), first - 1, -1):
+            self._rebalance(bi)
+
+    def _rebalance(self, bi: int):
+        """Merge small same-style pieces, split big blocks, drop empty ones."""
+        block = self._blocks[bi]
+        merged: list[Piece] = []
+        for piece in block:
+            if (merged and merged[-1].style is piece.style
+                    and len(merged[-1].text) + len(piece.text) <= MAX_PIECE):
+                merged[-1].text += piece.text
+            else:
+                merged.append(piece)
+        block[:] = merged
+
+        if len(block) > 2 * BLOCK_SIZE:
+            tail = block[BLOCK_SIZE:]
+            del block[BLOCK_SIZE:]
+            tail_len = sum(len(p.text) for p in tail)
+            self._blocks.insert(bi + 1, tail)
+            self._block_lens.insert(bi + 1, tail_len)
+            self._block_lens[bi] -= tail_len
+            self._stale = True
+            self._rebalance(bi + 1)
+        elif not block and len(self._blocks) > 1:
+            del self._blocks[bi]
+            del self._block_lens[bi]
+            self._stale = True
+
+
+def _chunks(text: str):
+    for i in range(0, len(text), MAX_PIECE):
+        yield text[i:i + MAX_PIECE]
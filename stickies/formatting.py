@@ -1,9 +1,13 @@
 """Rich text formatting for TextBuffer."""
 
+import re
+import weakref
+from contextlib import contextmanager
+
 import gi
 
 gi.require_version("Gtk", "4.0")
-from gi.repository import Gtk, Pango
+from gi.repository import Gtk, GLib, Pango
 
 # Default font settings
 DEFAULT_FONT_SIZE = 16
@@ -11,37 +15,240 @@ DEFAULT_FONT_FAMILY = "Monospace"
 
 FONT_FAMILIES = ["Sans", "Serif", "Monospace", "Cantarell", "Ubuntu", "Noto Sans"]
 FONT_SIZES = [8, 9, 10, 11, 12, 14, 16, 18, 20, 24, 28, 32, 36, 48]
+MIN_FONT_SIZE = 6
+MAX_FONT_SIZE = 96
+
+# Seconds between sweeps for unused color and size tags
+TAG_COLLECT_INTERVAL = 30
 
+_HEX_COLOR = re.compile(r"#?([0-9a-f]{3}|[0-9a-f]{6})")
 
-def setup_tags(buffer: Gtk.TextBuffer):
-    """Create all formatting tags on a TextBuffer."""
-    tag_table = buffer.get_tag_table()
+
+def create_tag_table() -> Gtk.TextTagTable:
+    """Create the formatting tag table shared by every note's buffer."""
+    tag_table = Gtk.TextTagTable()
 
     # Bold, italic, underline, strikethrough
-    buffer.create_tag("bold", weight=Pango.Weight.BOLD)
-    buffer.create_tag("italic", style=Pango.Style.ITALIC)
-    buffer.create_tag("underline", underline=Pango.Underline.SINGLE)
-    buffer.create_tag("strikethrough", strikethrough=True)
+    tag_table.add(Gtk.TextTag(name="bold", weight=Pango.Weight.BOLD))
+    tag_table.add(Gtk.TextTag(name="italic", style=Pango.Style.ITALIC))
+    tag_table.add(Gtk.TextTag(name="underline", underline=Pango.Underline.SINGLE))
+    tag_table.add(Gtk.TextTag(name="strikethrough", strikethrough=True))
 
     # Font sizes
     for size in FONT_SIZES:
-        buffer.create_tag(f"size-{size}", size=size * Pango.SCALE)
+        tag_table.add(Gtk.TextTag(name=f"size-{size}", size=size * Pango.SCALE))
 
     # Font families
     for family in FONT_FAMILIES:
-        buffer.create_tag(f"family-{family}", family=family)
+        tag_table.add(Gtk.TextTag(name=f"family-{family}", family=family))
 
     # Text colors - create on demand via get_or_create_color_tag
+    return tag_table
+
+
+BOOL_STYLES = ("bold", "italic", "underline", "strikethrough")
+STYLE_CATEGORIES = BOOL_STYLES + ("size", "family", "color")
+
+
+def decode_tag_name(name: str | None) -> tuple[str, object] | None:
+    """Decode a formatting tag name into a run attribute and value."""
+    if name is None:
+        return None
+    if name in BOOL_STYLES:
+        return (name, True)
+    if name.startswith("size-"):
+        try:
+            return ("size", int(name[5:]))
+        except ValueError:
+            return None
+    if name.startswith("family-"):
+        return ("family", name[7:])
+    if name.startswith("color-"):
+        return ("color", name[6:])
+    return None
+
+
+def normalize_color(color: str) -> str:
+    """Canonical form of a hex color: lowercase #rrggbb."""
+    color = color.strip().lower()
+    match = _HEX_COLOR.fullmatch(color)
+    if match is None:
+        return color
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    return f"#{digits}"
+
+
+def clamp_font_size(size: int) -> int:
+    return max(MIN_FONT_SIZE, min(MAX_FONT_SIZE, int(size)))
+
+
+class StyleTagRegistry:
+    """Interns the formatting tags of a tag table, grouped by category.
+
+    The fixed tags from create_tag_table are permanent. Color tags and
+    font sizes outside FONT_SIZES are created on demand and are dynamic:
+    when a tracked buffer stops using one (a tag is removed from a range, or
+    the buffer is released) it becomes a collection candidate, and an idle
+    sweep drops candidates that no tracked buffer uses any more.
+    """
+
+    def __init__(self, tag_table: Gtk.TextTagTable):
+        self.tag_table = tag_table
+        # Every tag seen -> (attribute, value), or None for other tags
+        self.styles: dict[Gtk.TextTag, tuple[str, object] | None] = {}
+        self.categories: dict[str, dict[object, Gtk.TextTag]] = {
+            category: {} for category in STYLE_CATEGORIES
+        }
+        self._dynamic: set[Gtk.TextTag] = set()
+        self._candidates: set[Gtk.TextTag] = set()
+        # Tracked buffers -> their remove-tag handler id
+        self._buffers: "weakref.WeakKeyDictionary[Gtk.TextBuffer, int]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._collect_source_id = None
+        self.collected = 0  # Dynamic tags dropped so far
+        tag_table.foreach(self._add)
+        tag_table.connect("tag-added", self._on_tag_added)
+        tag_table.connect("tag-removed", self._on_tag_removed)
+
+    def decode(self, tag: Gtk.TextTag) -> tuple[str, object] | None:
+        """The (attribute, value) a tag stands for, or None."""
+        try:
+            return self.styles[tag]
+        except KeyError:
+            return self._add(tag)
+
+    def tags(self, category: str):
+        """Known tags of a category (e.g. every size tag)."""
+        return self.categories[category].values()
+
+    def color_tag(self, color: str) -> Gtk.TextTag:
+        """The tag for a text color, normalized and created on demand."""
+        color = normalize_color(color)
+        tag = self.categories["color"].get(color)
+        if tag is None:
+            tag = self._create(f"color-{color}", foreground=color)
+        return tag
+
+    def size_tag(self, size: int) -> Gtk.TextTag:
+        """The tag for any font size, clamped and created on demand."""
+        size = clamp_font_size(size)
+        tag = self.categories["size"].get(size)
+        if tag is None:
+            tag = self._create(f"size-{size}", size=size * Pango.SCALE)
+        return tag
+
+    def tag_for_name(self, name: str) -> Gtk.TextTag | None:
+        """Resolve a formatting tag name, creating dynamic tags as needed."""
+        style = decode_tag_name(name)
+        if style is None:
+            return self.tag_table.lookup(name)
+        category, value = style
+        if category == "color":
+            return self.color_tag(value)
+        if category == "size":
+            return self.size_tag(value)
+        return self.categories[category].get(value)
+
+    def track_buffer(self, buffer: Gtk.TextBuffer):
+        """Count a buffer's tags as in use when collecting."""
+        if buffer not in self._buffers:
+            self._buffers[buffer] = buffer.connect_after(
+                "remove-tag", self._on_buffer_remove_tag,
+            )
+
+    def release_buffer(self, buffer: Gtk.TextBuffer):
+        """Stop tracking a buffer; its dynamic tags may now be unused."""
+        handler_id = self._buffers.pop(buffer, None)
+        if handler_id is not None:
+            buffer.disconnect(handler_id)
+        self._candidates.update(self._dynamic)
+        self._schedule_collect()
+
+    def collect(self) -> int:
+        """Drop candidate dynamic tags that no tracked buffer uses."""
+        candidates, self._candidates = self._candidates, set()
+        dropped = 0
+        for tag in candidates:
+            if tag in self._dynamic and not any(
+                _buffer_has_tag(buffer, tag) for buffer in self._buffers
+            ):
+                self.tag_table.remove(tag)
+                dropped += 1
+        self.collected += dropped
+        return dropped
+
+    def _create(self, name: str, **props) -> Gtk.TextTag:
+        tag = Gtk.TextTag(name=name, **props)
+        self.tag_table.add(tag)
+        self._dynamic.add(tag)
+        return tag
+
+    def _schedule_collect(self):
+        if self._collect_source_id is None and self._candidates:
+            self._collect_source_id = GLib.timeout_add_seconds(
+                TAG_COLLECT_INTERVAL, self._on_collect_timeout,
+            )
+
+    def _on_collect_timeout(self):
+        self._collect_source_id = None
+        GLib.idle_add(self._on_collect_idle, priority=GLib.PRIORITY_LOW)
+        return False
+
+    def _on_collect_idle(self):
+        self.collect()
+        return False
+
+    def _on_buffer_remove_tag(self, buffer, tag, start, end):
+        if tag in self._dynamic:
+            self._candidates.add(tag)
+            self._schedule_collect()
+
+    def _add(self, tag: Gtk.TextTag):
+        style = self.styles[tag] = decode_tag_name(tag.get_property("name"))
+        if style is not None:
+            self.categories[style[0]][style[1]] = tag
+        return style
+
+    def _on_tag_added(self, tag_table, tag):
+        self._add(tag)
+
+    def _on_tag_removed(self, tag_table, tag):
+        style = self.styles.pop(tag, None)
+        if style is not None:
+            self.categories[style[0]].pop(style[1], None)
+        self._dynamic.discard(tag)
+        self._candidates.discard(tag)
+
+
+_registries: "weakref.WeakKeyDictionary[Gtk.TextTagTable, StyleTagRegistry]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_style_registry(tag_table: Gtk.TextTagTable) -> StyleTagRegistry:
+    """Return the StyleTagRegistry of a tag table, creating it on first use."""
+    registry = _registries.get(tag_table)
+    if registry is None:
+        registry = _registries[tag_table] = StyleTagRegistry(tag_table)
+    return registry
 
 
 def get_or_create_color_tag(buffer: Gtk.TextBuffer, hex_color: str) -> Gtk.TextTag:
-    """Get or create a text color tag."""
-    tag_name = f"color-{hex_color}"
-    tag_table = buffer.get_tag_table()
-    tag = tag_table.lookup(tag_name)
-    if tag is None:
-        tag = buffer.create_tag(tag_name, foreground=hex_color)
-    return tag
+    """Get or create a text color tag in the buffer's (shared) tag table."""
+    return get_style_registry(buffer.get_tag_table()).color_tag(hex_color)
+
+
+@contextmanager
+def _user_action(buffer: Gtk.TextBuffer):
+    """Group buffer changes into a single undoable user action."""
+    buffer.begin_user_action()
+    try:
+        yield
+    finally:
+        buffer.end_user_action()
 
 
 def toggle_tag(buffer: Gtk.TextBuffer, tag_name: str, pending_tags: dict):
@@ -53,12 +260,11 @@ def toggle_tag(buffer: Gtk.TextBuffer, tag_name: str, pending_tags: dict):
         if tag is None:
             return
         # Check if entire selection already has this tag
-        if _selection_has_tag(buffer, tag, start, end):
-            buffer.remove_tag(tag, start, end)
-        else:
-            buffer.emit("begin-user-action")
-            buffer.apply_tag(tag, start, end)
-            buffer.emit("end-user-action")
+        with _user_action(buffer):
+            if _selection_has_tag(buffer, tag, start, end):
+                buffer.remove_tag(tag, start, end)
+            else:
+                buffer.apply_tag(tag, start, end)
     else:
         # No selection: toggle pending
         if tag_name in pending_tags:
@@ -72,23 +278,17 @@ def apply_font_size(buffer: Gtk.TextBuffer, size: int, pending_tags: dict):
     bounds = buffer.get_selection_bounds()
     if bounds:
         start, end = bounds
-        # Remove all existing size tags
-        for s in FONT_SIZES:
-            tag = buffer.get_tag_table().lookup(f"size-{s}")
-            if tag:
-                buffer.remove_tag(tag, start, end)
-        # Apply new size
-        tag = buffer.get_tag_table().lookup(f"size-{size}")
-        if tag:
-            buffer.emit("begin-user-action")
+        tag = get_style_registry(buffer.get_tag_table()).size_tag(size)
+        with _user_action(buffer):
+            # Replace whatever sizes the selection has
+            _remove_category_in_range(buffer, "size", start, end)
             buffer.apply_tag(tag, start, end)
-            buffer.emit("end-user-action")
     else:
         # Remove any pending size, set new one
         pending_tags = {
             k: v for k, v in pending_tags.items() if not k.startswith("size-")
         }
-        pending_tags[f"size-{size}"] = True
+        pending_tags[f"size-{clamp_font_size(size)}"] = True
         return pending_tags
     return pending_tags
 
@@ -98,15 +298,11 @@ def apply_font_family(buffer: Gtk.TextBuffer, family: str, pending_tags: dict):
     bounds = buffer.get_selection_bounds()
     if bounds:
         start, end = bounds
-        for f in FONT_FAMILIES:
-            tag = buffer.get_tag_table().lookup(f"family-{f}")
-            if tag:
-                buffer.remove_tag(tag, start, end)
         tag = buffer.get_tag_table().lookup(f"family-{family}")
         if tag:
-            buffer.emit("begin-user-action")
-            buffer.apply_tag(tag, start, end)
-            buffer.emit("end-user-action")
+            with _user_action(buffer):
+                _remove_category_in_range(buffer, "family", start, end)
+                buffer.apply_tag(tag, start, end)
     else:
         pending_tags = {
             k: v for k, v in pending_tags.items() if not k.startswith("family-")
@@ -121,17 +317,15 @@ def apply_text_color(buffer: Gtk.TextBuffer, hex_color: str, pending_tags: dict)
     bounds = buffer.get_selection_bounds()
     if bounds:
         start, end = bounds
-        # Remove existing color tags by iterating tags on the range
-        _remove_color_tags_in_range(buffer, start, end)
         tag = get_or_create_color_tag(buffer, hex_color)
-        buffer.emit("begin-user-action")
-        buffer.apply_tag(tag, start, end)
-        buffer.emit("end-user-action")
+        with _user_action(buffer):
+            _remove_category_in_range(buffer, "color", start, end)
+            buffer.apply_tag(tag, start, end)
     else:
         pending_tags = {
             k: v for k, v in pending_tags.items() if not k.startswith("color-")
         }
-        pending_tags[f"color-{hex_color}"] = True
+        pending_tags[f"color-{normalize_color(hex_color)}"] = True
         return pending_tags
     return pending_tags
 
@@ -145,12 +339,9 @@ def apply_pending_tags(
     start = buffer.get_iter_at_offset(start_offset)
     end = buffer.get_iter_at_offset(end_offset)
 
+    registry = get_style_registry(buffer.get_tag_table())
     for tag_name in list(pending_tags.keys()):
-        if tag_name.startswith("color-"):
-            hex_color = tag_name[6:]
-            tag = get_or_create_color_tag(buffer, hex_color)
-        else:
-            tag = buffer.get_tag_table().lookup(tag_name)
+        tag = registry.tag_for_name(tag_name)
         if tag:
             buffer.apply_tag(tag, start, end)
 
@@ -177,29 +368,41 @@ def get_tags_at_iter(buffer: Gtk.TextBuffer, text_iter: Gtk.TextIter) -> dict:
 def _selection_has_tag(
     buffer: Gtk.TextBuffer, tag: Gtk.TextTag, start: Gtk.TextIter, end: Gtk.TextIter
 ) -> bool:
-    """Check if the entire selection has a given tag."""
+    """Check if the entire selection has a given tag.
+
+    Jumps straight to the tag's next toggle instead of walking characters.
+    """
+    if not start.has_tag(tag):
+        return False
     it = start.copy()
-    while it.compare(end) < 0:
-        if not it.has_tag(tag):
-            return False
-        if not it.forward_char():
-            break
-    return True
+    it.forward_to_tag_toggle(tag)
+    return it.compare(end) >= 0
 
 
-def _remove_color_tags_in_range(
-    buffer: Gtk.TextBuffer, start: Gtk.TextIter, end: Gtk.TextIter
-):
-    """Remove all color-* tags in a range."""
-    tag_table = buffer.get_tag_table()
-    # Collect color tags
-    color_tags = []
+def _buffer_has_tag(buffer: Gtk.TextBuffer, tag: Gtk.TextTag) -> bool:
+    """Check if a tag is applied anywhere in a buffer."""
+    it = buffer.get_start_iter()
+    return it.has_tag(tag) or it.forward_to_tag_toggle(tag)
 
-    def _collect(tag):
-        name = tag.get_property("name")
-        if name and name.startswith("color-"):
-            color_tags.append(tag)
 
-    tag_table.foreach(_collect)
-    for tag in color_tags:
+def _remove_category_in_range(
+    buffer: Gtk.TextBuffer, category: str, start: Gtk.TextIter, end: Gtk.TextIter
+):
+    """Remove every tag of a category (e.g. all color-* tags) from a range.
+
+    Only tags actually present are removed. They are found by jumping between
+    tag toggles in the range, so the cost follows the number of style
+    boundaries there, not the number of tags the category has interned.
+    """
+    decode = get_style_registry(buffer.get_tag_table()).decode
+    present = set()
+    it = start.copy()
+    while True:
+        for tag in it.get_tags():
+            style = decode(tag)
+            if style is not None and style[0] == category:
+                present.add(tag)
+        if not it.forward_to_tag_toggle(None) or it.compare(end) >= 0:
+            break
+    for tag in present:
         buffer.remove_tag(tag, start, end)
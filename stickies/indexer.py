@@ -0,0 +1,74 @@
+"""Background tokenizing that keeps search indexing off the GTK main loop."""
+
+import logging
+import threading
+from collections import Counter
+
+from gi.repository import GLib
+
+from .search import runs_text, term_counts
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWorker:
+    """Turns note text into search term counts on a dedicated thread.
+
+    The search index itself is only touched on the main loop: the worker
+    tokenizes a note's runs (read from storage when not given) and reports
+    the counts via GLib.idle_add, so re-indexing a big note never blocks
+    input. A request for a note replaces one still waiting for it.
+    """
+
+    def __init__(self, storage, on_done):
+        self._storage = storage
+        self._on_done = on_done
+        self._cond = threading.Condition()
+        self._queue: dict[str, tuple[list | None, int]] = {}  # id -> (runs, request)
+        self._closing = False
+        self._thread = threading.Thread(
+            target=self._run, name="stickies-indexer", daemon=True,
+        )
+        self._thread.start()
+
+    def submit(self, note_id: str, runs: list[dict] | None, request: int):
+        """Queue a note for tokenizing; runs=None reads its saved content.
+
+        on_done(note_id, request, counts) is called on the main loop, with
+        counts None if the content could not be read. Runs must not be
+        mutated after submission.
+        """
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("IndexWorker is closed")
+            self._queue.pop(note_id, None)
+            self._queue[note_id] = (runs, request)
+            self._cond.notify_all()
+
+    def close(self):
+        """Drop queued requests and stop the thread."""
+        with self._cond:
+            self._closing = True
+            self._queue.clear()
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if self._closing:
+                    return
+                note_id = next(iter(self._queue))
+                runs, request = self._queue.pop(note_id)
+
+            counts: Counter | None
+            try:
+                if runs is None:
+                    runs = self._storage.load_content(note_id)
+                counts = term_counts(runs_text(runs))
+            except Exception:
+                logger.exception("Indexing note %s failed", note_id)
+                counts = None
+            GLib.idle_add(self._on_done, note_id, request, counts)
@@ -0,0 +1,161 @@
+"""Note manager: a list of every note, open or hibernated."""
+
+import gi
+gi.require_version("Gtk", "4.0")
+gi.require_version("Adw", "1")
+from gi.repository import Gtk, Adw, Gio, GObject, Pango
+
+from .colors import COLOR_ORDER
+
+
+class NoteItem(GObject.Object):
+    """A row of the note list."""
+
+    def __init__(self, note_id: str, title: str, color: str, is_open: bool):
+        super().__init__()
+        self.note_id = note_id
+        self.title = title
+        self.color = color
+        self.is_open = is_open
+
+
+class NoteListModel(GObject.Object, Gio.ListModel):
+    """Lazily populated list of the app's notes, most recently edited first.
+
+    Only the note order is kept up front; a NoteItem is created the first
+    time the list view asks for its row, so the cost of showing the list
+    depends on the rows on screen rather than on the number of notes.
+    """
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self._ids: list[str] = []
+        self._positions: dict[str, int] = {}
+        self._items: dict[str, NoteItem] = {}
+        self._query = ""
+        self._sort()
+
+    def do_get_item_type(self):
+        return NoteItem.__gtype__
+
+    def do_get_n_items(self) -> int:
+        return len(self._ids)
+
+    def do_get_item(self, position: int):
+        if not 0 <= position < len(self._ids):
+            return None
+        note_id = self._ids[position]
+        item = self._items.get(note_id)
+        if item is None:
+            note = self.app.notes[note_id]
+            item = NoteItem(
+                note_id, self.app.note_title(note_id), note.color,
+                note_id in self.app.windows,
+            )
+            self._items[note_id] = item
+        return item
+
+    def refresh(self):
+        """Re-read the note list after notes were added or removed."""
+        removed = len(self._ids)
+        self._sort()
+        self.items_changed(0, removed, len(self._ids))
+
+    def set_query(self, query: str):
+        """List only notes matching a search query, best match first."""
+        self._query = query.strip()
+        self.refresh()
+
+    def note_changed(self, note_id: str):
+        """Update the row of a note whose title, color or state changed."""
+        position = self._positions.get(note_id)
+        if position is None:
+            return
+        self._items.pop(note_id, None)
+        self.items_changed(position, 1, 1)
+
+    def _sort(self):
+        if self._query:
+            self._ids = self.app.search_notes(self._query)
+        else:
+            notes = sorted(self.app.notes.values(), key=lambda n: n.updated_at, reverse=True)
+            self._ids = [n.id for n in notes]
+        self._positions = {note_id: i for i, note_id in enumerate(self._ids)}
+        self._items = {}
+
+
+class NoteManagerWindow(Adw.ApplicationWindow):
+    """Lists all notes; activating a row opens (or raises) its window."""
+
+    def __init__(self, app):
+        super().__init__(application=app, title="All Notes")
+        self.app = app
+        self.set_default_size(320, 480)
+
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        header = Adw.HeaderBar()
+        new_btn = Gtk.Button(icon_name="list-add-symbolic")
+        new_btn.set_tooltip_text("New Note (Ctrl+N)")
+        new_btn.connect("clicked", lambda _: app.activate_action("new-note"))
+        header.pack_start(new_btn)
+        main_box.append(header)
+
+        self.search_entry = Gtk.SearchEntry(placeholder_text="Search notes")
+        self.search_entry.set_margin_top(6)
+        self.search_entry.set_margin_bottom(6)
+        self.search_entry.set_margin_start(8)
+        self.search_entry.set_margin_end(8)
+        self.search_entry.connect("search-changed", self._on_search_changed)
+        main_box.append(self.search_entry)
+
+        self.model = NoteListModel(app)
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self._on_setup_row)
+        factory.connect("bind", self._on_bind_row)
+        self.list_view = Gtk.ListView(
+            model=Gtk.NoSelection(model=self.model), factory=factory,
+        )
+        self.list_view.set_single_click_activate(True)
+        self.list_view.connect("activate", self._on_row_activated)
+
+        scrolled = Gtk.ScrolledWindow(vexpand=True)
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_child(self.list_view)
+        main_box.append(scrolled)
+        self.set_content(main_box)
+
+    def _on_setup_row(self, factory, list_item):
+        box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        box.set_margin_top(6)
+        box.set_margin_bottom(6)
+        box.set_margin_start(8)
+        box.set_margin_end(8)
+        swatch = Gtk.Box(valign=Gtk.Align.CENTER)
+        swatch.add_css_class("manager-swatch")
+        title = Gtk.Label(xalign=0, hexpand=True, ellipsize=Pango.EllipsizeMode.END)
+        state = Gtk.Label()
+        state.add_css_class("dim-label")
+        box.append(swatch)
+        box.append(title)
+        box.append(state)
+        list_item.set_child(box)
+
+    def _on_bind_row(self, factory, list_item):
+        item = list_item.get_item()
+        swatch = list_item.get_child().get_first_child()
+        title = swatch.get_next_sibling()
+        state = title.get_next_sibling()
+        for name in COLOR_ORDER:
+            swatch.remove_css_class(f"swatch-{name}")
+        swatch.add_css_class(f"swatch-{item.color}")
+        title.set_label(item.title or "Untitled note")
+        state.set_label("Open" if item.is_open else "")
+
+    def _on_search_changed(self, entry):
+        self.model.set_query(entry.get_text())
+
+    def _on_row_activated(self, list_view, position):
+        item = self.model.get_item(position)
+        if item is not None:
+            self.app.open_note(item.note_id)
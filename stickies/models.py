@@ -1,6 +1,8 @@
 """Note data model."""
 
+import dataclasses
 from dataclasses import dataclass, field
+from pathlib import Path
 import uuid
 import time
 
@@ -9,12 +11,14 @@ import time
 class Note:
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     color: str = "purple"
-    content: list = field(default_factory=list)  # Rich text runs
+    content: list | None = field(default_factory=list)  # Rich text runs, None if not loaded
     width: int = 300
     height: int = 350
     always_on_top: bool = False
     translucent: bool = True
     created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)  # Last content/metadata edit
+    hibernated: bool = False  # Kept as data only, with no window
 
     def to_dict(self) -> dict:
         return {
@@ -26,10 +30,13 @@ class Note:
             "always_on_top": self.always_on_top,
             "translucent": self.translucent,
             "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "hibernated": self.hibernated,
         }
 
     @classmethod
     def from_dict(cls, data: dict) -> "Note":
+        created_at = data.get("created_at", time.time())
         return cls(
             id=data.get("id", str(uuid.uuid4())),
             color=data.get("color", "yellow"),
@@ -38,5 +45,154 @@ class Note:
             height=data.get("height", 350),
             always_on_top=data.get("always_on_top", False),
             translucent=data.get("translucent", False),
-            created_at=data.get("created_at", time.time()),
+            created_at=created_at,
+            updated_at=data.get("updated_at", created_at),
+            hibernated=data.get("hibernated", False),
         )
+
+
+def check_note_id(note_id: str):
+    """Raise ValueError unless note_id can name a note file.
+
+    Ids come from imports and D-Bus callers, so they must not contain a
+    path separator or start with a dot.
+    """
+    if (not isinstance(note_id, str) or not note_id
+            or Path(note_id).name != note_id or note_id.startswith(".")):
+        raise ValueError(f"Invalid note id: {note_id!r}")
+
+
+def note_title(content: list | None) -> str:
+    """First line of a note's text, stripped."""
+    parts = []
+    for run in content or ():
+        text = run.get("text", "")
+        newline = text.find("\n")
+        if newline >= 0:
+            parts.append(text[:newline])
+            break
+        parts.append(text)
+    return "".join(parts).strip()
+
+
+DEFAULT_TITLE = "Sticky Note"  # Window title of a note with an empty first line
+
+
+class TitleTracker:
+    """Decides when a note window's title has to be recomputed.
+
+    The title is the first line, so only edits that start on line 0 can
+    change it. connect() watches a text buffer's edits, and the window calls
+    update() from the buffer's "changed" handler; the first line is only
+    read back when an edit touched it. Buffers are used through the
+    Gtk.TextBuffer API, so this module does not need GTK.
+    """
+
+    def __init__(self):
+        self.title: str | None = None  # Title last returned by update()
+        self.stale = True
+
+    def invalidate(self):
+        """Re-read the first line on the next update(), e.g. after a load."""
+        self.stale = True
+
+    def connect(self, buffer) -> list[int]:
+        """Watch a buffer's insertions and deletions; returns the handler ids."""
+        return [
+            buffer.connect("insert-text", self._on_insert_text),
+            buffer.connect("delete-range", self._on_delete_range),
+        ]
+
+    def update(self, buffer) -> str | None:
+        """The buffer's new title if it changed, else None."""
+        if not self.stale:
+            return None
+        self.stale = False
+        start = buffer.get_start_iter()
+        end = start.copy()
+        if not end.ends_line():  # Else it would move to the next line's end
+            end.forward_to_line_end()
+        title = buffer.get_text(start, end, False).strip() or DEFAULT_TITLE
+        if title == self.title:
+            return None
+        self.title = title
+        return title
+
+    def _on_insert_text(self, buffer, location, text, length):
+        if location.get_line() == 0:
+            self.stale = True
+
+    def _on_delete_range(self, buffer, start, end):
+        if start.get_line() == 0:
+            self.stale = True
+
+
+def append_text(content: list | None, text: str) -> list[dict]:
+    """Content with text added as a new, unformatted line at the end."""
+    runs = list(content or ())
+    if runs and not runs[-1].get("text", "").endswith("\n"):
+        text = "\n" + text
+    if runs and set(runs[-1]) == {"text"}:
+        runs[-1] = {"text": runs[-1]["text"] + text}
+    else:
+        runs.append({"text": text})
+    return runs
+
+
+@dataclass
+class NoteHeader:
+    """Lightweight note metadata, available without loading content."""
+
+    id: str
+    color: str = "purple"
+    width: int = 300
+    height: int = 350
+    always_on_top: bool = False
+    translucent: bool = True
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    hibernated: bool = False
+    title: str = ""
+    content_length: int = 0  # Size of the stored content in bytes
+
+    @classmethod
+    def from_note(cls, note: Note, content_length: int) -> "NoteHeader":
+        return cls(
+            id=note.id,
+            color=note.color,
+            width=note.width,
+            height=note.height,
+            always_on_top=note.always_on_top,
+            translucent=note.translucent,
+            created_at=note.created_at,
+            updated_at=note.updated_at,
+            hibernated=note.hibernated,
+            title=note_title(note.content),
+            content_length=content_length,
+        )
+
+    def to_note(self) -> Note:
+        """Build a Note whose content is not loaded yet (None)."""
+        return Note(
+            id=self.id,
+            color=self.color,
+            content=None,
+            width=self.width,
+            height=self.height,
+            always_on_top=self.always_on_top,
+            translucent=self.translucent,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+            hibernated=self.hibernated,
+        )
+
+    def to_dict(self) -> dict:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NoteHeader":
+        fields = {f.name for f in dataclasses.fields(cls)}
+        data = {k: v for k, v in data.items() if k in fields}
+        # Headers written before notes tracked edits
+        data.setdefault("updated_at", data.get("created_at", 0.0))
+        return cls(**data)
@@ -1,24 +1,38 @@
 """Per-note window with toolbar, text area, and formatting controls."""
 
+import os
+import time
+from contextlib import contextmanager
+
 import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Gtk, Adw, Gdk, GLib, Pango
+from gi.repository import Gtk, Adw, GLib, Pango
 
-from .models import Note
-from .colors import PALETTE, COLOR_ORDER, TEXT_COLORS
+from .models import DEFAULT_TITLE, Note, TitleTracker
+from .colors import COLOR_ORDER, TEXT_COLORS
 from .formatting import (
-    setup_tags, toggle_tag, apply_font_size, apply_font_family,
+    toggle_tag, apply_font_size, apply_font_family,
     apply_text_color, apply_pending_tags, get_tags_at_iter,
-    DEFAULT_FONT_SIZE, DEFAULT_FONT_FAMILY, FONT_FAMILIES, FONT_SIZES,
+    get_style_registry, DEFAULT_FONT_SIZE, DEFAULT_FONT_FAMILY, FONT_FAMILIES,
+    MIN_FONT_SIZE, MAX_FONT_SIZE,
+)
+from .serializer import (
+    IncrementalSerializer, deserialize_in_chunks, deserialize_to_buffer,
 )
-from .serializer import serialize_buffer, deserialize_to_buffer
 from .shortcuts import setup_window_shortcuts
+from . import x11
+
+# Show the format toolbar only while the note is focused
+MINIMAL_CHROME = bool(os.environ.get("STICKIES_MINIMAL_CHROME"))
+
+# Notes with more text than this are loaded over several idle callbacks
+LARGE_NOTE_CHARS = 64 * 1024
 
 
 class NoteWindow(Adw.ApplicationWindow):
     def __init__(self, app, note: Note):
-        super().__init__(application=app, title="Sticky Note")
+        super().__init__(application=app, title=DEFAULT_TITLE)
         self.note = note
         self.app = app
         self.current_color = note.color
@@ -27,6 +41,20 @@ class NoteWindow(Adw.ApplicationWindow):
         self._pending_tags: dict = {}
         self._is_deleting = False
         self._updating_toolbar = False
+        # Toolbar values last shown, and the pending idle sync (if any)
+        self._toolbar_state: tuple | None = None
+        self._toolbar_source = None
+        # Follows edits to the first line, which is the window title
+        self._title = TitleTracker()
+        # Bumped on every persisted change; the app compares it against
+        # _synced_gen to decide whether this note needs re-serializing.
+        self._dirty_gen = 0
+        self._synced_gen = 0
+        self.last_used = time.monotonic()  # Last focus or edit, for idle hibernation
+        self._loading_runs: list[dict] | None = None  # Set while loading in chunks
+        self._load_steps = None
+        self._load_source = None
+        self._color_swatches: dict[str, Gtk.Button] = {}  # Built with the menu
 
         self.set_default_size(note.width, note.height)
 
@@ -36,9 +64,12 @@ class NoteWindow(Adw.ApplicationWindow):
         # Apply color
         self._apply_color_css()
 
-        # Load content
+        # Load content; very large notes fill in from idle callbacks
         if note.content:
-            deserialize_to_buffer(self.buffer, note.content)
+            if sum(len(run.get("text", "")) for run in note.content) > LARGE_NOTE_CHARS:
+                self._load_content_in_chunks(note.content)
+            else:
+                self._load_content(note.content)
 
         # Apply translucency
         if self.translucent:
@@ -47,6 +78,10 @@ class NoteWindow(Adw.ApplicationWindow):
         # Update title from first line
         self._update_title()
 
+        # Track resizes so the new size gets saved
+        self.connect("notify::default-width", self._on_window_resized)
+        self.connect("notify::default-height", self._on_window_resized)
+
         # Defer always-on-top until the window is actually mapped
         if self.always_on_top:
             self.connect("map", self._on_map_set_above)
@@ -54,6 +89,9 @@ class NoteWindow(Adw.ApplicationWindow):
         # Setup shortcuts
         setup_window_shortcuts(self)
 
+        # The format toolbar is built the first time the note is focused
+        self.connect("notify::is-active", self._on_active_changed)
+
         # Connect close
         self.connect("close-request", self._on_close_request)
 
@@ -67,10 +105,10 @@ class NoteWindow(Adw.ApplicationWindow):
         self.header.set_show_start_title_buttons(True)
         self.header.set_decoration_layout("close:")
 
-        # Menu button
+        # Menu button; the popover is built when first opened
         menu_button = Gtk.MenuButton()
         menu_button.set_icon_name("open-menu-symbolic")
-        menu_button.set_popover(self._build_menu_popover())
+        menu_button.set_create_popup_func(self._create_menu_popup)
         self.header.pack_end(menu_button)
 
         # New note button
@@ -80,16 +118,18 @@ class NoteWindow(Adw.ApplicationWindow):
         self.header.pack_start(new_btn)
 
         main_box.append(self.header)
+        self._main_box = main_box
 
-        # Format toolbar
-        self.toolbar = self._build_format_toolbar()
-        main_box.append(self.toolbar)
+        # Format toolbar, built on first focus (see _ensure_toolbar)
+        self.toolbar: Gtk.Box | None = None
 
         # Text view in a scrolled window
         scrolled = Gtk.ScrolledWindow(vexpand=True, hexpand=True)
         scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
 
-        self.textview = Gtk.TextView()
+        # Buffers share the app's tag table instead of each creating tags
+        self.buffer = Gtk.TextBuffer(tag_table=self.app.tag_table)
+        self.textview = Gtk.TextView(buffer=self.buffer)
         self.textview.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
         self.textview.set_left_margin(0)
         self.textview.set_right_margin(0)
@@ -97,13 +137,17 @@ class NoteWindow(Adw.ApplicationWindow):
         self.textview.set_bottom_margin(0)
         self.textview.add_css_class("note-textview")
 
-        self.buffer = self.textview.get_buffer()
-        setup_tags(self.buffer)
-
         # Connect buffer signals
-        self.buffer.connect("changed", self._on_buffer_changed)
-        self.buffer.connect_after("insert-text", self._on_after_insert_text)
-        self.buffer.connect("mark-set", self._on_cursor_moved)
+        self._buffer_handlers = [
+            self.buffer.connect("changed", self._on_buffer_changed),
+            self.buffer.connect_after("insert-text", self._on_after_insert_text),
+            self.buffer.connect("mark-set", self._on_cursor_moved),
+        ]
+        self._buffer_handlers += self._title.connect(self.buffer)
+        self._serializer = IncrementalSerializer(self.buffer)
+        self._buffer_handlers += self._serializer.handler_ids
+        self._tag_registry = get_style_registry(self.buffer.get_tag_table())
+        self._tag_registry.track_buffer(self.buffer)
 
         scrolled.set_child(self.textview)
         main_box.append(scrolled)
@@ -156,7 +200,10 @@ class NoteWindow(Adw.ApplicationWindow):
         toolbar.append(self.family_dropdown)
 
         # Font size spin button
-        adj = Gtk.Adjustment(value=DEFAULT_FONT_SIZE, lower=8, upper=48, step_increment=1)
+        adj = Gtk.Adjustment(
+            value=DEFAULT_FONT_SIZE, lower=MIN_FONT_SIZE, upper=MAX_FONT_SIZE,
+            step_increment=1,
+        )
         self.size_spin = Gtk.SpinButton(adjustment=adj, climb_rate=1, digits=0)
         self.size_spin.set_tooltip_text("Font Size")
         self.size_spin.set_size_request(60, -1)
@@ -166,14 +213,32 @@ class NoteWindow(Adw.ApplicationWindow):
         # Separator
         toolbar.append(Gtk.Separator(orientation=Gtk.Orientation.VERTICAL))
 
-        # Text color button
+        # Text color button; the popover is built when first opened
         self.color_btn = Gtk.MenuButton(label="A")
         self.color_btn.set_tooltip_text("Text Color")
-        self.color_btn.set_popover(self._build_text_color_popover())
+        self.color_btn.set_create_popup_func(self._create_text_color_popup)
         toolbar.append(self.color_btn)
 
         return toolbar
 
+    def _ensure_toolbar(self):
+        """Build the format toolbar below the header if not built yet."""
+        if self.toolbar is not None:
+            return
+        self.toolbar = self._build_format_toolbar()
+        self.toolbar.set_sensitive(self._loading_runs is None)
+        self._main_box.insert_child_after(self.toolbar, self.header)
+        self._toolbar_state = None
+        self._update_toolbar_state()
+
+    def _create_menu_popup(self, button):
+        if button.get_popover() is None:
+            button.set_popover(self._build_menu_popover())
+
+    def _create_text_color_popup(self, button):
+        if button.get_popover() is None:
+            button.set_popover(self._build_text_color_popover())
+
     def _build_text_color_popover(self) -> Gtk.Popover:
         """Build a popover with text color swatches."""
         popover = Gtk.Popover()
@@ -186,14 +251,8 @@ class NoteWindow(Adw.ApplicationWindow):
             btn = Gtk.Button()
             btn.add_css_class("text-color-swatch")
             btn.set_tooltip_text(name)
-            # Set background via inline CSS
-            css = Gtk.CssProvider()
-            css.load_from_string(f".text-color-{name.lower()} {{ background: {hex_color}; }}")
+            # Background comes from the app-wide CSS (see css.generate_css)
             btn.add_css_class(f"text-color-{name.lower()}")
-            Gtk.StyleContext.add_provider_for_display(
-                Gdk.Display.get_default(), css,
-                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION + 1,
-            )
             btn.connect("clicked", self._on_text_color_selected, hex_color, popover)
             grid.append(btn)
 
@@ -221,17 +280,10 @@ class NoteWindow(Adw.ApplicationWindow):
 
         self._color_swatches = {}
         for color_name in COLOR_ORDER:
-            colors = PALETTE[color_name]
             btn = Gtk.Button()
             btn.add_css_class("color-swatch")
             btn.set_tooltip_text(color_name.capitalize())
-            css = Gtk.CssProvider()
-            css.load_from_string(f".swatch-{color_name} {{ background: {colors['bg']}; }}")
             btn.add_css_class(f"swatch-{color_name}")
-            Gtk.StyleContext.add_provider_for_display(
-                Gdk.Display.get_default(), css,
-                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION + 1,
-            )
             if color_name == self.current_color:
                 btn.add_css_class("selected")
             btn.connect("clicked", self._on_note_color_selected, color_name, popover)
@@ -262,6 +314,11 @@ class NoteWindow(Adw.ApplicationWindow):
         # Separator
         box.append(Gtk.Separator())
 
+        # Note manager
+        manager_btn = Gtk.Button(label="All Notes")
+        manager_btn.connect("clicked", self._on_show_manager, popover)
+        box.append(manager_btn)
+
         # Delete button
         delete_btn = Gtk.Button(label="Delete Note")
         delete_btn.add_css_class("destructive-action")
@@ -278,6 +335,7 @@ class NoteWindow(Adw.ApplicationWindow):
         if self._updating_toolbar:
             return
         toggle_tag(self.buffer, tag_name, self._pending_tags)
+        self._toolbar_changed_by_user()
         self.textview.grab_focus()
 
     def _on_family_changed(self, dropdown, pspec):
@@ -290,6 +348,7 @@ class NoteWindow(Adw.ApplicationWindow):
             result = apply_font_family(self.buffer, family, self._pending_tags)
             if result is not None:
                 self._pending_tags = result
+            self._toolbar_changed_by_user()
             self.textview.grab_focus()
 
     def _on_size_changed(self, spin):
@@ -297,10 +356,10 @@ class NoteWindow(Adw.ApplicationWindow):
         if self._updating_toolbar:
             return
         size = int(spin.get_value())
-        if size in FONT_SIZES:
-            result = apply_font_size(self.buffer, size, self._pending_tags)
-            if result is not None:
-                self._pending_tags = result
+        result = apply_font_size(self.buffer, size, self._pending_tags)
+        if result is not None:
+            self._pending_tags = result
+        self._toolbar_changed_by_user()
         self.textview.grab_focus()
 
     def _on_text_color_selected(self, btn, hex_color, popover):
@@ -313,35 +372,34 @@ class NoteWindow(Adw.ApplicationWindow):
 
     def _on_note_color_selected(self, btn, color_name, popover):
         """Handle note color change."""
-        # Update selected state
-        for name, swatch in self._color_swatches.items():
-            if name == color_name:
-                swatch.add_css_class("selected")
-            else:
-                swatch.remove_css_class("selected")
+        self.set_color(color_name)
+        popover.popdown()
 
-        self.current_color = color_name
-        self._apply_color_css()
-        self.app.schedule_save()
+    def _on_show_manager(self, btn, popover):
         popover.popdown()
+        self.app.show_manager()
 
     def _on_always_on_top_toggled(self, switch, pspec):
         """Toggle always-on-top."""
         self.always_on_top = switch.get_active()
         self._set_keep_above(self.always_on_top)
-        self.app.schedule_save()
+        self.mark_dirty()
 
     def _on_translucency_toggled(self, switch, pspec):
         """Toggle translucency."""
         self.translucent = switch.get_active()
         self._apply_translucency(self.translucent)
         self._apply_color_css()
-        self.app.schedule_save()
+        self.mark_dirty()
 
     def _on_buffer_changed(self, buffer):
         """Handle text content changes."""
         self._update_title()
-        self.app.schedule_save()
+        self.mark_dirty()
+
+    def _on_window_resized(self, window, pspec):
+        """Handle window size changes."""
+        self.mark_dirty()
 
     def _on_after_insert_text(self, buffer, location, text, length):
         """Apply pending tags to just-inserted text."""
@@ -354,27 +412,135 @@ class NoteWindow(Adw.ApplicationWindow):
         """Update toolbar state when cursor moves."""
         if mark != buffer.get_insert():
             return
-        self._update_toolbar_state()
+        self._queue_toolbar_update()
+
+    def _on_active_changed(self, window, pspec):
+        """Build the toolbar on first focus; in minimal chrome, hide it when unfocused."""
+        active = self.is_active()
+        self.last_used = time.monotonic()
+        if active:
+            self._ensure_toolbar()
+        if MINIMAL_CHROME and self.toolbar is not None:
+            self.toolbar.set_visible(active)
 
     def _on_close_request(self, window):
         """Handle window close."""
+        if self._load_source is not None:
+            GLib.source_remove(self._load_source)
+            self._load_source = None
+        if self._toolbar_source is not None:
+            GLib.source_remove(self._toolbar_source)
+            self._toolbar_source = None
         if not self._is_deleting:
             self.app.on_window_closed(self.note.id)
+        self._tag_registry.release_buffer(self.buffer)
         return False
 
     # --- Public methods for shortcuts ---
 
     def toggle_format(self, tag_name: str):
         """Toggle a format tag (called from shortcuts)."""
+        if self._loading_runs is not None:
+            return
         toggle_tag(self.buffer, tag_name, self._pending_tags)
-        self._update_toolbar_state()
+        self._queue_toolbar_update()
+
+    def set_color(self, color_name: str):
+        """Change the note color."""
+        # Update selected state
+        for name, swatch in self._color_swatches.items():
+            if name == color_name:
+                swatch.add_css_class("selected")
+            else:
+                swatch.remove_css_class("selected")
+
+        self.current_color = color_name
+        self._apply_color_css()
+        self.mark_dirty()
+
+    def append_text(self, text: str):
+        """Append plain text as a new line at the end of the note, as an edit."""
+        self.finish_loading()
+        last = self.buffer.get_end_iter()
+        if last.backward_char() and last.get_char() != "\n":
+            text = "\n" + text
+        # Formats toggled on for typing do not apply to appended text
+        pending, self._pending_tags = self._pending_tags, {}
+        try:
+            self.buffer.insert(self.buffer.get_end_iter(), text)
+        finally:
+            self._pending_tags = pending
+
+    def finish_loading(self):
+        """Load the rest of a note being filled in chunks right away."""
+        if self._load_source is None:
+            return
+        GLib.source_remove(self._load_source)
+        while self._load_next_chunk():
+            pass
+
+    def mark_dirty(self):
+        """Record a change that needs saving and schedule a save."""
+        self._dirty_gen += 1
+        self.last_used = time.monotonic()
+        self.app.schedule_save()
+
+    @property
+    def is_dirty(self) -> bool:
+        """Whether the note changed since it was last synced for saving."""
+        return self._dirty_gen != self._synced_gen
 
     def get_serialized_content(self) -> list[dict]:
         """Get current content as serialized runs."""
-        return serialize_buffer(self.buffer)
+        if self._loading_runs is not None:
+            # Still loading, and not editable until done
+            return self._loading_runs
+        return self._serializer.runs()
 
     # --- Private methods ---
 
+    def _load_content(self, runs: list[dict]):
+        """Fill the buffer from saved runs without treating it as an edit.
+
+        The buffer handlers are blocked, so loading never marks the note
+        dirty, schedules a save, or applies pending tags.
+        """
+        with self._buffer_handlers_blocked():
+            deserialize_to_buffer(self.buffer, runs)
+        self._serializer.invalidate()
+
+    def _load_content_in_chunks(self, runs: list[dict]):
+        """Fill the buffer a chunk per idle callback, read-only until done."""
+        self._loading_runs = runs
+        self.textview.set_editable(False)
+        self._load_steps = deserialize_in_chunks(self.buffer, runs)
+        self._load_source = GLib.idle_add(self._load_next_chunk)
+
+    def _load_next_chunk(self) -> bool:
+        with self._buffer_handlers_blocked():
+            if next(self._load_steps, None) is not None:
+                return True
+        self._load_source = None
+        self._load_steps = None
+        self._loading_runs = None
+        self._serializer.invalidate()
+        self.textview.set_editable(True)
+        if self.toolbar is not None:
+            self.toolbar.set_sensitive(True)
+        self._title.invalidate()
+        self._update_title()
+        return False
+
+    @contextmanager
+    def _buffer_handlers_blocked(self):
+        for handler_id in self._buffer_handlers:
+            self.buffer.handler_block(handler_id)
+        try:
+            yield
+        finally:
+            for handler_id in self._buffer_handlers:
+                self.buffer.handler_unblock(handler_id)
+
     def _apply_color_css(self):
         """Apply note color CSS classes."""
         # Remove all color classes
@@ -388,16 +554,38 @@ class NoteWindow(Adw.ApplicationWindow):
             self.add_css_class(f"note-{self.current_color}")
 
     def _update_title(self):
-        """Set window title from first line of content."""
-        start = self.buffer.get_start_iter()
-        end = start.copy()
-        end.forward_to_line_end()
-        first_line = self.buffer.get_text(start, end, False).strip()
-        self.set_title(first_line if first_line else "Sticky Note")
+        """Set window title from first line of content, if it changed."""
+        title = self._title.update(self.buffer)
+        if title is not None:
+            self.set_title(title)
+
+    def _queue_toolbar_update(self):
+        """Sync the toolbar with the cursor once the main loop is idle.
+
+        Cursor moves arrive for every key repeat, click and drag step; they
+        are coalesced into one update that runs after input and redraw.
+        """
+        if self.toolbar is None or self._toolbar_source is not None:
+            return
+        self._toolbar_source = GLib.idle_add(self._on_toolbar_idle)
+
+    def _on_toolbar_idle(self):
+        self._toolbar_source = None
+        self._update_toolbar_state()
+        return False
+
+    def _toolbar_changed_by_user(self):
+        """The user set a toolbar widget; its value may no longer match the cache."""
+        self._toolbar_state = None
+        self._queue_toolbar_update()
 
     def _update_toolbar_state(self):
-        """Update toolbar toggles/values to reflect cursor position."""
-        self._updating_toolbar = True
+        """Update toolbar toggles/values to reflect cursor position.
+
+        Only widgets whose value differs from the last update are touched.
+        """
+        if self.toolbar is None:
+            return
 
         mark = self.buffer.get_insert()
         it = self.buffer.get_iter_at_mark(mark)
@@ -406,37 +594,48 @@ class NoteWindow(Adw.ApplicationWindow):
         # Also include pending tags
         merged = {**tags, **self._pending_tags}
 
-        self.bold_btn.set_active("bold" in merged)
-        self.italic_btn.set_active("italic" in merged)
-        self.underline_btn.set_active("underline" in merged)
-        self.strike_btn.set_active("strikethrough" in merged)
-
-        # Font size
+        # Font size and family
         active_size = DEFAULT_FONT_SIZE
+        active_family = DEFAULT_FONT_FAMILY
         for key in merged:
             if key.startswith("size-"):
                 try:
                     active_size = int(key[5:])
                 except ValueError:
                     pass
-        self.size_spin.set_value(active_size)
-
-        # Font family
-        active_family = DEFAULT_FONT_FAMILY
-        for key in merged:
-            if key.startswith("family-"):
+            elif key.startswith("family-"):
                 active_family = key[7:]
         try:
-            idx = FONT_FAMILIES.index(active_family)
-            self.family_dropdown.set_selected(idx)
+            family_index = FONT_FAMILIES.index(active_family)
         except ValueError:
-            pass
+            family_index = None
+
+        state = (
+            "bold" in merged, "italic" in merged, "underline" in merged,
+            "strikethrough" in merged, active_size, family_index,
+        )
+        previous = self._toolbar_state or (None,) * len(state)
+        if state == previous:
+            return
+        self._toolbar_state = state
 
-        self._updating_toolbar = False
+        self._updating_toolbar = True
+        try:
+            buttons = (self.bold_btn, self.italic_btn, self.underline_btn, self.strike_btn)
+            for button, active, was_active in zip(buttons, state, previous):
+                if active != was_active:
+                    button.set_active(active)
+            if active_size != previous[4]:
+                self.size_spin.set_value(active_size)
+            if family_index is not None and family_index != previous[5]:
+                self.family_dropdown.set_selected(family_index)
+        finally:
+            self._updating_toolbar = False
 
     def _on_map_set_above(self, widget):
         """Set always-on-top once the window is mapped and visible."""
-        GLib.timeout_add(150, self._set_keep_above, True)
+        if self.always_on_top:
+            self._set_keep_above(True, x11.MAP_DELAY_MS)
 
     def _apply_translucency(self, translucent: bool):
         """Apply or remove window translucency via widget opacity."""
@@ -456,100 +655,12 @@ class NoteWindow(Adw.ApplicationWindow):
             pass
         return None
 
-    def _set_keep_above(self, above: bool):
-        """Set window to stay above others via X11 _NET_WM_STATE ClientMessage.
+    def _set_keep_above(self, above: bool, delay_ms: int = 0):
+        """Ask the window manager to keep this window above others.
 
-        This sends a proper EWMH client message to the root window, which is
-        the correct way to ask the window manager to toggle always-on-top.
-        Requires the app to be running on an X11 display (see main.py).
+        Sent as an EWMH _NET_WM_STATE client message, batched with other
+        windows' changes (see x11.py). Requires an X11 display (see main.py).
         """
-        import ctypes
-
         xid = self._get_window_xid()
-        if not xid:
-            return False
-
-        try:
-            libx11 = ctypes.CDLL("libX11.so.6")
-        except OSError:
-            return False
-
-        # Xlib constants
-        SubstructureRedirectMask = 1 << 20
-        SubstructureNotifyMask = 1 << 19
-        ClientMessage = 33  # X event type
-
-        # XClientMessageEvent structure (64-bit)
-        class XClientMessageEvent(ctypes.Structure):
-            _fields_ = [
-                ("type", ctypes.c_int),
-                ("serial", ctypes.c_ulong),
-                ("send_event", ctypes.c_int),
-                ("display", ctypes.c_void_p),
-                ("window", ctypes.c_ulong),
-                ("message_type", ctypes.c_ulong),
-                ("format", ctypes.c_int),
-                ("data", ctypes.c_long * 5),
-            ]
-
-        try:
-            # Set arg/return types to avoid segfaults
-            libx11.XOpenDisplay.argtypes = [ctypes.c_char_p]
-            libx11.XOpenDisplay.restype = ctypes.c_void_p
-            libx11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
-            libx11.XDefaultRootWindow.restype = ctypes.c_ulong
-            libx11.XInternAtom.argtypes = [
-                ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int,
-            ]
-            libx11.XInternAtom.restype = ctypes.c_ulong
-            libx11.XSendEvent.argtypes = [
-                ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int,
-                ctypes.c_long, ctypes.c_void_p,
-            ]
-            libx11.XSendEvent.restype = ctypes.c_int
-            libx11.XFlush.argtypes = [ctypes.c_void_p]
-            libx11.XCloseDisplay.argtypes = [ctypes.c_void_p]
-
-            display = libx11.XOpenDisplay(None)
-            if not display:
-                return False
-
-            root = libx11.XDefaultRootWindow(display)
-
-            wm_state = libx11.XInternAtom(
-                display, b"_NET_WM_STATE", 0,
-            )
-            wm_state_above = libx11.XInternAtom(
-                display, b"_NET_WM_STATE_ABOVE", 0,
-            )
-
-            # Build the ClientMessage event
-            # data.l[0] = action: 1=add, 0=remove
-            # data.l[1] = _NET_WM_STATE_ABOVE atom
-            # data.l[2] = 0 (no second property)
-            # data.l[3] = 1 (source: application)
-            event = XClientMessageEvent()
-            event.type = ClientMessage
-            event.serial = 0
-            event.send_event = 1
-            event.display = display
-            event.window = xid
-            event.message_type = wm_state
-            event.format = 32
-            event.data[0] = 1 if above else 0
-            event.data[1] = wm_state_above
-            event.data[2] = 0
-            event.data[3] = 1
-            event.data[4] = 0
-
-            libx11.XSendEvent(
-                display, root, 0,
-                SubstructureRedirectMask | SubstructureNotifyMask,
-                ctypes.byref(event),
-            )
-            libx11.XFlush(display)
-            libx11.XCloseDisplay(display)
-        except Exception:
-            pass
-
-        return False  # Don't repeat GLib.timeout_add
+        if xid:
+            x11.get_connection().request_keep_above(xid, above, delay_ms)
@@ -0,0 +1,89 @@
+"""Save scheduling: debounce bursts of edits without letting changes go stale."""
+
+import logging
+import time
+from dataclasses import dataclass
+
+from gi.repository import GLib
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE = 0.5  # Seconds of quiet before saving
+MAX_DELAY = 5.0  # Seconds a requested save may be postponed at most
+
+
+@dataclass
+class SaveStats:
+    saves: int = 0  # Saves issued
+    requests: int = 0  # Calls to request()
+    coalesced: int = 0  # Requests folded into an already pending save
+    max_staleness: float = 0.0  # Longest wait from first request to save, seconds
+
+
+class SaveScheduler:
+    """Runs a save callback after edits settle, or MAX_DELAY at the latest.
+
+    A save happens DEBOUNCE seconds after the last request, but no later
+    than max_delay after the first unsaved one, so continuous typing still
+    saves regularly. Requests only record a timestamp: one timer is armed
+    per pending save and re-armed when it fires early, instead of being
+    replaced on every change. The timer runs at idle priority so saving
+    never preempts input handling or drawing.
+    """
+
+    def __init__(self, save, debounce: float = DEBOUNCE, max_delay: float = MAX_DELAY):
+        self._save = save
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.stats = SaveStats()
+        self._first: float | None = None  # Oldest unsaved request (monotonic)
+        self._last: float | None = None  # Newest unsaved request
+        self._source = None
+
+    @property
+    def pending(self) -> bool:
+        """Whether a save has been requested but not run yet."""
+        return self._first is not None
+
+    def request(self):
+        """Note that something changed and needs saving."""
+        now = time.monotonic()
+        self.stats.requests += 1
+        if self._first is None:
+            self._first = now
+            self._arm(self.debounce)
+        else:
+            self.stats.coalesced += 1
+        self._last = now
+
+    def flush(self):
+        """Run a pending save now, e.g. on shutdown."""
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+        if self._first is not None:
+            self._run()
+
+    def _arm(self, delay: float):
+        self._source = GLib.timeout_add(
+            max(1, round(delay * 1000)), self._on_timeout,
+            priority=GLib.PRIORITY_DEFAULT_IDLE,
+        )
+
+    def _on_timeout(self):
+        self._source = None
+        due = min(self._last + self.debounce, self._first + self.max_delay)
+        remaining = due - time.monotonic()
+        if remaining > 0.001:
+            # More requests arrived since the timer was armed
+            self._arm(remaining)
+        else:
+            self._run()
+        return False
+
+    def _run(self):
+        staleness = time.monotonic() - self._first
+        self._first = self._last = None
+        self.stats.saves += 1
+        self.stats.max_staleness = max(self.stats.max_staleness, staleness)
+        self._save()
@@ -0,0 +1,387 @@
+"""Full-text search over notes with an incrementally maintained inverted index.
+
+Text is split into casefolded word tokens. The index maps each term to the
+notes containing it and how often, so a query only visits the notes that
+contain its terms. Every query token also matches longer terms it is a
+prefix of (found by bisecting the sorted vocabulary), and results are
+ranked with BM25.
+
+Most postings live in a compact base segment: one array of (note number,
+count) pairs, sliced per term. Notes indexed since the last compaction sit
+in small dicts on top of it, and a re-indexed or deleted note is simply
+marked dead in the base. compact() folds the dicts into the arrays, which
+are persisted next to the notes, so a launch loads them without building
+per-posting objects and only re-indexes notes that changed since.
+"""
+
+import bisect
+import heapq
+import json
+import logging
+import math
+import re
+import struct
+import sys
+from array import array
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
+from operator import itemgetter
+from pathlib import Path
+
+from .models import Note, NoteHeader
+from .storage import CONFIG_DIR, _atomic_write
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = CONFIG_DIR / "search-index.bin"
+INDEX_MAGIC = b"STX"
+INDEX_VERSION = 1
+
+MAX_PREFIX_TERMS = 64  # Most frequent completions searched per query token
+PREFIX_WEIGHT = 0.5  # Score factor for completions relative to exact matches
+BM25_K1 = 1.2
+BM25_B = 0.75
+COMPACT_PENDING = 1000  # Notes indexed since compaction that warrant one
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into casefolded word tokens."""
+    return _TOKEN_RE.findall(text.casefold())
+
+
+def term_counts(text: str) -> Counter:
+    """How often each token occurs in text, as SearchIndex.update_counts takes."""
+    return Counter(tokenize(text))
+
+
+def runs_text(runs: list[dict] | None) -> str:
+    """Plain text of a note's rich text runs."""
+    return "".join(run.get("text", "") for run in runs or ())
+
+
+@dataclass
+class SearchHit:
+    note_id: str
+    score: float
+
+
+class SearchIndex:
+    """Inverted index from terms to the notes containing them."""
+
+    def __init__(self):
+        # Base segment, rebuilt by compact(). Term i's postings are
+        # _base_postings[_base_offsets[i]:_base_offsets[i + 1]], as
+        # alternating note numbers and counts.
+        self._base_ids: list[str | None] = []  # number -> note id, None if dead
+        self._base_numbers: dict[str, int] = {}  # live note id -> number
+        self._base_terms: list[str] = []  # Sorted
+        self._base_term_index: dict[str, int] = {}
+        self._base_offsets = array("Q", [0])
+        self._base_postings = array("I")
+        self._dead = 0  # Dead numbers still referenced by base postings
+        # Notes indexed since the last compaction. Terms whose notes are all
+        # gone keep an empty dict until then.
+        self._postings: dict[str, dict[str, int]] = {}  # term -> {note id: count}
+        self._doc_terms: dict[str, tuple[str, ...]] = {}  # note id -> its terms
+        self._new_terms: list[str] = []  # Delta terms not in the base
+        self._new_terms_sorted = True
+        # Every live note
+        self._doc_lengths: dict[str, int] = {}  # note id -> token count
+        self._versions: dict[str, float] = {}  # note id -> updated_at indexed
+        self._total_length = 0
+        self.dirty = False  # Changed since load or save
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, note_id: str) -> bool:
+        return note_id in self._doc_lengths
+
+    @property
+    def pending(self) -> int:
+        """Notes indexed since the last compaction."""
+        return len(self._doc_terms)
+
+    def update(self, note_id: str, text: str, version: float = 0.0):
+        """Index (or re-index) a note's text."""
+        self.update_counts(note_id, term_counts(text), version)
+
+    def update_counts(self, note_id: str, counts: Counter, version: float = 0.0):
+        """Index (or re-index) a note from its term_counts().
+
+        Costs time in the number of distinct terms only, so the text can be
+        tokenized elsewhere (see indexer.IndexWorker).
+        """
+        self._remove(note_id)
+        terms = []
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                term = sys.intern(term)
+                postings = self._postings[term] = {}
+                if term not in self._base_term_index:
+                    self._new_terms.append(term)
+                    self._new_terms_sorted = False
+            postings[note_id] = count
+            terms.append(term)
+        length = sum(counts.values())
+        self._doc_terms[note_id] = tuple(terms)
+        self._doc_lengths[note_id] = length
+        self._versions[note_id] = version
+        self._total_length += length
+        self.dirty = True
+
+    def set_version(self, note_id: str, version: float):
+        """Record that an indexed note's text is current as of version."""
+        if note_id in self._versions and self._versions[note_id] != version:
+            self._versions[note_id] = version
+            self.dirty = True
+
+    def remove(self, note_id: str):
+        """Drop a note from the index."""
+        if self._remove(note_id):
+            self.dirty = True
+
+    def outdated(self, notes: Iterable[Note | NoteHeader]) -> list[str]:
+        """Ids of notes that need (re-)indexing; drops notes not listed."""
+        live = {n.id: n.updated_at for n in notes}
+        for note_id in [i for i in self._versions if i not in live]:
+            self.remove(note_id)
+        return [
+            note_id for note_id, version in live.items()
+            if self._versions.get(note_id) != version
+        ]
+
+    def search(self, query: str, limit: int | None = 20) -> list[SearchHit]:
+        """Notes containing every query token (or a word it starts), best first."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self._doc_lengths:
+            return []
+        doc_count = len(self._doc_lengths)
+        average_length = self._total_length / doc_count or 1.0
+        lengths = self._doc_lengths
+        scores: dict[str, float] | None = None
+        for token in tokens:
+            token_scores: dict[str, float] = {}
+            for term in self._expand(token):
+                df = self._document_frequency(term)
+                idf = math.log(1 + max(doc_count - df + 0.5, 0.5) / (df + 0.5))
+                weight = idf if term == token else idf * PREFIX_WEIGHT
+                for note_id, count in self._matches(term):
+                    if scores is not None and note_id not in scores:
+                        continue
+                    norm = 1 - BM25_B + BM25_B * lengths[note_id] / average_length
+                    score = weight * count * (BM25_K1 + 1) / (count + BM25_K1 * norm)
+                    token_scores[note_id] = token_scores.get(note_id, 0.0) + score
+            if scores is not None:
+                for note_id, score in token_scores.items():
+                    token_scores[note_id] = score + scores[note_id]
+            scores = token_scores
+            if not scores:
+                return []
+        if limit is None:
+            ranked = sorted(scores.items(), key=itemgetter(1), reverse=True)
+        else:
+            ranked = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [SearchHit(note_id, score) for note_id, score in ranked]
+
+    def compact(self):
+        """Fold notes indexed since the last compaction into the base arrays.
+
+        Dead base numbers are dropped (renumbering every posting) only once
+        they make up a quarter of the base; otherwise the existing arrays
+        are copied per term and the new postings appended.
+        """
+        if not self._doc_terms and not self._dead:
+            return
+        renumber = self._dead > 0 and self._dead * 4 >= len(self._base_ids)
+        if not self._doc_terms and not renumber:
+            return
+        if renumber:
+            new_numbers = array("l", [-1]) * len(self._base_ids)
+            ids = []
+            for number, note_id in enumerate(self._base_ids):
+                if note_id is not None:
+                    new_numbers[number] = len(ids)
+                    ids.append(note_id)
+        else:
+            ids = list(self._base_ids)
+        delta_numbers = {}
+        for note_id in self._doc_terms:
+            delta_numbers[note_id] = len(ids)
+            ids.append(note_id)
+
+        terms = []
+        offsets = array("Q", [0])
+        postings = array("I")
+        base_postings, base_offsets = self._base_postings, self._base_offsets
+        for term in sorted(set(self._base_terms).union(self._postings)):
+            i = self._base_term_index.get(term)
+            if i is not None:
+                chunk = base_postings[base_offsets[i]:base_offsets[i + 1]]
+                if renumber:
+                    for number, count in zip(chunk[::2], chunk[1::2]):
+                        if new_numbers[number] >= 0:
+                            postings.append(new_numbers[number])
+                            postings.append(count)
+                else:
+                    postings += chunk
+            for note_id, count in self._postings.get(term, {}).items():
+                postings.append(delta_numbers[note_id])
+                postings.append(count)
+            if len(postings) > offsets[-1]:
+                terms.append(term)
+                offsets.append(len(postings))
+
+        self._set_base(ids, terms, offsets, postings)
+        if renumber:
+            self._dead = 0
+        self._postings = {}
+        self._doc_terms = {}
+        self._new_terms = []
+        self._new_terms_sorted = True
+
+    # --- Persistence ---
+
+    def save(self, path: Path = INDEX_FILE):
+        """Compact the index and write it to path."""
+        self.compact()
+        header = json.dumps({
+            "byteorder": sys.byteorder,
+            "ids": self._base_ids,
+            "versions": [self._versions.get(i, 0.0) for i in self._base_ids],
+            "lengths": [self._doc_lengths.get(i, 0) for i in self._base_ids],
+            "terms": self._base_terms,
+        }, separators=(",", ":")).encode()
+        data = b"".join((
+            INDEX_MAGIC, bytes([INDEX_VERSION]), struct.pack("<I", len(header)),
+            header, self._base_offsets.tobytes(), self._base_postings.tobytes(),
+        ))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, data)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Path = INDEX_FILE) -> "SearchIndex":
+        """Read a saved index; an empty index if missing or unreadable."""
+        index = cls()
+        try:
+            data = path.read_bytes()
+            if data[:3] != INDEX_MAGIC or data[3:4] != bytes([INDEX_VERSION]):
+                raise ValueError(f"not a version {INDEX_VERSION} index")
+            (header_length,) = struct.unpack_from("<I", data, 4)
+            end = 8 + header_length
+            header = json.loads(data[8:end])
+            terms = header["terms"]
+            postings_start = end + 8 * (len(terms) + 1)
+            offsets = array("Q")
+            offsets.frombytes(data[end:postings_start])
+            postings = array("I")
+            postings.frombytes(data[postings_start:])
+            if header["byteorder"] != sys.byteorder:
+                offsets.byteswap()
+                postings.byteswap()
+            if offsets[-1] != len(postings):
+                raise ValueError("truncated postings")
+            ids = header["ids"]
+            index._set_base(ids, terms, offsets, postings)
+            for note_id, version, length in zip(ids, header["versions"], header["lengths"]):
+                if note_id is None:
+                    index._dead += 1
+                else:
+                    index._versions[note_id] = version
+                    index._doc_lengths[note_id] = length
+                    index._total_length += length
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, IndexError, struct.error) as exc:
+            logger.warning("Rebuilding search index, cannot read %s: %s", path, exc)
+            index = cls()
+        return index
+
+    # --- Internals ---
+
+    def _set_base(self, ids, terms, offsets, postings):
+        self._base_ids = ids
+        self._base_numbers = {
+            note_id: number for number, note_id in enumerate(ids) if note_id is not None
+        }
+        self._base_terms = terms
+        self._base_term_index = {term: i for i, term in enumerate(terms)}
+        self._base_offsets = offsets
+        self._base_postings = postings
+
+    def _remove(self, note_id: str) -> bool:
+        terms = self._doc_terms.pop(note_id, None)
+        if terms is not None:
+            for term in terms:
+                del self._postings[term][note_id]
+        else:
+            number = self._base_numbers.pop(note_id, None)
+            if number is None:
+                return False
+            self._base_ids[number] = None
+            self._dead += 1
+        self._total_length -= self._doc_lengths.pop(note_id)
+        del self._versions[note_id]
+        return True
+
+    def _matches(self, term: str):
+        """(note id, count) pairs of the live notes containing term."""
+        i = self._base_term_index.get(term)
+        if i is not None:
+            ids = self._base_ids
+            chunk = self._base_postings[self._base_offsets[i]:self._base_offsets[i + 1]]
+            for number, count in zip(chunk[::2], chunk[1::2]):
+                note_id = ids[number]
+                if note_id is not None:
+                    yield note_id, count
+        delta = self._postings.get(term)
+        if delta:
+            yield from delta.items()
+
+    def _document_frequency(self, term: str) -> int:
+        """Notes containing term; dead base notes count until compaction."""
+        df = len(self._postings.get(term, ()))
+        i = self._base_term_index.get(term)
+        if i is not None:
+            df += (self._base_offsets[i + 1] - self._base_offsets[i]) // 2
+        return df
+
+    def _expand(self, token: str) -> list[str]:
+        """The token itself and the most frequent terms it is a prefix of."""
+        if not self._new_terms_sorted:
+            # Mostly sorted already, so this is close to linear
+            self._new_terms.sort()
+            self._new_terms_sorted = True
+        completions = []
+        for vocabulary in (self._base_terms, self._new_terms):
+            i = bisect.bisect_left(vocabulary, token)
+            while i < len(vocabulary) and vocabulary[i].startswith(token):
+                completions.append(vocabulary[i])
+                i += 1
+        completions = [t for t in completions if self._document_frequency(t)]
+        if len(completions) > MAX_PREFIX_TERMS:
+            exact = token in completions
+            completions = heapq.nlargest(
+                MAX_PREFIX_TERMS, completions, key=self._document_frequency,
+            )
+            if exact and token not in completions:
+                completions.append(token)
+        return completions
+
+
+def open_index(storage, path: Path = INDEX_FILE) -> SearchIndex:
+    """Load the saved index and re-index notes changed since it was saved.
+
+    For headless use; the app does the same work from idle callbacks.
+    """
+    index = SearchIndex.load(path)
+    headers = storage.load_headers()
+    versions = {h.id: h.updated_at for h in headers}
+    for note_id in index.outdated(headers):
+        index.update(note_id, runs_text(storage.load_content(note_id)), versions[note_id])
+    return index
@@ -1,137 +1,319 @@
 """Rich text serialization: TextBuffer <-> JSON runs."""
 
+import bisect
+import itertools
+import logging
+import os
+
 import gi
 gi.require_version("Gtk", "4.0")
 from gi.repository import Gtk
 
-from .formatting import (
-    get_or_create_color_tag, DEFAULT_FONT_SIZE, DEFAULT_FONT_FAMILY,
-    FONT_SIZES, FONT_FAMILIES,
-)
+from .document import Document
+from .formatting import get_style_registry
+
+logger = logging.getLogger(__name__)
+
+LOAD_CHUNK_CHARS = 16 * 1024  # Text inserted per step by deserialize_in_chunks
+LOAD_CHUNK_SPANS = 512  # Tag ranges applied per step by deserialize_in_chunks
 
 
 def serialize_buffer(buffer: Gtk.TextBuffer) -> list[dict]:
     """Serialize a TextBuffer's content into a list of styled runs."""
-    runs = []
-    start = buffer.get_start_iter()
-    end = buffer.get_end_iter()
+    return serialize_range(buffer, buffer.get_start_iter(), buffer.get_end_iter())
 
-    if start.equal(end):
+
+def serialize_range(
+    buffer: Gtk.TextBuffer, start: Gtk.TextIter, end: Gtk.TextIter
+) -> list[dict]:
+    """Serialize part of a TextBuffer into a list of merged styled runs.
+
+    Walks tag toggles once. A run is only cut where the decoded formatting
+    actually changes, so toggles of anonymous or unrelated tags cost a tag
+    lookup but no text copy.
+    """
+    if start.compare(end) >= 0:
         return []
 
+    decode = get_style_registry(buffer.get_tag_table()).decode
+
+    def style_at(it):
+        styles = []
+        for tag in it.get_tags():
+            style = decode(tag)
+            if style is not None:
+                styles.append(style)
+        styles.sort()
+        return styles
+
+    runs = []
+    run_start = start.copy()
+    style = style_at(run_start)
     it = start.copy()
-    while it.compare(end) < 0:
-        # Find next tag boundary
-        next_it = it.copy()
-        next_it.forward_to_tag_toggle(None)
-        if next_it.compare(end) > 0:
-            next_it = end.copy()
-
-        # If no progress, move forward one char to avoid infinite loop
-        if it.equal(next_it):
-            if not next_it.forward_char():
-                next_it = end.copy()
-
-        text = buffer.get_text(it, next_it, True)
-        if text:
-            run = {"text": text}
-
-            # Collect tags at this position
-            tags = it.get_tags()
-            for tag in tags:
-                name = tag.get_property("name")
-                if name is None:
-                    continue
-                if name == "bold":
-                    run["bold"] = True
-                elif name == "italic":
-                    run["italic"] = True
-                elif name == "underline":
-                    run["underline"] = True
-                elif name == "strikethrough":
-                    run["strikethrough"] = True
-                elif name.startswith("size-"):
-                    try:
-                        run["size"] = int(name[5:])
-                    except ValueError:
-                        pass
-                elif name.startswith("family-"):
-                    run["family"] = name[7:]
-                elif name.startswith("color-"):
-                    run["color"] = name[6:]
-
-            runs.append(run)
-
-        it = next_it
-
-    # Merge adjacent runs with identical formatting
-    return _merge_runs(runs)
+    while it.forward_to_tag_toggle(None) and it.compare(end) < 0:
+        next_style = style_at(it)
+        if next_style != style:
+            text = buffer.get_text(run_start, it, True)
+            if text:
+                runs.append({"text": text, **dict(style)})
+            run_start = it.copy()
+            style = next_style
+
+    text = buffer.get_text(run_start, end, True)
+    if text:
+        runs.append({"text": text, **dict(style)})
+    return runs
+
+
+class IncrementalSerializer:
+    """Keeps a buffer's serialized runs current by re-serializing only edits.
+
+    Insertions, deletions and tag changes widen a single dirty span. On the
+    next call to runs(), only that span is re-serialized from the buffer and
+    spliced into the cached runs it overlaps.
+
+    With verify=True (or STICKIES_VERIFY_SERIALIZE set), every result is
+    checked against a full serialization and the cache is repaired on a
+    mismatch.
+    """
+
+    def __init__(self, buffer: Gtk.TextBuffer, verify: bool = False):
+        self.buffer = buffer
+        self.verify = verify or bool(os.environ.get("STICKIES_VERIFY_SERIALIZE"))
+        self._runs: list[dict] | None = None  # None until the first full pass
+        self._lengths: list[int] = []  # Character length of each cached run
+        self._ends: list[int] = []  # Cumulative end offset of each cached run
+        # Dirty span in current buffer offsets; everything before it matches
+        # the cache, and everything after it matches the cache shifted by
+        # _delta characters.
+        self._lo: int | None = None
+        self._hi = 0
+        self._delta = 0
+        self.handler_ids = [
+            buffer.connect("insert-text", self._on_insert_text),
+            buffer.connect("delete-range", self._on_delete_range),
+            buffer.connect("apply-tag", self._on_tag_changed),
+            buffer.connect("remove-tag", self._on_tag_changed),
+        ]
+
+    def invalidate(self):
+        """Forget the cache; the next runs() serializes the whole buffer."""
+        self._runs = None
+        self._lo = None
+        self._delta = 0
+
+    def runs(self) -> list[dict]:
+        """Return the buffer's runs. The list is new; its runs are shared."""
+        if self._runs is None or not self._runs:
+            self._set_runs(serialize_buffer(self.buffer))
+        elif self._lo is not None:
+            self._splice()
+        self._lo = None
+        self._delta = 0
+
+        if self.verify:
+            full = serialize_buffer(self.buffer)
+            if full != self._runs:
+                logger.error("Incremental serialization diverged; repairing cache")
+                self._set_runs(full)
+        return list(self._runs)
+
+    def _set_runs(self, runs: list[dict]):
+        self._runs = runs
+        self._lengths = [len(run["text"]) for run in runs]
+        self._ends = list(itertools.accumulate(self._lengths))
+
+    def _splice(self):
+        runs = self._runs
+        count = len(runs)
+        lo = self._lo
+        old_hi = max(self._hi - self._delta, lo)
+
+        # Cached runs i..j overlap the dirty span (in pre-edit offsets)
+        i = min(bisect.bisect_right(self._ends, lo), count - 1)
+        j = max(min(bisect.bisect_left(self._ends, old_hi), count - 1), i)
+
+        # Only the dirty span is read back from the buffer; the clean ends of
+        # runs i and j are cut from the cache, so a keystroke in one long run
+        # does not copy the whole run out of the buffer
+        middle = serialize_range(
+            self.buffer,
+            self.buffer.get_iter_at_offset(lo),
+            self.buffer.get_iter_at_offset(self._hi),
+        )
+        head = runs[i]["text"][:lo - (self._ends[i - 1] if i else 0)]
+        if head:
+            middle.insert(0, {**runs[i], "text": head})
+        tail = runs[j]["text"][old_hi - (self._ends[j - 1] if j else 0):]
+        if tail:
+            middle.append({**runs[j], "text": tail})
+        # Include the neighbours so runs whose style now matches get merged
+        a = max(i - 1, 0)
+        b = min(j + 2, count)
+        merged = _merge_adjacent(runs[a:i] + middle + runs[j + 1:b])
+        runs[a:b] = merged
+        self._lengths[a:b] = [len(run["text"]) for run in merged]
+        self._ends = list(itertools.accumulate(self._lengths))
+
+    def _widen(self, lo: int, hi: int):
+        if self._lo is None:
+            self._lo, self._hi = lo, hi
+        else:
+            self._lo = min(self._lo, lo)
+            self._hi = max(self._hi, hi)
+
+    def _on_insert_text(self, buffer, location, text, length):
+        pos = location.get_offset()
+        n = len(text)
+        if self._lo is not None and pos <= self._hi:
+            self._hi += n
+        self._widen(pos, pos + n)
+        self._delta += n
+
+    def _on_delete_range(self, buffer, start, end):
+        a = start.get_offset()
+        b = end.get_offset()
+        if self._lo is None:
+            self._lo = self._hi = a
+        else:
+            self._hi = self._hi - (b - a) if b <= self._hi else a
+            self._lo = min(self._lo, a)
+            self._hi = max(self._hi, self._lo)
+        self._delta -= b - a
+
+    def _on_tag_changed(self, buffer, tag, start, end):
+        self._widen(start.get_offset(), end.get_offset())
+
+
+def _merge_adjacent(runs: list[dict]) -> list[dict]:
+    """Merge neighbouring runs with equal formatting into new run dicts."""
+    merged = []
+    for run in runs:
+        if merged and _same_style(merged[-1], run):
+            prev = merged[-1]
+            merged[-1] = {**prev, "text": prev["text"] + run["text"]}
+        else:
+            merged.append(run)
+    return merged
+
+
+def _same_style(a: dict, b: dict) -> bool:
+    return len(a) == len(b) and all(
+        key == "text" or b.get(key, b) == value for key, value in a.items()
+    )
 
 
 def deserialize_to_buffer(buffer: Gtk.TextBuffer, runs: list[dict]):
-    """Restore styled runs into a TextBuffer."""
+    """Restore styled runs into a TextBuffer.
+
+    All text is inserted at once, then each tag is applied over its
+    precomputed offset ranges (adjacent ranges merged), so the cost does not
+    depend on how finely the runs are split. The load is not undoable.
+    """
+    text, ranges = _layout_runs(runs)
+    buffer.begin_irreversible_action()
+    buffer.set_text(text)
+    registry = get_style_registry(buffer.get_tag_table())
+    for name, spans in ranges.items():
+        tag = registry.tag_for_name(name)
+        if tag is None:
+            continue
+        for start_offset, end_offset in spans:
+            buffer.apply_tag(
+                tag,
+                buffer.get_iter_at_offset(start_offset),
+                buffer.get_iter_at_offset(end_offset),
+            )
+    buffer.end_irreversible_action()
+
+
+def deserialize_in_chunks(buffer: Gtk.TextBuffer, runs: list[dict]):
+    """Restore styled runs into a TextBuffer a piece at a time.
+
+    A generator for very large notes: each step inserts up to
+    LOAD_CHUNK_CHARS of text or applies up to LOAD_CHUNK_SPANS tag ranges,
+    then yields the number of steps done so the caller can return to the
+    main loop. Text appears first and is styled afterwards. The result is
+    the same as deserialize_to_buffer.
+    """
+    text, ranges = _layout_runs(runs)
+    registry = get_style_registry(buffer.get_tag_table())
+    steps = 0
+
+    buffer.begin_irreversible_action()
     buffer.set_text("")
+    buffer.end_irreversible_action()
+    for start in range(0, len(text), LOAD_CHUNK_CHARS):
+        buffer.begin_irreversible_action()
+        buffer.insert(buffer.get_end_iter(), text[start:start + LOAD_CHUNK_CHARS])
+        buffer.end_irreversible_action()
+        steps += 1
+        yield steps
+
+    spans = [
+        (name, start, end)
+        for name, tag_spans in ranges.items()
+        for start, end in tag_spans
+    ]
+    for first in range(0, len(spans), LOAD_CHUNK_SPANS):
+        # Tags are looked up per step: a dynamic tag the buffer does not use
+        # yet can be collected while the main loop runs between steps
+        tags = {}
+        buffer.begin_irreversible_action()
+        for name, start, end in spans[first:first + LOAD_CHUNK_SPANS]:
+            if name not in tags:
+                tags[name] = registry.tag_for_name(name)
+            tag = tags[name]
+            if tag is not None:
+                buffer.apply_tag(
+                    tag, buffer.get_iter_at_offset(start), buffer.get_iter_at_offset(end),
+                )
+        buffer.end_irreversible_action()
+        steps += 1
+        yield steps
+
+
+def _layout_runs(runs: list[dict]) -> tuple[str, dict[str, list[list[int]]]]:
+    """Joined text of runs and, per tag name, its merged [start, end] ranges."""
+    texts = []
+    ranges: dict[str, list[list[int]]] = {}  # tag name -> [[start, end], ...]
+    offset = 0
     for run in runs:
         text = run.get("text", "")
         if not text:
             continue
+        end = offset + len(text)
+        for name in _run_tag_names(run):
+            spans = ranges.setdefault(name, [])
+            if spans and spans[-1][1] == offset:
+                spans[-1][1] = end
+            else:
+                spans.append([offset, end])
+        texts.append(text)
+        offset = end
+    return "".join(texts), ranges
 
-        # Insert text
-        end = buffer.get_end_iter()
-        offset_before = end.get_offset()
-        buffer.insert(end, text)
-
-        # Apply tags
-        start_iter = buffer.get_iter_at_offset(offset_before)
-        end_iter = buffer.get_end_iter()
-
-        if run.get("bold"):
-            tag = buffer.get_tag_table().lookup("bold")
-            if tag:
-                buffer.apply_tag(tag, start_iter, end_iter)
-
-        if run.get("italic"):
-            tag = buffer.get_tag_table().lookup("italic")
-            if tag:
-                buffer.apply_tag(tag, start_iter, end_iter)
-
-        if run.get("underline"):
-            tag = buffer.get_tag_table().lookup("underline")
-            if tag:
-                buffer.apply_tag(tag, start_iter, end_iter)
-
-        if run.get("strikethrough"):
-            tag = buffer.get_tag_table().lookup("strikethrough")
-            if tag:
-                buffer.apply_tag(tag, start_iter, end_iter)
-
-        if "size" in run:
-            tag = buffer.get_tag_table().lookup(f"size-{run['size']}")
-            if tag:
-                buffer.apply_tag(tag, start_iter, end_iter)
-
-        if "family" in run:
-            tag = buffer.get_tag_table().lookup(f"family-{run['family']}")
-            if tag:
-                buffer.apply_tag(tag, start_iter, end_iter)
-
-        if "color" in run:
-            tag = get_or_create_color_tag(buffer, run["color"])
-            buffer.apply_tag(tag, start_iter, end_iter)
-
-
-def _merge_runs(runs: list[dict]) -> list[dict]:
-    """Merge adjacent runs with identical formatting."""
-    if not runs:
-        return []
-    merged = [runs[0]]
-    for run in runs[1:]:
-        prev = merged[-1]
-        # Compare formatting (everything except text)
-        prev_fmt = {k: v for k, v in prev.items() if k != "text"}
-        curr_fmt = {k: v for k, v in run.items() if k != "text"}
-        if prev_fmt == curr_fmt:
-            prev["text"] += run["text"]
-        else:
-            merged.append(run)
-    return merged
+
+def _run_tag_names(run: dict) -> list[str]:
+    """Names of the formatting tags a run needs."""
+    names = [
+        name for name in ("bold", "italic", "underline", "strikethrough")
+        if run.get(name)
+    ]
+    if "size" in run:
+        names.append(f"size-{run['size']}")
+    if "family" in run:
+        names.append(f"family-{run['family']}")
+    if "color" in run:
+        names.append(f"color-{run['color']}")
+    return names
+
+
+def document_from_buffer(buffer: Gtk.TextBuffer) -> Document:
+    """Build a headless Document from a TextBuffer's content."""
+    return Document.from_runs(serialize_buffer(buffer))
+
+
+def document_to_buffer(document: Document, buffer: Gtk.TextBuffer):
+    """Replace a TextBuffer's content with a Document's."""
+    deserialize_to_buffer(buffer, document.to_runs())
@@ -8,6 +8,7 @@ from gi.repository import Gtk
 def setup_app_shortcuts(app):
     """Register application-level keyboard shortcuts."""
     app.set_accels_for_action("app.new-note", ["<Control>n"])
+    app.set_accels_for_action("app.show-manager", ["<Control><Shift>m"])
     app.set_accels_for_action("app.quit", ["<Control>q"])
 
 
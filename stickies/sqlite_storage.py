@@ -0,0 +1,291 @@
+"""SQLite persistence for notes.
+
+Selected with STICKIES_STORAGE=sqlite. Each note is one row keyed by its id,
+so saving a changed note is a single-row UPSERT. Content is stored in the
+compact format from storage.encode_content. Metadata columns (including
+the title and content size) are covered by an index, so note headers can be
+listed without reading any content.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from .models import Note, NoteHeader, note_title
+from .storage import (
+    CONFIG_DIR, NOTES_FILE, decode_content, encode_content, import_json,
+)
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = CONFIG_DIR / "notes.db"
+
+SCHEMA_VERSION = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    color TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    always_on_top INTEGER NOT NULL,
+    translucent INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL DEFAULT 0,
+    hibernated INTEGER NOT NULL DEFAULT 0,
+    title TEXT NOT NULL DEFAULT '',
+    content_length INTEGER NOT NULL DEFAULT 0,
+    content BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_header ON notes (
+    position, id, color, width, height, always_on_top, translucent, created_at,
+    updated_at, hibernated, title, content_length
+);
+CREATE INDEX IF NOT EXISTS notes_color ON notes (color);
+CREATE INDEX IF NOT EXISTS notes_created_at ON notes (created_at);
+CREATE INDEX IF NOT EXISTS notes_always_on_top ON notes (always_on_top);
+"""
+
+_META_COLUMNS = (
+    "id", "color", "width", "height", "always_on_top", "translucent", "created_at",
+    "updated_at", "hibernated",
+)
+_HEADER_COLUMNS = _META_COLUMNS + ("title", "content_length")
+
+# Schema upgrades, applied in order to databases older than SCHEMA_VERSION
+_MIGRATIONS = {
+    2: """
+ALTER TABLE notes ADD COLUMN title TEXT NOT NULL DEFAULT '';
+ALTER TABLE notes ADD COLUMN content_length INTEGER NOT NULL DEFAULT 0;
+DROP INDEX IF EXISTS notes_meta;
+""",
+    3: """
+ALTER TABLE notes ADD COLUMN updated_at REAL NOT NULL DEFAULT 0;
+UPDATE notes SET updated_at = created_at;
+DROP INDEX IF EXISTS notes_header;
+""",
+    4: """
+ALTER TABLE notes ADD COLUMN hibernated INTEGER NOT NULL DEFAULT 0;
+DROP INDEX IF EXISTS notes_header;
+""",
+}
+
+_UPSERT = """
+INSERT INTO notes (
+    id, position, color, width, height, always_on_top, translucent, created_at,
+    updated_at, hibernated, title, content_length, content
+) VALUES (
+    :id, (SELECT COALESCE(MAX(position), -1) + 1 FROM notes), :color, :width,
+    :height, :always_on_top, :translucent, :created_at, :updated_at, :hibernated,
+    :title, :content_length, :content
+)
+ON CONFLICT (id) DO UPDATE SET
+    color = excluded.color,
+    width = excluded.width,
+    height = excluded.height,
+    always_on_top = excluded.always_on_top,
+    translucent = excluded.translucent,
+    created_at = excluded.created_at,
+    updated_at = excluded.updated_at,
+    hibernated = excluded.hibernated,
+    title = excluded.title,
+    content_length = excluded.content_length,
+    content = excluded.content
+"""
+
+# Used for notes whose content was never loaded
+_UPDATE_META = """
+UPDATE notes SET
+    color = :color,
+    width = :width,
+    height = :height,
+    always_on_top = :always_on_top,
+    translucent = :translucent,
+    created_at = :created_at,
+    updated_at = :updated_at,
+    hibernated = :hibernated
+WHERE id = :id
+"""
+
+
+class SqliteStorage:
+    """Stores notes as rows of a WAL-mode SQLite database."""
+
+    def __init__(self, db_file: Path = DB_FILE, legacy_file: Path = NOTES_FILE):
+        self.db_file = Path(db_file)
+        self.legacy_file = Path(legacy_file)
+        self._lock = threading.Lock()  # The connection is shared with the writer
+        self._conn: sqlite3.Connection | None = None
+        self._ids: list[str] = []  # Note ids in the table, in order
+        self._import_pending = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            created = not self.db_file.exists()
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version and version < SCHEMA_VERSION:
+                self._migrate(conn, version)
+            with conn:
+                conn.executescript(_SCHEMA)
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._conn = conn
+            self._import_pending = created and self.legacy_file.exists()
+        return self._conn
+
+    def load(self) -> list[Note]:
+        """Load all notes with their content."""
+        self._prepare()
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(_META_COLUMNS)}, content FROM notes ORDER BY position"
+            ).fetchall()
+        notes = []
+        for row in rows:
+            data = self._meta(row)
+            try:
+                data["content"] = _decode(row[-1])
+            except (ValueError, IndexError, KeyError):
+                logger.warning("Skipping note %s with unreadable content", data["id"])
+                continue
+            notes.append(Note.from_dict(data))
+        self._ids = [n.id for n in notes]
+        return notes
+
+    def load_headers(self) -> list[NoteHeader]:
+        """Load note metadata from the covering index, without content."""
+        self._prepare()
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(_HEADER_COLUMNS)} FROM notes ORDER BY position"
+            ).fetchall()
+        headers = []
+        for row in rows:
+            data = self._meta(row)
+            data["title"], data["content_length"] = row[-2:]
+            headers.append(NoteHeader.from_dict(data))
+        self._ids = [h.id for h in headers]
+        return headers
+
+    def load_content(self, note_id: str) -> list[dict]:
+        """Load the rich text runs of a single note."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT content FROM notes WHERE id = ?", (note_id,),
+            ).fetchone()
+        if row is None:
+            return []
+        try:
+            return _decode(row[0])
+        except (ValueError, IndexError, KeyError):
+            logger.warning("Unreadable content for note %s", note_id)
+            return []
+
+    def save(self, notes: list[Note], changed_ids: set[str] | None = None):
+        """Upsert notes in changed_ids (all if None) and delete missing ones.
+
+        Notes not previously saved are always written.
+        """
+        known = set(self._ids)
+        changed = [
+            n for n in notes
+            if changed_ids is None or n.id in changed_ids or n.id not in known
+        ]
+        self.write([n.id for n in notes], changed)
+
+    def write(self, ids: list[str], changed: list[Note]):
+        """Persist the changed notes and the current list of note ids.
+
+        Notes no longer in ids are deleted. New notes must be in changed.
+        """
+        id_set = set(ids)
+        deleted = set(self._ids).difference(id_set)
+        rows = [self._row(n) for n in changed if n.id in id_set]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if deleted:
+                    conn.executemany(
+                        "DELETE FROM notes WHERE id = ?", [(i,) for i in deleted],
+                    )
+                upserts = [r for r in rows if r["content"] is not None]
+                if upserts:
+                    conn.executemany(_UPSERT, upserts)
+                updates = [r for r in rows if r["content"] is None]
+                if updates:
+                    conn.executemany(_UPDATE_META, updates)
+        self._ids = list(ids)
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _row(note: Note) -> dict:
+        data = note.to_dict()
+        data["always_on_top"] = int(note.always_on_top)
+        data["translucent"] = int(note.translucent)
+        data["hibernated"] = int(note.hibernated)
+        if note.content is not None:
+            data["content"] = encode_content(note.content)
+            data["content_length"] = len(data["content"])
+            data["title"] = note_title(note.content)
+        return data
+
+    @staticmethod
+    def _meta(row) -> dict:
+        data = dict(zip(_META_COLUMNS, row))
+        data["always_on_top"] = bool(data["always_on_top"])
+        data["translucent"] = bool(data["translucent"])
+        data["hibernated"] = bool(data["hibernated"])
+        return data
+
+    def _prepare(self):
+        """Open the database, importing the legacy notes.json on first run."""
+        with self._lock:
+            self._connect()
+        if self._import_pending:
+            self._import_pending = False
+            self._import_legacy()
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection, version: int):
+        with conn:
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                conn.executescript(_MIGRATIONS[target])
+            if version < 2:
+                # Version 1 rows hold JSON content and lack the header columns
+                rows = conn.execute("SELECT id, content FROM notes").fetchall()
+                for note_id, content in rows:
+                    try:
+                        title = note_title(json.loads(content))
+                    except ValueError:
+                        title = ""
+                    conn.execute(
+                        "UPDATE notes SET title = ?, content_length = ? WHERE id = ?",
+                        (title, len(content.encode()), note_id),
+                    )
+        logger.info("Upgraded %s schema from version %d", DB_FILE.name, version)
+
+    def _import_legacy(self):
+        try:
+            count = import_json(self.legacy_file, self)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            logger.error("Not importing unreadable %s", self.legacy_file)
+            return
+        logger.info("Imported %d notes from %s", count, self.legacy_file)
+
+
+def _decode(content: bytes | str) -> list[dict]:
+    """Decode a content column; rows from older versions hold JSON text."""
+    if isinstance(content, bytes):
+        return decode_content(content)
+    return json.loads(content)
@@ -0,0 +1,85 @@
+"""Progressive startup: show one note right away, build the rest when idle."""
+
+import logging
+import time
+from collections import deque
+
+from gi.repository import GLib
+
+from .models import Note
+
+logger = logging.getLogger(__name__)
+
+FRAME_BUDGET = 0.008  # Seconds of window building per idle callback
+
+
+class StartupScheduler:
+    """Opens the windows of saved notes without blocking the first frame.
+
+    The most recently edited note is presented immediately. The others are
+    built from idle callbacks, as many per main loop iteration as fit in
+    FRAME_BUDGET, so the first window can draw and respond in between.
+    """
+
+    def __init__(self, app, notes: list[Note], started: float | None = None):
+        self.app = app
+        self._started = time.monotonic() if started is None else started
+        self._order = sorted(notes, key=lambda n: n.updated_at, reverse=True)
+        self._pending: deque[Note] = deque()
+        self._first = None
+        self._source = None
+
+    @property
+    def running(self) -> bool:
+        """Whether windows are still waiting to be built."""
+        return self._source is not None
+
+    def start(self):
+        if not self._order:
+            return
+        first, *rest = self._order
+        self._first = self.app.open_note_window(first)
+        self._first.connect("map", self._on_first_mapped)
+        self._pending.extend(rest)
+        if self._pending:
+            self._source = GLib.idle_add(self._build_batch)
+        else:
+            self._finish()
+
+    def cancel(self):
+        """Stop building windows, e.g. when the app shuts down."""
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+        self._pending.clear()
+
+    def _on_first_mapped(self, window):
+        logger.info("First note window shown after %.0f ms", self._elapsed_ms())
+        window.disconnect_by_func(self._on_first_mapped)
+
+    def _build_batch(self) -> bool:
+        deadline = time.monotonic() + FRAME_BUDGET
+        while self._pending:
+            note = self._pending.popleft()
+            # The note may have been deleted or opened in the meantime
+            if note.id in self.app.notes and note.id not in self.app.windows:
+                self.app.open_note_window(note, present=False)
+            if time.monotonic() >= deadline:
+                break
+        if self._pending:
+            return True
+        self._source = None
+        self._finish()
+        return False
+
+    def _finish(self):
+        logger.info(
+            "All %d note windows built after %.0f ms",
+            len(self._order), self._elapsed_ms(),
+        )
+        # Windows shown later may have been stacked above the first one
+        if self._first is not None and self._first.get_visible():
+            self._first.present()
+
+    def _elapsed_ms(self) -> float:
+        return (time.monotonic() - self._started) * 1000
@@ -1,27 +1,742 @@
-"""JSON persistence for notes."""
+"""Note persistence: per-note files plus a write-ahead journal."""
 
+import contextlib
+import dataclasses
 import json
+import logging
 import os
+import tempfile
+import threading
+import time
 from pathlib import Path
-from .models import Note
+from .models import Note, NoteHeader, check_note_id
+
+logger = logging.getLogger(__name__)
 
 CONFIG_DIR = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config")) / "claude-stickies"
-NOTES_FILE = CONFIG_DIR / "notes.json"
+NOTES_FILE = CONFIG_DIR / "notes.json"  # Legacy single-file layout
+NOTES_DIR = CONFIG_DIR / "notes"
+JOURNAL_FILE = CONFIG_DIR / "journal.jsonl"
+
+MANIFEST_VERSION = 2
+COMPACT_THRESHOLD = 256 * 1024  # Journal bytes before folding into note files
+MAX_JOURNAL_BACKLOG = 16 * COMPACT_THRESHOLD  # Journal bytes before writes wait for compaction
+FSYNC_INTERVAL = 1.0  # Most seconds a journaled save waits to be fsynced
+
+
+def _atomic_write(path: Path, data: bytes):
+    """Write a file via temp file + rename so readers never see partial data."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+# --- Compact note format ---
+#
+# Content blob (version 1):
+#   b"STC" u8:version
+#   varint:n_styles, then per style:
+#     u8:flags [varint:size] [str:family] [str:color] [str:extra JSON]
+#   str:text (UTF-8, all runs concatenated)
+#   varint:n_runs, then per run: varint:length (characters) varint:style_id
+# Note file (version 1):
+#   b"STN" u8:version str:metadata JSON (no content) content-blob
+# A str is a varint byte length followed by UTF-8 bytes.
+
+CONTENT_MAGIC = b"STC"
+NOTE_MAGIC = b"STN"
+FORMAT_VERSION = 1
+
+_BOOL_FLAGS = (("bold", 1), ("italic", 2), ("underline", 4), ("strikethrough", 8))
+_HAS_SIZE = 16
+_HAS_FAMILY = 32
+_HAS_COLOR = 64
+_HAS_EXTRA = 128
+
+
+def _put_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _put_str(out: bytearray, value: str):
+    raw = value.encode()
+    _put_varint(out, len(raw))
+    out += raw
+
+
+def _get_str(data: bytes, pos: int) -> tuple[str, int]:
+    length, pos = _get_varint(data, pos)
+    return data[pos:pos + length].decode(), pos + length
+
+
+def _encode_style(out: bytearray, style: dict):
+    style = dict(style)
+    flags = 0
+    for key, bit in _BOOL_FLAGS:
+        if style.pop(key, False) is True:
+            flags |= bit
+    size = style.pop("size", None)
+    if isinstance(size, int) and not isinstance(size, bool) and size >= 0:
+        flags |= _HAS_SIZE
+    elif size is not None:
+        style["size"] = size
+    family = style.pop("family", None)
+    if family is not None:
+        flags |= _HAS_FAMILY
+    color = style.pop("color", None)
+    if color is not None:
+        flags |= _HAS_COLOR
+    if style:
+        flags |= _HAS_EXTRA
+    out.append(flags)
+    if flags & _HAS_SIZE:
+        _put_varint(out, size)
+    if flags & _HAS_FAMILY:
+        _put_str(out, family)
+    if flags & _HAS_COLOR:
+        _put_str(out, color)
+    if flags & _HAS_EXTRA:
+        _put_str(out, json.dumps(style, separators=(",", ":")))
+
+
+def _decode_style(data: bytes, pos: int) -> tuple[dict, int]:
+    flags = data[pos]
+    pos += 1
+    style = {key: True for key, bit in _BOOL_FLAGS if flags & bit}
+    if flags & _HAS_SIZE:
+        style["size"], pos = _get_varint(data, pos)
+    if flags & _HAS_FAMILY:
+        style["family"], pos = _get_str(data, pos)
+    if flags & _HAS_COLOR:
+        style["color"], pos = _get_str(data, pos)
+    if flags & _HAS_EXTRA:
+        extra, pos = _get_str(data, pos)
+        style.update(json.loads(extra))
+    return style, pos
+
+
+def encode_content(runs: list[dict]) -> bytes:
+    """Encode rich text runs in the compact format.
+
+    The text is stored once; each distinct combination of formatting is
+    stored once in a style table that runs refer to by index.
+    """
+    styles: dict[tuple, int] = {}
+    table = []
+    packed = []
+    texts = []
+    for run in runs:
+        text = run.get("text", "")
+        if not text:
+            continue
+        attrs = {k: v for k, v in run.items() if k != "text"}
+        key = tuple(sorted(attrs.items()))
+        try:
+            style_id = styles.get(key)
+        except TypeError:
+            # Unhashable values can only come from unknown attributes
+            key = json.dumps(attrs, sort_keys=True)
+            style_id = styles.get(key)
+        if style_id is None:
+            style_id = styles[key] = len(table)
+            table.append(attrs)
+        texts.append(text)
+        packed.append((len(text), style_id))
+
+    out = bytearray(CONTENT_MAGIC)
+    out.append(FORMAT_VERSION)
+    _put_varint(out, len(table))
+    for style in table:
+        _encode_style(out, style)
+    _put_str(out, "".join(texts))
+    _put_varint(out, len(packed))
+    for length, style_id in packed:
+        _put_varint(out, length)
+        _put_varint(out, style_id)
+    return bytes(out)
+
+
+def decode_content(data: bytes) -> list[dict]:
+    """Decode rich text runs from the compact format."""
+    content, _ = _decode_content(data, 0)
+    return content
+
+
+def _decode_content(data: bytes, pos: int) -> tuple[list[dict], int]:
+    if data[pos:pos + 3] != CONTENT_MAGIC:
+        raise ValueError("Not a compact content blob")
+    if data[pos + 3] > FORMAT_VERSION:
+        raise ValueError(f"Unsupported content format version {data[pos + 3]}")
+    pos += 4
+    count, pos = _get_varint(data, pos)
+    table = []
+    for _ in range(count):
+        style, pos = _decode_style(data, pos)
+        table.append(style)
+    text, pos = _get_str(data, pos)
+    count, pos = _get_varint(data, pos)
+    runs = []
+    offset = 0
+    for _ in range(count):
+        length, pos = _get_varint(data, pos)
+        style_id, pos = _get_varint(data, pos)
+        runs.append({"text": text[offset:offset + length], **table[style_id]})
+        offset += length
+    return runs, pos
+
+
+def encode_note_record(data: dict) -> bytes:
+    """Encode a note dict (as from Note.to_dict) in the compact format."""
+    meta = {k: v for k, v in data.items() if k != "content"}
+    out = bytearray(NOTE_MAGIC)
+    out.append(FORMAT_VERSION)
+    _put_str(out, json.dumps(meta, separators=(",", ":")))
+    out += encode_content(data.get("content", []))
+    return bytes(out)
+
+
+def decode_note_record(data: bytes) -> dict:
+    """Decode a note dict from the compact format, or from JSON."""
+    if data[:3] != NOTE_MAGIC:
+        return json.loads(data)
+    if data[3] > FORMAT_VERSION:
+        raise ValueError(f"Unsupported note format version {data[3]}")
+    meta, pos = _get_str(data, 4)
+    record = json.loads(meta)
+    record["content"], _ = _decode_content(data, pos)
+    return record
+
+
+class FileStorage:
+    """Stores each note in its own file, ordered by a small manifest.
+
+    Saves append the changed note records to a write-ahead journal, so the
+    cost of a save follows the size of the edit rather than the size of all
+    notes. Once the journal passes COMPACT_THRESHOLD it is rotated and folded
+    into the per-note files by a background thread. Loading replays the
+    per-note snapshot, then any rotated journal, then the live journal.
+    Damaged journal lines are skipped, and compaction moves them to a
+    .damaged file next to the journal rather than dropping them.
+
+    Note files use the compact format (see encode_note_record); JSON note
+    files written by older versions are still read.
+    """
+
+    def __init__(
+        self,
+        notes_dir: Path = NOTES_DIR,
+        legacy_file: Path = NOTES_FILE,
+        journal_file: Path = JOURNAL_FILE,
+    ):
+        self.notes_dir = Path(notes_dir)
+        self.manifest_file = self.notes_dir / "manifest.json"
+        self.legacy_file = Path(legacy_file)
+        self.journal_file = Path(journal_file)
+        self.old_journal_file = self.journal_file.with_name(self.journal_file.name + ".old")
+        self.damaged_journal_file = self.journal_file.with_name(self.journal_file.name + ".damaged")
+        self._ids: list[str] = []  # Note ids on disk, in order
+        self._lock = threading.Lock()  # Guards the journal and _journal_notes
+        # Records put since their last compaction, by id; content is served
+        # from here until the note file on disk catches up
+        self._journal_notes: dict[str, dict] = {}
+        self._fd: int | None = None
+        self._journal_size = 0
+        self._last_fsync = 0.0
+        self._unsynced = False
+        self._fsync_timer: threading.Timer | None = None
+        self._compactor: threading.Thread | None = None
+
+    def note_path(self, note_id: str) -> Path:
+        """Path of the file holding a single note."""
+        check_note_id(note_id)
+        return self.notes_dir / f"{note_id}.note"
+
+    def load(self) -> list[Note]:
+        """Load all notes with their content."""
+        notes = []
+        for header in self.load_headers():
+            note = header.to_note()
+            note.content = self.load_content(note.id)
+            notes.append(note)
+        return notes
+
+    def load_headers(self) -> list[NoteHeader]:
+        """Load note metadata without reading any note content.
+
+        Migrates the legacy notes.json on first run.
+        """
+        if not self.manifest_file.exists() and not self.journal_file.exists():
+            self._migrate_legacy()
+
+        headers = self._read_manifest()
+        for note_id, header in headers.items():
+            if header is None:
+                # Manifests before version 2 only listed ids
+                data = self._read_note_file(note_id)
+                if data is not None:
+                    headers[note_id] = _header_from_record(data)
+
+        self._truncate_torn_tail()
+        journal_notes = {}
+        for path in (self.old_journal_file, self.journal_file):
+            for op, note_id, data in self._read_journal(path):
+                if op == "del":
+                    headers.pop(note_id, None)
+                    journal_notes.pop(note_id, None)
+                    continue
+                if "content" not in data:
+                    # Metadata-only record: content is unchanged
+                    data = {**journal_notes.get(note_id, {}), **data}
+                journal_notes[note_id] = data
+                if "content" in data:
+                    headers[note_id] = _header_from_record(data)
+                elif headers.get(note_id) is not None:
+                    headers[note_id] = dataclasses.replace(
+                        headers[note_id], **_header_fields(data),
+                    )
+
+        result = []
+        for note_id, header in headers.items():
+            if header is None:
+                # Leave the file on disk; it just drops out of the manifest
+                logger.warning("Skipping unreadable note %s", note_id)
+            else:
+                result.append(header)
+        self._ids = [h.id for h in result]
+
+        with self._lock:
+            self._journal_notes = journal_notes
+            self._journal_size = self._file_size(self.journal_file)
+            if self.old_journal_file.exists() or self._journal_size >= COMPACT_THRESHOLD:
+                self._start_compaction()
+        return result
+
+    def load_content(self, note_id: str) -> list[dict]:
+        """Load the rich text runs of a single note."""
+        with self._lock:
+            data = self._journal_notes.get(note_id)
+            if data is not None and "content" in data:
+                return data["content"]
+        data = self._read_note_file(note_id)
+        if data is None:
+            return []
+        return data.get("content", [])
+
+    def save(self, notes: list[Note], changed_ids: set[str] | None = None):
+        """Save notes, journaling only those in changed_ids (all if None).
+
+        Notes not previously saved are always written; notes missing from
+        the list are deleted.
+        """
+        known = set(self._ids)
+        changed = [
+            n for n in notes
+            if changed_ids is None or n.id in changed_ids or n.id not in known
+        ]
+        self.write([n.id for n in notes], changed)
+
+    def write(self, ids: list[str], changed: list[Note]):
+        """Persist the changed notes and the current list of note ids.
+
+        Notes no longer in ids are deleted. New notes must be in changed.
+        A note whose content is None only has its metadata updated. Raises
+        ValueError, before writing anything, if a note id cannot name a file.
+        """
+        for note in changed:
+            check_note_id(note.id)
+        id_set = set(ids)
+        records = []
+        for note in changed:
+            if note.id in id_set:
+                data = note.to_dict()
+                if note.content is None:
+                    del data["content"]
+                records.append({"op": "put", "note": data})
+        for note_id in set(self._ids).difference(id_set):
+            records.append({"op": "del", "id": note_id})
+        self._ids = list(ids)
+        if records:
+            self._append(records)
+            self._limit_backlog()
+
+    def close(self):
+        """Flush the journal to stable storage and wait for compaction."""
+        with self._lock:
+            if self._fsync_timer is not None:
+                self._fsync_timer.cancel()
+                self._fsync_timer = None
+            if self._fd is not None:
+                if self._unsynced:
+                    os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+                self._unsynced = False
+            compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    # --- Journal ---
+
+    def _append(self, records: list[dict]):
+        data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+        data = data.encode()
+        with self._lock:
+            for record in records:
+                if record["op"] == "del":
+                    self._journal_notes.pop(record["id"], None)
+                    continue
+                note = record["note"]
+                if "content" not in note:
+                    note = {**self._journal_notes.get(note["id"], {}), **note}
+                self._journal_notes[note["id"]] = note
+            if self._fd is None:
+                self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(
+                    self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600,
+                )
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+            self._journal_size += len(data)
+            self._unsynced = True
+
+            now = time.monotonic()
+            if now - self._last_fsync >= FSYNC_INTERVAL:
+                self._fsync()
+            elif self._fsync_timer is None:
+                # Sync the end of a burst of saves even if no save follows
+                self._fsync_timer = threading.Timer(
+                    self._last_fsync + FSYNC_INTERVAL - now, self._deferred_fsync,
+                )
+                self._fsync_timer.name = "stickies-fsync"
+                self._fsync_timer.daemon = True
+                self._fsync_timer.start()
+
+            if self._journal_size >= COMPACT_THRESHOLD:
+                self._start_compaction()
+
+    def _fsync(self):
+        """Sync the journal to disk. Must be called with _lock held."""
+        os.fsync(self._fd)
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    def _deferred_fsync(self):
+        with self._lock:
+            self._fsync_timer = None
+            if self._fd is not None and self._unsynced:
+                try:
+                    self._fsync()
+                except OSError:
+                    logger.exception("Could not sync the journal")
+
+    def _limit_backlog(self):
+        """Wait for a running compaction if writes have outpaced it.
+
+        Records stay cached in memory until compacted, so bulk writes (e.g.
+        an import) would otherwise grow the journal and the cache without
+        bound while a single compaction is still writing note files.
+        """
+        with self._lock:
+            compactor = self._compactor
+            if self._journal_size < MAX_JOURNAL_BACKLOG or compactor is None:
+                return
+        compactor.join()
+        with self._lock:
+            if self._journal_size >= COMPACT_THRESHOLD:
+                self._start_compaction()
+
+    def _read_journal(self, path: Path, damaged: list[bytes] | None = None):
+        """Yield (op, note_id, note_dict) from a journal, skipping damage.
+
+        Damaged lines are logged and, if damaged is given, collected in it.
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            for lineno, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                    if record["op"] == "put":
+                        item = "put", record["note"]["id"], record["note"]
+                    elif record["op"] == "del":
+                        item = "del", record["id"], None
+                    else:
+                        continue
+                    check_note_id(item[1])
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("Skipping damaged line %d of journal %s", lineno, path)
+                    if damaged is not None:
+                        damaged.append(line)
+                    continue
+                yield item
+
+    def _keep_damaged(self, lines: list[bytes]):
+        """Append unreadable journal lines to the .damaged file for recovery."""
+        with open(self.damaged_journal_file, "ab") as f:
+            for line in lines:
+                f.write(line if line.endswith(b"\n") else line + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        logger.warning(
+            "Kept %d damaged journal lines in %s", len(lines), self.damaged_journal_file,
+        )
+
+    def _truncate_torn_tail(self):
+        """Drop a partial last line left by a crash so appends stay parseable."""
+        try:
+            with open(self.journal_file, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _file_size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    # --- Compaction ---
+
+    def _start_compaction(self):
+        """Rotate the journal and fold it into note files in the background.
+
+        Must be called with _lock held.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        # Cached records that the compaction makes redundant. A leftover
+        # rotated journal from a crash is compacted as-is; the cache then
+        # also holds live journal records, so nothing is released.
+        cached = {}
+        if not self.old_journal_file.exists():
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+                self._unsynced = False
+            if not self.journal_file.exists():
+                return
+            os.replace(self.journal_file, self.old_journal_file)
+            self._journal_size = 0
+            cached = dict(self._journal_notes)
+        self._compactor = threading.Thread(
+            target=self._compact, args=(cached,),
+            name="stickies-compactor", daemon=True,
+        )
+        self._compactor.start()
+
+    def _compact(self, cached: dict[str, dict]):
+        try:
+            headers = self._read_manifest()
+            puts = {}
+            deleted = set()
+            damaged = []
+            for op, note_id, data in self._read_journal(self.old_journal_file, damaged):
+                if op == "put":
+                    headers.setdefault(note_id)
+                    puts[note_id] = {**puts.get(note_id, {}), **data}
+                else:
+                    headers.pop(note_id, None)
+                    puts.pop(note_id, None)
+                    deleted.add(note_id)
+            for note_id, data in puts.items():
+                if "content" not in data:
+                    existing = self._read_note_file(note_id) or {}
+                    data["content"] = existing.get("content", [])
+                headers[note_id] = _header_from_record(data)
+            self._write_snapshot(puts, headers, deleted.difference(headers))
+            if damaged:
+                # Never compact away records that could not be read
+                self._keep_damaged(damaged)
+            self.old_journal_file.unlink()
+        except Exception:
+            # The rotated journal stays, so the next compaction retries it
+            logger.exception("Journal compaction failed")
+            return
+
+        # Drop cached records that the note files now hold
+        with self._lock:
+            for note_id, data in cached.items():
+                if self._journal_notes.get(note_id) is data:
+                    del self._journal_notes[note_id]
+        logger.debug("Compacted journal: %d notes written", len(puts))
+
+    # --- Snapshot ---
+
+    def _write_snapshot(
+        self,
+        puts: dict[str, dict],
+        headers: dict[str, NoteHeader | None],
+        deleted: set[str],
+    ):
+        """Write note files and the manifest, then remove deleted notes."""
+        self.notes_dir.mkdir(parents=True, exist_ok=True)
+        for note_id, data in puts.items():
+            _atomic_write(self.note_path(note_id), encode_note_record(data))
+        entries = []
+        for note_id, header in headers.items():
+            if header is None:
+                data = self._read_note_file(note_id)
+                if data is None:
+                    continue
+                header = _header_from_record(data)
+            entries.append(header.to_dict())
+        manifest = json.dumps({"version": MANIFEST_VERSION, "notes": entries})
+        _atomic_write(self.manifest_file, manifest.encode())
+        for note_id in deleted:
+            with contextlib.suppress(FileNotFoundError):
+                self.note_path(note_id).unlink()
+
+    def _read_note_file(self, note_id: str) -> dict | None:
+        try:
+            return decode_note_record(self.note_path(note_id).read_bytes())
+        except (OSError, ValueError, IndexError, KeyError):
+            return None
+
+    def _read_manifest(self) -> dict[str, NoteHeader | None]:
+        """Read the manifest as id -> header (None if it only has the id)."""
+        if not self.manifest_file.exists():
+            return {}
+        try:
+            entries = json.loads(self.manifest_file.read_text())["notes"]
+            headers = {}
+            for entry in entries:
+                if isinstance(entry, str):
+                    headers[entry] = None
+                else:
+                    headers[entry["id"]] = NoteHeader.from_dict(entry)
+            return headers
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.error("Unreadable manifest %s", self.manifest_file)
+            return dict.fromkeys(self._scan_note_ids())
+
+    def _scan_note_ids(self) -> list[str]:
+        """Recover note ids from the directory when the manifest is lost."""
+        paths = sorted(self.notes_dir.glob("*.note"), key=lambda p: p.stat().st_mtime)
+        return [p.stem for p in paths if not p.name.startswith(".")]
+
+    def _migrate_legacy(self):
+        """Split the legacy notes.json into per-note files.
+
+        The legacy file is left in place as a backup; the manifest marks
+        the migration as done.
+        """
+        if not self.legacy_file.exists():
+            return
+        try:
+            data = json.loads(self.legacy_file.read_text())
+            notes = [Note.from_dict(n) for n in data]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            logger.error("Not migrating unreadable %s", self.legacy_file)
+            return
+        puts = {n.id: n.to_dict() for n in notes}
+        self._write_snapshot(puts, dict.fromkeys(puts), set())
+        logger.info("Migrated %d notes from %s", len(notes), self.legacy_file)
+
+
+def _header_fields(data: dict) -> dict:
+    """Header metadata fields present in a note record."""
+    return {
+        k: data[k]
+        for k in (
+            "color", "width", "height", "always_on_top", "translucent",
+            "created_at", "updated_at", "hibernated",
+        )
+        if k in data
+    }
+
+
+def _header_from_record(data: dict) -> NoteHeader:
+    content = data.get("content", [])
+    length = len(encode_content(content))
+    return NoteHeader.from_note(Note.from_dict(data), length)
+
+
+_storage = None
+
+
+def get_storage():
+    """Return the process-wide storage backend.
+
+    STICKIES_STORAGE selects the backend: "files" (default) or "sqlite".
+    """
+    global _storage
+    if _storage is None:
+        backend = os.environ.get("STICKIES_STORAGE", "files")
+        if backend == "sqlite":
+            from .sqlite_storage import SqliteStorage
+            _storage = SqliteStorage()
+        else:
+            if backend != "files":
+                logger.warning("Unknown STICKIES_STORAGE %r, using files", backend)
+            _storage = FileStorage()
+    return _storage
 
 
 def load_notes() -> list[Note]:
     """Load all notes from disk."""
-    if not NOTES_FILE.exists():
-        return []
-    try:
-        data = json.loads(NOTES_FILE.read_text())
-        return [Note.from_dict(n) for n in data]
-    except (json.JSONDecodeError, KeyError):
-        return []
+    return get_storage().load()
+
+
+def load_headers() -> list[NoteHeader]:
+    """Load note metadata from disk without any content."""
+    return get_storage().load_headers()
+
+
+def load_note_content(note_id: str) -> list[dict]:
+    """Load the content of a single note from disk."""
+    return get_storage().load_content(note_id)
+
+
+def save_notes(notes: list[Note], changed_ids: set[str] | None = None):
+    """Save notes to disk, writing only changed_ids if given."""
+    get_storage().save(notes, changed_ids)
+
+
+def import_json(json_file: Path, storage) -> int:
+    """Copy the notes of a notes.json file into a storage backend."""
+    data = json.loads(Path(json_file).read_text())
+    imported = [Note.from_dict(n) for n in data]
+    for note in imported:
+        check_note_id(note.id)
+    # Imported notes replace same-id notes in place; new ones go last
+    notes = {n.id: n for n in storage.load()}
+    notes.update((n.id, n) for n in imported)
+    storage.save(list(notes.values()), {n.id for n in imported})
+    return len(imported)
 
 
-def save_notes(notes: list[Note]):
-    """Save all notes to disk."""
-    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-    data = [n.to_dict() for n in notes]
-    NOTES_FILE.write_text(json.dumps(data, indent=2))
+def export_json(storage, json_file: Path) -> int:
+    """Write all notes of a storage backend to a notes.json file."""
+    notes = storage.load()
+    data = json.dumps([n.to_dict() for n in notes], indent=2)
+    _atomic_write(Path(json_file), data.encode())
+    return len(notes)
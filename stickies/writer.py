@@ -0,0 +1,94 @@
+"""Background writer that keeps disk I/O off the GTK main loop."""
+
+import logging
+import threading
+
+from gi.repository import GLib
+
+from .models import Note
+
+logger = logging.getLogger(__name__)
+
+
+class SaveWriter:
+    """Encodes and writes note snapshots on a dedicated thread.
+
+    The queue holds at most one pending batch: a snapshot submitted while an
+    older one for the same note is still waiting replaces it, so the backlog
+    is bounded by the number of notes no matter how often saves are issued.
+    Completion and errors are reported on the main loop via GLib.idle_add,
+    with the snapshots that were (or failed to be) written and the number
+    of the last submission the batch covered.
+    """
+
+    def __init__(self, storage, on_done=None, on_error=None):
+        self._storage = storage
+        self._on_done = on_done
+        self._on_error = on_error
+        self._cond = threading.Condition()
+        self._ids: list[str] | None = None  # Latest note order, None if idle
+        self._changed: dict[str, Note] = {}  # id -> latest snapshot
+        self.submitted = 0  # Submissions so far; the latest one's number
+        self._busy = False
+        self._closing = False
+        self._thread = threading.Thread(
+            target=self._run, name="stickies-writer", daemon=True,
+        )
+        self._thread.start()
+
+    def submit(self, ids: list[str], changed: list[Note]) -> int:
+        """Queue a save of the changed snapshots and the current note order.
+
+        Snapshots must not be mutated after submission. Returns the number
+        of this submission, as passed to on_done once it is written.
+        """
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("SaveWriter is closed")
+            self._ids = list(ids)
+            for note in changed:
+                self._changed[note.id] = note
+            self.submitted += 1
+            self._cond.notify_all()
+            return self.submitted
+
+    def flush(self):
+        """Block until everything submitted so far is written."""
+        with self._cond:
+            while self._ids is not None or self._busy:
+                self._cond.wait()
+
+    def close(self):
+        """Write any queued snapshots, stop the thread and close storage."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._storage.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._ids is None and not self._closing:
+                    self._cond.wait()
+                if self._ids is None:
+                    return
+                ids, changed = self._ids, list(self._changed.values())
+                batch = self.submitted
+                self._ids = None
+                self._changed = {}
+                self._busy = True
+
+            try:
+                self._storage.write(ids, changed)
+            except Exception as exc:
+                logger.exception("Saving notes failed")
+                if self._on_error is not None:
+                    GLib.idle_add(self._on_error, changed, exc, batch)
+            else:
+                if self._on_done is not None:
+                    GLib.idle_add(self._on_done, changed, batch)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
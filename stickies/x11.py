@@ -0,0 +1,177 @@
+"""EWMH window state changes on X11 through a shared Xlib connection.
+
+GTK 4 has no API for keeping a window above others, so always-on-top is
+requested from the window manager with a _NET_WM_STATE client message.
+libX11 is loaded and the display opened once per process, atoms are
+interned once, and requests are queued so that all windows changing
+state in the same main loop iteration are sent with a single XFlush.
+"""
+
+import ctypes
+import logging
+
+from gi.repository import GLib
+
+logger = logging.getLogger(__name__)
+
+# Delay before sending state for a just-mapped window, so the window
+# manager has started managing it
+MAP_DELAY_MS = 150
+
+_CLIENT_MESSAGE = 33
+_SUBSTRUCTURE_NOTIFY_MASK = 1 << 19
+_SUBSTRUCTURE_REDIRECT_MASK = 1 << 20
+_NET_WM_STATE_REMOVE = 0
+_NET_WM_STATE_ADD = 1
+_SOURCE_APPLICATION = 1
+
+
+class XClientMessageEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("window", ctypes.c_ulong),
+        ("message_type", ctypes.c_ulong),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_long * 5),
+    ]
+
+
+class XEvent(ctypes.Union):
+    # XSendEvent copies a whole XEvent, which Xlib pads to 24 longs
+    _fields_ = [
+        ("xclient", XClientMessageEvent),
+        ("pad", ctypes.c_long * 24),
+    ]
+
+
+class EWMHConnection:
+    """A lazily opened Xlib display with cached atoms and queued state changes."""
+
+    def __init__(self, library: str = "libX11.so.6", display_name: bytes | None = None):
+        self._library = library
+        self._display_name = display_name
+        self._lib = None
+        self._display = None
+        self._root = 0
+        self._atoms: dict[bytes, int] = {}
+        self._pending: dict[int, bool] = {}  # xid -> keep above
+        self._source = None
+        self._failed = False
+
+    def request_keep_above(self, xid: int, above: bool, delay_ms: int = 0):
+        """Queue an always-on-top change; it is sent with the next flush.
+
+        Requests for the same window replace each other. The flush runs from
+        the main loop after delay_ms, or with an already scheduled flush.
+        """
+        self._pending[xid] = above
+        if self._source is None:
+            if delay_ms:
+                self._source = GLib.timeout_add(delay_ms, self._on_flush)
+            else:
+                self._source = GLib.idle_add(self._on_flush)
+
+    def flush(self) -> int:
+        """Send all queued state changes at once; returns how many were sent."""
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+        pending, self._pending = self._pending, {}
+        if not pending or not self._open():
+            return 0
+        lib = self._lib
+        wm_state = self.atom(b"_NET_WM_STATE")
+        wm_state_above = self.atom(b"_NET_WM_STATE_ABOVE")
+        mask = _SUBSTRUCTURE_REDIRECT_MASK | _SUBSTRUCTURE_NOTIFY_MASK
+        event = XEvent()
+        message = event.xclient
+        message.type = _CLIENT_MESSAGE
+        message.send_event = 1
+        message.display = self._display
+        message.message_type = wm_state
+        message.format = 32
+        message.data[1] = wm_state_above
+        message.data[3] = _SOURCE_APPLICATION
+        for xid, above in pending.items():
+            message.window = xid
+            message.data[0] = _NET_WM_STATE_ADD if above else _NET_WM_STATE_REMOVE
+            lib.XSendEvent(self._display, self._root, 0, mask, ctypes.byref(event))
+        lib.XFlush(self._display)
+        return len(pending)
+
+    def atom(self, name: bytes) -> int:
+        """Intern an atom, once per connection."""
+        atom = self._atoms.get(name)
+        if atom is None:
+            atom = self._lib.XInternAtom(self._display, name, 0)
+            self._atoms[name] = atom
+        return atom
+
+    def close(self):
+        """Drop queued changes and close the display connection."""
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+        self._pending.clear()
+        if self._display:
+            self._lib.XCloseDisplay(self._display)
+        self._display = None
+        self._atoms.clear()
+
+    def _on_flush(self):
+        self._source = None
+        self.flush()
+        return False
+
+    def _open(self) -> bool:
+        if self._display:
+            return True
+        if self._failed:
+            return False
+        try:
+            if self._lib is None:
+                self._lib = _load(self._library)
+            display = self._lib.XOpenDisplay(self._display_name)
+        except OSError as exc:
+            logger.info("Always-on-top unavailable: %s", exc)
+            self._failed = True
+            return False
+        if not display:
+            logger.info("Always-on-top unavailable: cannot open X display")
+            self._failed = True
+            return False
+        self._display = display
+        self._root = self._lib.XDefaultRootWindow(display)
+        return True
+
+
+def _load(library: str) -> ctypes.CDLL:
+    """Load libX11 and declare the few functions used."""
+    lib = ctypes.CDLL(library)
+    lib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    lib.XOpenDisplay.restype = ctypes.c_void_p
+    lib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    lib.XDefaultRootWindow.restype = ctypes.c_ulong
+    lib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    lib.XInternAtom.restype = ctypes.c_ulong
+    lib.XSendEvent.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_long, ctypes.c_void_p,
+    ]
+    lib.XSendEvent.restype = ctypes.c_int
+    lib.XFlush.argtypes = [ctypes.c_void_p]
+    lib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    return lib
+
+
+_connection: EWMHConnection | None = None
+
+
+def get_connection() -> EWMHConnection:
+    """Return the process-wide EWMH connection."""
+    global _connection
+    if _connection is None:
+        _connection = EWMHConnection()
+    return _connection
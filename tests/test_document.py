@@ -0,0 +1,106 @@
+"""Document checked against a plain per-character reference model."""
+
+import random
+
+import pytest
+
+from stickies import document
+from stickies.document import PLAIN, Document, Style
+
+STYLES = [
+    PLAIN,
+    Style.get(bold=True),
+    Style.get(italic=True, size=18),
+    Style.get(color="#cc0000", family="Serif"),
+]
+ATTRS = [("bold", True), ("italic", True), ("size", 12), ("color", "#3465a4")]
+
+
+class Reference:
+    """The same operations on a list of (character, style) pairs."""
+
+    def __init__(self, runs):
+        self.chars = [
+            (char, Style.from_attrs(run)) for run in runs for char in run["text"]
+        ]
+
+    def insert(self, offset, text, style=None):
+        if style is None:
+            style = self.chars[offset - 1][1] if offset > 0 else PLAIN
+        self.chars[offset:offset] = [(char, style) for char in text]
+
+    def delete(self, start, end):
+        del self.chars[start:end]
+
+    def restyle(self, start, end, **changes):
+        for i in range(start, min(end, len(self.chars))):
+            char, style = self.chars[i]
+            self.chars[i] = (char, style.replace(**changes))
+
+    def to_runs(self):
+        runs = []
+        for char, style in self.chars:
+            if runs and runs[-1][1] is style:
+                runs[-1][0].append(char)
+            else:
+                runs.append(([char], style))
+        return [{"text": "".join(chars), **style.attrs()} for chars, style in runs]
+
+
+def _random_runs(rng, count):
+    return [
+        {"text": "".join(rng.choice("ab \n") for _ in range(rng.randint(1, 40))),
+         **rng.choice(STYLES).attrs()}
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edits_match_reference(seed, monkeypatch):
+    # Tiny pieces and blocks so edits keep splitting and dropping blocks
+    monkeypatch.setattr(document, "MAX_PIECE", 8)
+    monkeypatch.setattr(document, "BLOCK_SIZE", 2)
+    rng = random.Random(seed)
+    runs = _random_runs(rng, rng.randint(0, 30))
+    doc = Document.from_runs(runs)
+    ref = Reference(runs)
+
+    for _ in range(300):
+        length = len(ref.chars)
+        start = rng.randint(0, length)
+        end = min(length, start + rng.choice((0, 1, 5, 30, 200)))
+        op = rng.random()
+        if op < 0.4:
+            text = "".join(rng.choice("xy\n") for _ in range(rng.choice((1, 3, 20))))
+            style = rng.choice([None, *STYLES])
+            doc.insert(start, text, style)
+            ref.insert(start, text, style)
+        elif op < 0.65:
+            doc.delete(start, end)
+            ref.delete(start, end)
+        elif op < 0.85:
+            name, value = rng.choice(ATTRS)
+            doc.apply_style(start, end, **{name: value})
+            ref.restyle(start, end, **{name: value})
+        else:
+            name, _ = rng.choice(ATTRS)
+            doc.remove_style(start, end, name)
+            ref.restyle(start, end, **{name: None})
+
+        assert len(doc) == len(ref.chars)
+        assert doc.to_runs() == ref.to_runs()
+        if ref.chars:
+            offset = rng.randrange(len(ref.chars))
+            assert doc.style_at(offset) is ref.chars[offset][1]
+    assert doc.text == "".join(char for char, _ in ref.chars)
+    assert Document.from_runs(doc.to_runs()).to_runs() == ref.to_runs()
+
+
+def test_out_of_range():
+    doc = Document.from_runs([{"text": "abc"}])
+    with pytest.raises(IndexError):
+        doc.insert(4, "x")
+    with pytest.raises(IndexError):
+        doc.style_at(3)
+    doc.delete(1, 99)
+    assert doc.to_runs() == [{"text": "a"}]
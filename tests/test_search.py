@@ -0,0 +1,189 @@
+import random
+
+import pytest
+
+from stickies import search
+from stickies.models import NoteHeader
+from stickies.search import SearchIndex, tokenize
+
+WORDS = (
+    "milk", "mild", "mile", "meeting", "meet", "call", "callback", "draft",
+    "drafts", "review", "idea", "ideas", "ship", "shipping", "Straße", "Über",
+)
+
+
+class Reference:
+    """Brute-force search: every query token starts some word of the note."""
+
+    def __init__(self):
+        self.texts: dict[str, str] = {}
+
+    def search(self, query: str) -> set[str]:
+        tokens = tokenize(query)
+        if not tokens:
+            return set()
+        return {
+            note_id for note_id, text in self.texts.items()
+            if all(any(t.startswith(q) for t in tokenize(text)) for q in tokens)
+        }
+
+
+def _hits(index: SearchIndex, query: str) -> set[str]:
+    hits = index.search(query, limit=None)
+    assert len(hits) == len({h.note_id for h in hits})
+    return {h.note_id for h in hits}
+
+
+def _queries(rng: random.Random) -> list[str]:
+    queries = []
+    for _ in range(5):
+        words = rng.sample(WORDS, rng.randint(1, 2))
+        queries.append(" ".join(w[:rng.randint(1, len(w))] for w in words))
+    return queries
+
+
+def test_prefix_and_matching():
+    index = SearchIndex()
+    index.update("a", "Buy milk after the meeting")
+    index.update("b", "Milestones: review the draft")
+    index.update("c", "meet Sam, call back")
+
+    assert _hits(index, "milk") == {"a"}
+    assert _hits(index, "mil") == {"a", "b"}
+    assert _hits(index, "MEET") == {"a", "c"}
+    assert _hits(index, "me mil") == {"a"}
+    assert _hits(index, "draft zebra") == set()
+    assert _hits(index, "  ,. ") == set()
+    # Exact matches outrank completions
+    assert [h.note_id for h in index.search("meet")] == ["c", "a"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edits_match_reference(seed, tmp_path, monkeypatch):
+    monkeypatch.setattr(search, "MAX_PREFIX_TERMS", len(WORDS))
+    rng = random.Random(seed)
+    index = SearchIndex()
+    reference = Reference()
+    for step in range(120):
+        action = rng.random()
+        note_id = f"n{rng.randrange(30)}"
+        if action < 0.6:
+            text = " ".join(rng.choices(WORDS, k=rng.randint(0, 12)))
+            index.update(note_id, text, float(step))
+            reference.texts[note_id] = text
+        elif action < 0.85:
+            index.remove(note_id)
+            reference.texts.pop(note_id, None)
+        elif action < 0.95:
+            index.compact()
+            assert index.pending == 0
+        else:
+            path = tmp_path / "index.bin"
+            index.save(path)
+            index = SearchIndex.load(path)
+            assert not index.dirty
+        assert len(index) == len(reference.texts)
+        for query in _queries(rng):
+            assert _hits(index, query) == reference.search(query), (step, query)
+
+
+def test_reindex_and_remove_around_compaction():
+    index = SearchIndex()
+    index.update("a", "alpha beta", 1.0)
+    index.update("b", "beta gamma", 1.0)
+    assert index.pending == 2
+    index.compact()
+    assert index.pending == 0
+
+    # Re-indexing a compacted note hides its base postings
+    index.update("a", "gamma delta", 2.0)
+    assert _hits(index, "alpha") == set()
+    assert _hits(index, "gamma") == {"a", "b"}
+    index.remove("b")
+    assert _hits(index, "beta") == set()
+    assert "b" not in index and len(index) == 1
+
+    # Re-indexing and removing a note indexed since the compaction
+    index.update("c", "epsilon", 1.0)
+    index.update("c", "zeta", 2.0)
+    assert _hits(index, "epsilon") == set()
+    index.remove("c")
+    assert _hits(index, "zeta") == set()
+
+    index.compact()
+    assert _hits(index, "gamma delta") == {"a"}
+    assert index.outdated([NoteHeader("a", updated_at=2.0)]) == []
+
+
+def test_renumbers_once_a_quarter_is_dead():
+    index = SearchIndex()
+    for i in range(8):
+        index.update(f"n{i}", f"word{i} shared")
+    index.compact()
+    assert len(index._base_ids) == 8
+
+    # One dead note of eight is kept until a quarter of the base is dead
+    index.remove("n0")
+    index.compact()
+    assert index._dead == 1
+    assert len(index._base_ids) == 8
+    assert _hits(index, "shared") == {f"n{i}" for i in range(1, 8)}
+
+    index.remove("n1")
+    index.compact()
+    assert index._dead == 0
+    assert index._base_ids == [f"n{i}" for i in range(2, 8)]
+    assert _hits(index, "shared") == {f"n{i}" for i in range(2, 8)}
+    assert _hits(index, "word1") == set()
+    assert _hits(index, "word7") == {"n7"}
+
+
+def test_save_load_round_trip(tmp_path):
+    path = tmp_path / "index.bin"
+    index = SearchIndex()
+    index.update("a", "Groceries: milk, eggs", 1.5)
+    index.update("b", "Call Sam about the milk", 2.5)
+    index.compact()
+    index.remove("b")
+    index.update("c", "eggs again", 3.5)
+    index.save(path)
+
+    loaded = SearchIndex.load(path)
+    assert len(loaded) == 2 and "b" not in loaded
+    for query in ("milk", "eggs", "sam", "gro"):
+        assert loaded.search(query) == index.search(query)
+    assert loaded.outdated([NoteHeader("a", updated_at=1.5), NoteHeader("c", updated_at=3.5)]) == []
+
+    # Loaded notes keep working as a base for further edits
+    loaded.update("a", "nothing", 4.0)
+    assert _hits(loaded, "milk") == set()
+
+
+@pytest.mark.parametrize("data", [b"", b"junk", b"STX\x01\xff\xff\xff\xff{}"])
+def test_load_damaged_file(tmp_path, data):
+    path = tmp_path / "index.bin"
+    path.write_bytes(data)
+    index = SearchIndex.load(path)
+    assert len(index) == 0
+    assert SearchIndex.load(tmp_path / "missing.bin").search("x") == []
+
+
+def test_outdated():
+    index = SearchIndex()
+    index.update("same", "text", 1.0)
+    index.update("edited", "text", 1.0)
+    index.update("gone", "text", 1.0)
+
+    headers = [
+        NoteHeader("same", updated_at=1.0),
+        NoteHeader("edited", updated_at=2.0),
+        NoteHeader("new", updated_at=1.0),
+    ]
+    assert sorted(index.outdated(headers)) == ["edited", "new"]
+    # Notes no longer listed are dropped
+    assert "gone" not in index
+    assert _hits(index, "text") == {"same", "edited"}
+
+    # set_version marks unchanged text as current
+    index.set_version("edited", 2.0)
+    assert index.outdated(headers) == ["new"]
@@ -0,0 +1,237 @@
+"""Round trips shared by the file and SQLite storage backends."""
+
+import json
+import sqlite3
+
+import pytest
+
+from stickies import storage as storage_module
+from stickies.models import Note
+from stickies.sqlite_storage import SqliteStorage
+from stickies.storage import FileStorage, export_json, import_json
+
+
+class Files:
+    @staticmethod
+    def open(path):
+        return FileStorage(path / "notes", path / "notes.json", path / "journal.jsonl")
+
+    @staticmethod
+    def write_oldest(path, notes):
+        """A version 1 manifest (ids only) and JSON note files."""
+        notes_dir = path / "notes"
+        notes_dir.mkdir()
+        for note in notes:
+            (notes_dir / f"{note.id}.note").write_text(json.dumps(_v1_record(note)))
+        manifest = {"version": 1, "notes": [n.id for n in notes]}
+        (notes_dir / "manifest.json").write_text(json.dumps(manifest))
+
+
+class Sqlite:
+    @staticmethod
+    def open(path):
+        return SqliteStorage(path / "notes.db", path / "notes.json")
+
+    @staticmethod
+    def write_oldest(path, notes):
+        """A schema version 1 database, with JSON content."""
+        conn = sqlite3.connect(path / "notes.db")
+        with conn:
+            conn.execute(
+                "CREATE TABLE notes (id TEXT PRIMARY KEY, position INTEGER NOT NULL, "
+                "color TEXT NOT NULL, width INTEGER NOT NULL, height INTEGER NOT NULL, "
+                "always_on_top INTEGER NOT NULL, translucent INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, content TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX notes_meta ON notes (position, id, color, width, height, "
+                "always_on_top, translucent, created_at)"
+            )
+            for position, note in enumerate(notes):
+                data = _v1_record(note)
+                conn.execute(
+                    "INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        note.id, position, note.color, note.width, note.height,
+                        int(note.always_on_top), int(note.translucent),
+                        note.created_at, json.dumps(data["content"]),
+                    ),
+                )
+            conn.execute("PRAGMA user_version=1")
+        conn.close()
+
+
+@pytest.fixture(params=[Files, Sqlite], ids=["files", "sqlite"])
+def backend(request):
+    return request.param
+
+
+def _notes() -> list[Note]:
+    return [
+        Note(color="blue", content=[
+            {"text": "Groceries\n"},
+            {"text": "milk", "bold": True, "size": 14},
+        ]),
+        Note(color="green", width=420, always_on_top=True, content=[
+            {"text": "Call", "color": "#cc0000"},
+            {"text": " Sam\nlater", "italic": True, "family": "Monospace"},
+        ]),
+        Note(content=[]),
+    ]
+
+
+def _v1_record(note: Note) -> dict:
+    """A note as stored before notes tracked edits or hibernation."""
+    data = note.to_dict()
+    del data["updated_at"], data["hibernated"]
+    return data
+
+
+def test_round_trip(backend, tmp_path):
+    notes = _notes()
+    storage = backend.open(tmp_path)
+    assert storage.load_headers() == []
+    storage.save(notes)
+    storage.close()
+
+    storage = backend.open(tmp_path)
+    headers = storage.load_headers()
+    assert [h.id for h in headers] == [n.id for n in notes]
+    assert [h.title for h in headers] == ["Groceries", "Call Sam", ""]
+    assert [h.color for h in headers] == ["blue", "green", "purple"]
+    assert headers[1].width == 420 and headers[1].always_on_top
+    for note in notes:
+        assert storage.load_content(note.id) == note.content
+
+    # A note with unloaded content only has its metadata written
+    first = headers[0].to_note()
+    first.color = "pink"
+    storage.write([notes[0].id, notes[1].id], [first])
+    storage.close()
+
+    storage = backend.open(tmp_path)
+    headers = storage.load_headers()
+    assert [(h.id, h.color) for h in headers] == [(notes[0].id, "pink"), (notes[1].id, "green")]
+    assert storage.load_content(notes[0].id) == notes[0].content
+    assert storage.load_content(notes[2].id) == []
+    assert [n.to_dict() for n in storage.load()] == [
+        {**notes[0].to_dict(), "color": "pink"}, notes[1].to_dict(),
+    ]
+    storage.close()
+
+
+def test_migrates_oldest_format(backend, tmp_path):
+    notes = _notes()
+    backend.write_oldest(tmp_path, notes)
+
+    storage = backend.open(tmp_path)
+    headers = storage.load_headers()
+    assert [h.id for h in headers] == [n.id for n in notes]
+    assert [h.title for h in headers] == ["Groceries", "Call Sam", ""]
+    assert all(h.updated_at == h.created_at and not h.hibernated for h in headers)
+    for note in notes:
+        assert storage.load_content(note.id) == note.content
+
+    # Migrated notes save and load like any other
+    notes[2].content = [{"text": "new"}]
+    storage.save(notes, {notes[2].id})
+    storage.close()
+    storage = backend.open(tmp_path)
+    assert [h.title for h in storage.load_headers()] == ["Groceries", "Call Sam", "new"]
+    storage.close()
+
+
+def test_json_import_export(backend, tmp_path):
+    notes = _notes()
+    (tmp_path / "notes.json").write_text(json.dumps([n.to_dict() for n in notes]))
+
+    # The legacy notes.json is imported on first run
+    storage = backend.open(tmp_path)
+    assert [h.id for h in storage.load_headers()] == [n.id for n in notes]
+
+    # Imported notes replace those with the same id in place; new ones go last
+    replaced = Note(id=notes[0].id, content=[{"text": "replaced"}])
+    added = Note(color="orange", content=[{"text": "added"}])
+    (tmp_path / "import.json").write_text(json.dumps([replaced.to_dict(), added.to_dict()]))
+    assert import_json(tmp_path / "import.json", storage) == 2
+    expected = [replaced, notes[1], notes[2], added]
+    assert export_json(storage, tmp_path / "export.json") == 4
+    assert json.loads((tmp_path / "export.json").read_text()) == [n.to_dict() for n in expected]
+    storage.close()
+
+    storage = backend.open(tmp_path)
+    assert [n.to_dict() for n in storage.load()] == [n.to_dict() for n in expected]
+    storage.close()
+
+
+@pytest.mark.parametrize("note_id", ["../evil", "a/b", ".hidden", ""])
+def test_rejects_unsafe_ids(backend, tmp_path, note_id):
+    notes = _notes()
+    storage = backend.open(tmp_path)
+    storage.save(notes)
+    (tmp_path / "import.json").write_text(json.dumps([Note(id=note_id).to_dict()]))
+    with pytest.raises(ValueError):
+        import_json(tmp_path / "import.json", storage)
+    storage.close()
+
+    storage = backend.open(tmp_path)
+    assert [h.id for h in storage.load_headers()] == [n.id for n in notes]
+    storage.close()
+
+
+def test_file_write_rejects_unsafe_id_before_journaling(tmp_path):
+    storage = Files.open(tmp_path)
+    storage.save(_notes())
+    journal = storage.journal_file.read_bytes()
+    with pytest.raises(ValueError):
+        storage.write([Note(id="../evil").id], [Note(id="../evil")])
+    assert storage.journal_file.read_bytes() == journal
+    assert "../evil" not in storage._journal_notes
+    storage.close()
+
+
+def _compacted(storage) -> bool:
+    storage.close()  # Waits for the compactor
+    return not storage.old_journal_file.exists()
+
+
+def test_failed_compaction_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_module, "COMPACT_THRESHOLD", 1)
+    notes = _notes()
+    storage = Files.open(tmp_path)
+    write_snapshot = storage._write_snapshot
+
+    def fail(*args):
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(storage, "_write_snapshot", fail)
+    storage.save(notes)
+    assert not _compacted(storage)
+    # Nothing was released from the cache, so content is still served
+    assert set(storage._journal_notes) == {n.id for n in notes}
+
+    monkeypatch.setattr(storage, "_write_snapshot", write_snapshot)
+    storage = Files.open(tmp_path)
+    headers = storage.load_headers()
+    assert _compacted(storage)
+    assert [h.id for h in headers] == [n.id for n in notes]
+    for note in notes:
+        assert (storage.notes_dir / f"{note.id}.note").exists()
+
+
+def test_compaction_keeps_unsafe_journal_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_module, "COMPACT_THRESHOLD", 1)
+    notes = _notes()
+    storage = Files.open(tmp_path)
+    storage.save(notes)
+    storage.close()
+    # A journal record from before ids were checked
+    bad = {"op": "put", "note": Note(id="../evil", content=[{"text": "x"}]).to_dict()}
+    with open(storage.journal_file, "a") as f:
+        f.write(json.dumps(bad) + "\n")
+
+    storage = Files.open(tmp_path)
+    assert [h.id for h in storage.load_headers()] == [n.id for n in notes]
+    assert _compacted(storage)
+    assert not (tmp_path / "evil.note").exists()
+    assert json.loads(storage.damaged_journal_file.read_text()) == bad
@@ -0,0 +1,169 @@
+"""Window title updates while typing.
+
+Each scenario runs on a minimal stand-in for Gtk.TextBuffer and, when gi is
+available, on a real one; TitleTracker is wired to both exactly as
+NoteWindow wires it.
+"""
+
+import pytest
+
+from stickies.models import DEFAULT_TITLE, TitleTracker
+
+
+class FakeIter:
+    def __init__(self, buffer, offset):
+        self.buffer = buffer
+        self.offset = offset
+
+    def copy(self):
+        return FakeIter(self.buffer, self.offset)
+
+    def get_line(self):
+        return self.buffer.text.count("\n", 0, self.offset)
+
+    def ends_line(self):
+        text = self.buffer.text
+        return self.offset == len(text) or text[self.offset] == "\n"
+
+    def forward_to_line_end(self):
+        # Like GTK, an iter already at a line end moves to the next one's
+        text = self.buffer.text
+        start = self.offset + 1 if self.ends_line() else self.offset
+        end = text.find("\n", start)
+        self.offset = len(text) if end < 0 else end
+
+
+class FakeBuffer:
+    """The parts of Gtk.TextBuffer that NoteWindow's title handling uses."""
+
+    def __init__(self):
+        self.text = ""
+        self.reads = 0
+        self._handlers: dict[str, list] = {}
+
+    def connect(self, signal, handler):
+        self._handlers.setdefault(signal, []).append(handler)
+        return len(self._handlers[signal])
+
+    def get_start_iter(self):
+        return FakeIter(self, 0)
+
+    def get_iter_at_offset(self, offset):
+        return FakeIter(self, offset)
+
+    def get_text(self, start, end, include_hidden):
+        self.reads += 1
+        return self.text[start.offset:end.offset]
+
+    def insert(self, location, text):
+        self._emit("insert-text", location, text, len(text))
+        offset = location.offset
+        self.text = self.text[:offset] + text + self.text[offset:]
+        self._emit("changed")
+
+    def delete(self, start, end):
+        self._emit("delete-range", start, end)
+        self.text = self.text[:start.offset] + self.text[end.offset:]
+        self._emit("changed")
+
+    def _emit(self, signal, *args):
+        for handler in self._handlers.get(signal, ()):
+            handler(self, *args)
+
+
+def gtk_buffer():
+    pytest.importorskip("gi")
+    import gi
+    gi.require_version("Gtk", "4.0")
+    from gi.repository import Gtk
+
+    class CountingBuffer(Gtk.TextBuffer):
+        reads = 0
+
+        def get_text(self, start, end, include_hidden):
+            self.reads += 1
+            return super().get_text(start, end, include_hidden)
+
+    return CountingBuffer()
+
+
+class Window:
+    """NoteWindow's title handling around a buffer."""
+
+    def __init__(self, buffer, text=""):
+        self.buffer = buffer
+        if text:
+            buffer.insert(buffer.get_iter_at_offset(0), text)
+        self.tracker = TitleTracker()
+        self.titles = []  # Titles set, in order
+        self.tracker.connect(buffer)
+        buffer.connect("changed", lambda buffer: self._update_title())
+        buffer.reads = 0
+        self._update_title()
+
+    def type(self, offset, text):
+        for i, char in enumerate(text):
+            self.buffer.insert(self.buffer.get_iter_at_offset(offset + i), char)
+
+    def delete(self, start, end):
+        self.buffer.delete(
+            self.buffer.get_iter_at_offset(start), self.buffer.get_iter_at_offset(end),
+        )
+
+    @property
+    def reads(self):
+        return self.buffer.reads
+
+    def _update_title(self):
+        title = self.tracker.update(self.buffer)
+        if title is not None:
+            self.titles.append(title)
+
+
+@pytest.fixture(params=[FakeBuffer, gtk_buffer], ids=["fake", "gtk"])
+def new_buffer(request):
+    return request.param
+
+
+def test_typing_a_note(new_buffer):
+    win = Window(new_buffer())
+    assert win.titles == [DEFAULT_TITLE]
+
+    win.type(0, "Shop")
+    assert win.titles[1:] == ["S", "Sh", "Sho", "Shop"]
+    assert win.reads == 5
+
+    # The newline is inserted on line 0 but leaves the title alone
+    win.type(4, "\n")
+    assert win.reads == 6
+    assert len(win.titles) == 5
+
+    # Typing and deleting in the body never reads the first line back
+    win.type(5, "milk\neggs\nbread")
+    win.delete(10, 15)
+    assert win.reads == 6
+    assert len(win.titles) == 5
+
+    # Trailing spaces do not change the title
+    win.type(4, "  ")
+    assert win.reads == 8
+    assert len(win.titles) == 5
+
+    # Deleting the first line break pulls line 1 into the title
+    win.delete(4, 7)
+    assert win.titles[-1] == "Shopmilk"
+    assert win.reads == 9
+
+
+@pytest.mark.parametrize("text", ["\n", "   \nbody", "\nbody"])
+def test_blank_first_line(new_buffer, text):
+    win = Window(new_buffer(), text)
+    assert win.titles == [DEFAULT_TITLE]
+
+
+def test_invalidate(new_buffer):
+    win = Window(new_buffer(), "Title")
+    win.tracker.invalidate()
+    win._update_title()
+    assert win.reads == 2
+    assert win.titles == ["Title"]
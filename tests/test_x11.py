@@ -0,0 +1,148 @@
+"""Always-on-top against a real X server and window manager.
+
+Run under Xvfb with an EWMH window manager, e.g.
+xvfb-run sh -c 'openbox & sleep 1; python -m pytest tests/test_x11.py'.
+Skipped when no display is available.
+"""
+
+import ctypes
+import os
+import time
+
+import pytest
+
+if not os.environ.get("DISPLAY"):
+    pytest.skip("no X display", allow_module_level=True)
+pytest.importorskip("gi")
+
+from stickies import x11
+
+_ANY_PROPERTY_TYPE = 0
+_SUCCESS = 0
+TIMEOUT = 2.0  # Seconds to wait for the window manager
+
+
+class Display:
+    """A second Xlib connection for creating windows and reading properties."""
+
+    def __init__(self):
+        lib = x11._load("libX11.so.6")
+        lib.XCreateSimpleWindow.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+            ctypes.c_uint, ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_ulong,
+        ]
+        lib.XCreateSimpleWindow.restype = ctypes.c_ulong
+        lib.XMapWindow.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        lib.XDestroyWindow.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        lib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.XFree.argtypes = [ctypes.c_void_p]
+        lib.XGetWindowProperty.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_long,
+            ctypes.c_long, ctypes.c_int, ctypes.c_ulong,
+            ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+            ctypes.POINTER(ctypes.c_void_p),
+        ]
+        lib.XGetWindowProperty.restype = ctypes.c_int
+        self.lib = lib
+        self.display = lib.XOpenDisplay(None)
+        if not self.display:
+            pytest.skip("cannot open X display")
+        self.root = lib.XDefaultRootWindow(self.display)
+
+    def atom(self, name: bytes) -> int:
+        return self.lib.XInternAtom(self.display, name, 0)
+
+    def atoms(self, window: int, name: bytes) -> list[int]:
+        """Value of a 32-bit window property, e.g. _NET_WM_STATE."""
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        count = ctypes.c_ulong()
+        after = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        self.lib.XSync(self.display, 0)
+        status = self.lib.XGetWindowProperty(
+            self.display, window, self.atom(name), 0, 1024, 0, _ANY_PROPERTY_TYPE,
+            ctypes.byref(actual_type), ctypes.byref(actual_format),
+            ctypes.byref(count), ctypes.byref(after), ctypes.byref(data),
+        )
+        if status != _SUCCESS or not data.value:
+            return []
+        try:
+            if actual_format.value != 32:
+                return []
+            # Xlib returns 32-bit items as C longs
+            values = ctypes.cast(data, ctypes.POINTER(ctypes.c_ulong))
+            return [values[i] for i in range(count.value)]
+        finally:
+            self.lib.XFree(data)
+
+    def create_window(self) -> int:
+        window = self.lib.XCreateSimpleWindow(
+            self.display, self.root, 0, 0, 100, 100, 0, 0, 0,
+        )
+        self.lib.XMapWindow(self.display, window)
+        self.lib.XSync(self.display, 0)
+        return window
+
+    def close(self, *windows: int):
+        for window in windows:
+            self.lib.XDestroyWindow(self.display, window)
+        self.lib.XCloseDisplay(self.display)
+
+
+def wait_for(predicate) -> bool:
+    deadline = time.monotonic() + TIMEOUT
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def display():
+    display = Display()
+    if not display.atoms(display.root, b"_NET_SUPPORTING_WM_CHECK"):
+        display.close()
+        pytest.skip("no EWMH window manager running")
+    yield display
+
+
+def test_keep_above_round_trip(display):
+    window = display.create_window()
+    connection = x11.EWMHConnection()
+    try:
+        # The window manager sets WM_STATE once it manages the window
+        assert wait_for(lambda: display.atoms(window, b"WM_STATE"))
+        above = display.atom(b"_NET_WM_STATE_ABOVE")
+
+        connection.request_keep_above(window, True)
+        assert connection.flush() == 1
+        assert wait_for(lambda: above in display.atoms(window, b"_NET_WM_STATE"))
+
+        connection.request_keep_above(window, False)
+        assert connection.flush() == 1
+        assert wait_for(lambda: above not in display.atoms(window, b"_NET_WM_STATE"))
+    finally:
+        connection.close()
+        display.close(window)
+
+
+def test_requests_coalesce(display):
+    windows = [display.create_window() for _ in range(3)]
+    connection = x11.EWMHConnection()
+    try:
+        above = display.atom(b"_NET_WM_STATE_ABOVE")
+        assert all(
+            wait_for(lambda w=w: display.atoms(w, b"WM_STATE")) for w in windows
+        )
+        for window in windows:
+            connection.request_keep_above(window, False)
+            connection.request_keep_above(window, True)
+        assert connection.flush() == len(windows)
+        for window in windows:
+            assert wait_for(lambda w=window: above in display.atoms(w, b"_NET_WM_STATE"))
+    finally:
+        connection.close()
+        display.close(*windows)